@@ -1,21 +1,46 @@
 import numpy as np
 import random
+from planner import DistanceFieldPlanner
+from hpa import HierarchicalPlanner
+from environment import MASK_ACTIONS
+from qtable import DenseQTable
+
+HIERARCHICAL_MIN_SIZE = 128  # Grids at least this wide use HierarchicalPlanner for paths
 
 class QLearningAgent:
-    def __init__(self, grid_size, learning_rate=0.1, discount_factor=0.9, epsilon=0.1):
+    def __init__(self, grid_size, learning_rate=0.1, discount_factor=0.9, epsilon=0.1, q_backend=None):
         self.grid_size = grid_size
         self.learning_rate = learning_rate  # How much new info overrides old
         self.discount_factor = discount_factor  # Importance of future rewards
         self.epsilon = epsilon  # Exploration rate
         
-        # Initialize Q-table with zeros
-        self.q_table = np.zeros((grid_size, grid_size, 4))  # (x, y, action)
+        # Initialize Q-table with zeros, (x, y, action); see qtable.py for other backends
+        self.q_backend = DenseQTable(grid_size) if q_backend is None else q_backend
         self.actions = [0, 1, 2, 3]  # Up, Right, Down, Left
-        self.visited_counts = np.zeros((grid_size, grid_size))
+        # Per-cell counts only make sense when the table itself is dense
+        self.visited_counts = np.zeros((grid_size, grid_size)) if self.q_backend.dense else None
+        self.rng = np.random.default_rng()
+        # A whole-grid distance field gets slow on big grids; plan over clusters there
+        self.planner = HierarchicalPlanner() if grid_size >= HIERARCHICAL_MIN_SIZE else DistanceFieldPlanner()
+
+    @property
+    def q_table(self):
+        """Q-values as a (grid_size, grid_size, 4) array (a copy for sparse backends)"""
+        return self.q_backend.array
+
+    @q_table.setter
+    def q_table(self, array):
+        # Adopt an existing array (shared memory, memmap) without copying it
+        self.q_backend = DenseQTable(self.grid_size, array.shape[-1], array=array)
     
-    def get_valid_actions(self, state, grid):
-        """Returns list of valid actions from current state"""
+    def get_valid_actions(self, state, grid, masks=None):
+        """Returns list of valid actions from current state
+
+        With `masks` (e.g. GridEnvironment.action_masks) this is a single lookup.
+        """
         x, y = state
+        if masks is not None:
+            return MASK_ACTIONS[masks[x, y]]
         valid_actions = []
         
         if x > 0 and grid[x-1][y] != 1: valid_actions.append(0)  # Up
@@ -25,9 +50,14 @@ class QLearningAgent:
         
         return valid_actions
     
-    def get_goal_directed_actions(self, state, goal, grid):
-        """Prioritize moves that reduce distance to goal"""
+    def get_goal_directed_actions(self, state, goal, grid, masks=None):
+        """Prioritize moves that reduce distance to goal
+
+        With `masks` (e.g. GridEnvironment.goal_masks) this is a single lookup.
+        """
         x, y = state
+        if masks is not None:
+            return MASK_ACTIONS[masks[x, y]]
         gx, gy = goal
         preferred_actions = []
         
@@ -45,52 +75,110 @@ class QLearningAgent:
             return random.choice(valid_actions)
         
         # Exploitation: choose best action from Q-table
-        q_values = [self.q_table[state[0]][state[1]][a] if a in valid_actions else -np.inf 
+        row = self.q_backend.row(state[0], state[1])
+        q_values = [row[a] if a in valid_actions else -np.inf
                    for a in self.actions]
         return np.argmax(q_values)
     
     def update_q_table(self, state, action, reward, new_state):
-        """Update Q-value using Bellman equation"""
-        best_future_q = np.max(self.q_table[new_state[0]][new_state[1]])
-        current_q = self.q_table[state[0]][state[1]][action]
+        """Update Q-value using Bellman equation and return the TD error"""
+        best_future_q = np.max(self.q_backend.row(new_state[0], new_state[1]))
+        current_q = self.q_backend.get(state[0], state[1], action)
         
         # Q-learning formula
-        new_q = current_q + self.learning_rate * (
-            reward + self.discount_factor * best_future_q - current_q
-        )
-        self.q_table[state[0]][state[1]][action] = new_q
+        td_error = reward + self.discount_factor * best_future_q - current_q
+        new_q = current_q + self.learning_rate * td_error
+        self.q_backend.set(state[0], state[1], action, new_q)
+        if self.visited_counts is not None:
+            self.visited_counts[state[0], state[1]] += 1
+        return td_error
     
-    def get_optimized_path(self, start_pos, goal_pos, grid):
-        """Find path using current Q-table"""
-        path = []
-        current_pos = list(start_pos)
-        visited = set()
-        
-        for _ in range(self.grid_size * 2):  # Prevent infinite loops
-            x, y = current_pos
-            visited.add((x, y))
-            path.append([x, y])
-            
-            if (x, y) == tuple(goal_pos):
-                break
-            
-            valid_actions = self.get_goal_directed_actions((x, y), goal_pos, grid)
-            if not valid_actions:
+    def act_batch(self, states, masks):
+        """Choose ε-greedy actions for many states at once
+
+        states is an (N, 2) array of positions and masks an (N, 4) bool
+        array of allowed actions. Every row needs at least one allowed action.
+        """
+        states = np.asarray(states)
+        masks = np.asarray(masks, dtype=bool)
+        q_values = np.where(masks, self.q_backend.rows(states[:, 0], states[:, 1]), -np.inf)
+        greedy = np.argmax(q_values, axis=1)
+
+        # Uniform choice among allowed actions via random keys
+        keys = np.where(masks, self.rng.random(masks.shape), -1.0)
+        random_actions = np.argmax(keys, axis=1)
+        explore = self.rng.random(len(states)) < self.epsilon
+        return np.where(explore, random_actions, greedy)
+
+    def update_batch(self, states, actions, rewards, next_states, dones):
+        """Apply the Bellman update to a batch of transitions
+
+        All targets are computed from the Q-table before the update.
+        Transitions that share a (state, action) pair have their TD errors
+        averaged, so duplicates contribute one combined step instead of
+        overwriting each other. Returns the per-transition TD errors.
+        """
+        return self._update_batch(states, actions, rewards, next_states, dones)[0]
+
+    def _update_batch(self, states, actions, rewards, next_states, dones):
+        """update_batch() that also returns the squared norm of the Q changes"""
+        states = np.asarray(states)
+        next_states = np.asarray(next_states)
+        actions = np.asarray(actions)
+        not_done = 1.0 - np.asarray(dones, dtype=np.float64)
+
+        best_future_q = self.q_backend.rows(next_states[:, 0], next_states[:, 1]).max(axis=1)
+        targets = np.asarray(rewards) + self.discount_factor * best_future_q * not_done
+        current_q = self.q_backend.rows(states[:, 0], states[:, 1])[np.arange(len(actions)), actions]
+        td_errors = targets - current_q
+
+        n_actions = len(self.actions)
+        index = (states[:, 0] * self.grid_size + states[:, 1]) * n_actions + actions
+        unique_index, inverse = np.unique(index, return_inverse=True)
+        td_sums = np.bincount(inverse, weights=td_errors)
+        counts = np.bincount(inverse)
+        cells, unique_actions = np.divmod(unique_index, n_actions)
+        xs, ys = np.divmod(cells, self.grid_size)
+        deltas = self.learning_rate * td_sums / counts
+        self.q_backend.add(xs, ys, unique_actions, deltas)
+        return td_errors, float(np.dot(deltas, deltas))
+
+    def replay(self, source, batch_size=32, updates=1, prioritized=False):
+        """Run batched updates on transitions sampled from a ReplayBuffer or TransitionModel
+
+        With prioritized sampling the buffer's priorities are refreshed
+        from the new TD errors after each batch. Returns the summed squared
+        norm of the Q changes, for metrics.
+        """
+        delta_squares = 0.0
+        for _ in range(updates):
+            batch = source.sample(batch_size, self.rng, prioritized)
+            if batch is None:
                 break
-                
-            # Choose action with highest Q-value
-            action = self.get_action((x, y), valid_actions)
-            
-            # Move according to action
-            if action == 0: x -= 1
-            elif action == 1: y += 1
-            elif action == 2: x += 1
-            elif action == 3: y -= 1
-            
-            current_pos = [x, y]
-        
-        return path
-    
+            indices, states, actions, rewards, next_states, dones = batch
+            td_errors, squares = self._update_batch(states, actions, rewards, next_states, dones)
+            delta_squares += squares
+            if prioritized:
+                source.update_priorities(indices, td_errors)
+        return delta_squares
+
+    def get_optimized_path(self, start_pos, goal_pos, grid):
+        """Find the cheapest path to the goal using the cached distance field"""
+        return self.planner.get_path(start_pos, goal_pos, grid)
+
+    def prepare_path(self, goal_pos, grid):
+        """Start getting the planner ready for this grid and goal
+
+        Returns True once get_optimized_path() will answer without
+        waiting for a build (always, below HIERARCHICAL_MIN_SIZE).
+        """
+        return self.planner.prepare(grid, goal_pos)
+
+    def watch(self, environment):
+        """Let the path planner hear about the environment's grid changes instead of diffing the grid"""
+        self.planner.watch(environment)
+
     def reset_visits(self):
         """Reset visit counts"""
-        self.visited_counts.fill(0)
\ No newline at end of file
+        if self.visited_counts is not None:
+            self.visited_counts.fill(0)
\ No newline at end of file
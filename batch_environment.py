@@ -0,0 +1,123 @@
+import numpy as np
+from environment import ACTION_DELTAS, MASK_BITS, goal_directed_masks, valid_action_masks
+from mapgen import generate_layouts
+from game import REWARD_VALUE, PENALTY_VALUE, GOAL_VALUE, STEP_VALUE
+
+class BatchGridEnvironment:
+    """N independent grid games stepped together with array operations
+
+    Grids are stored as one (N, H, W) array of cell types using the same
+    codes as GridEnvironment (0 empty, 1 obstacle, 2 reward, 3 penalty,
+    4 goal). Finished episodes are reset automatically inside step().
+    With a MapLibrary, resets draw random maps from it instead of
+    generating new ones.
+    """
+
+    def __init__(self, num_envs, grid_size=10, max_steps=None, seed=None,
+                 obstacle_count=10, reward_count=5, penalty_count=5,
+                 min_goal_distance=None, library=None):
+        if library is not None:
+            grid_size = library.grid_size
+        self.num_envs = num_envs
+        self.grid_size = grid_size
+        self.max_steps = max_steps
+        self.obstacle_count = obstacle_count
+        self.reward_count = reward_count
+        self.penalty_count = penalty_count
+        self.min_goal_distance = min_goal_distance
+        self.library = library
+        self.rng = np.random.default_rng(seed)
+
+        self.grids = np.zeros((num_envs, grid_size, grid_size), dtype=np.uint8)
+        # 4-bit move masks per cell (see environment.MASK_ACTIONS), rebuilt when a layout loads
+        self.valid_masks = np.zeros((num_envs, grid_size, grid_size), dtype=np.uint8)
+        self.goal_masks = np.zeros((num_envs, grid_size, grid_size), dtype=np.uint8)
+        self.agent_pos = np.zeros((num_envs, 2), dtype=np.int64)
+        self.goal_pos = np.full((num_envs, 2), grid_size - 1, dtype=np.int64)
+        self.steps = np.zeros(num_envs, dtype=np.int64)
+        self.scores = np.zeros(num_envs)
+
+        # Scoring used by step(), defaults match GridGame
+        self.reward_value = REWARD_VALUE
+        self.penalty_value = PENALTY_VALUE
+        self.goal_value = GOAL_VALUE
+        self.step_value = STEP_VALUE
+
+        self._env_index = np.arange(num_envs)
+        self._deltas = np.array(ACTION_DELTAS)
+        self.reset()
+
+    def reset(self, seed=None):
+        """Reset every environment and return the (N, 2) agent positions"""
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        self._reset_envs(self._env_index)
+        return self.agent_pos.copy()
+
+    def _reset_envs(self, env_ids):
+        """Load fresh layouts into the given environments"""
+        if self.library is not None:
+            grids, goals = self.library.layouts(self.rng.integers(0, len(self.library), size=len(env_ids)))
+        else:
+            grids, goals = generate_layouts(len(env_ids), self.grid_size, self.obstacle_count,
+                                            self.reward_count, self.penalty_count,
+                                            self.min_goal_distance, self.rng)
+        self.grids[env_ids] = grids
+        self.goal_pos[env_ids] = goals
+        valid = valid_action_masks(self.grids[env_ids])
+        self.valid_masks[env_ids] = valid
+        self.goal_masks[env_ids] = goal_directed_masks(valid, self.goal_pos[env_ids])
+        self.agent_pos[env_ids] = 0
+        self.steps[env_ids] = 0
+        self.scores[env_ids] = 0
+
+    def action_masks(self):
+        """Return an (N, 4) bool mask of moves that stay on the board and avoid obstacles"""
+        return MASK_BITS[self.valid_masks[self._env_index, self.agent_pos[:, 0], self.agent_pos[:, 1]]]
+
+    def goal_directed_masks(self):
+        """Vectorized get_goal_directed_actions: moves toward the goal, else any valid move"""
+        return MASK_BITS[self.goal_masks[self._env_index, self.agent_pos[:, 0], self.agent_pos[:, 1]]]
+
+    def step(self, actions):
+        """Step every environment with an (N,) action vector
+
+        Returns (positions, rewards, dones, info). Environments that finish
+        are reset before returning, so `positions` holds their new start
+        position while info['final_positions'] keeps the position the
+        action actually led to (the next state for learning).
+        """
+        masks = self.valid_masks[self._env_index, self.agent_pos[:, 0], self.agent_pos[:, 1]]
+        blocked = (masks >> actions & 1) == 0
+        targets = np.where(blocked[:, None], self.agent_pos, self.agent_pos + self._deltas[actions])
+        cells = self.grids[self._env_index, targets[:, 0], targets[:, 1]]
+
+        # Blocked moves stay in place and score like an empty cell
+        self.agent_pos = targets
+        cells = np.where(blocked, 0, cells)
+        self.steps += 1
+
+        cell_rewards = np.array([self.step_value, self.step_value, self.reward_value,
+                                 self.penalty_value, self.goal_value])
+        rewards = cell_rewards[cells]
+        self.scores += rewards
+
+        # Consume collected rewards
+        consumed = np.flatnonzero(cells == 2)
+        self.grids[consumed, self.agent_pos[consumed, 0], self.agent_pos[consumed, 1]] = 0
+
+        won = cells == 4
+        truncated = ~won & (self.steps >= self.max_steps) if self.max_steps is not None else np.zeros_like(won)
+        dones = won | truncated
+        info = {
+            'won': won,
+            'truncated': truncated,
+            'blocked': blocked,
+            'final_positions': self.agent_pos.copy(),
+            'final_scores': self.scores.copy(),
+            'final_steps': self.steps.copy(),
+        }
+
+        if dones.any():
+            self._reset_envs(np.flatnonzero(dones))
+        return self.agent_pos.copy(), rewards, dones, info
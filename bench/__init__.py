@@ -0,0 +1,14 @@
+"""Performance benchmarks for the grid game
+
+Run from the repository root:
+
+    python -m bench                      # all cases, sizes 10 100 1000
+    python -m bench --sizes 10 100 --only step
+    python -m bench --save-baseline      # record bench/baseline.json
+    python -m bench                      # now also compares against it
+
+Results are written as JSON. When a baseline is given, or
+bench/baseline.json exists, the run exits non-zero if any case got
+slower than the allowed tolerance. Baselines are machine specific and
+are not checked in.
+"""
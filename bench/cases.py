@@ -0,0 +1,148 @@
+import os
+import numpy as np
+from environment import GridEnvironment
+from batch_environment import BatchGridEnvironment
+from agent import QLearningAgent
+from game import GridGame
+from mapgen import generate_layouts
+from bench.harness import measure, result
+
+# Element density of the default 10x10 map: 10% obstacles, 5% rewards, 5% penalties
+def element_counts(size):
+    cells = size * size
+    return max(1, cells // 10), max(1, cells // 20), max(1, cells // 20)
+
+def make_environment(size, seed=0):
+    environment = GridEnvironment(size)
+    environment.obstacle_count, environment.reward_count, environment.penalty_count = element_counts(size)
+    environment.reset(seed)
+    return environment
+
+def make_agent(size):
+    agent = QLearningAgent(size, learning_rate=0.4, discount_factor=0.97, epsilon=0.1)
+    agent.rng = np.random.default_rng(0)
+    return agent
+
+def bench_reset(size, min_time):
+    environment = make_environment(size)
+    return {'env_reset': result(measure(environment.reset, min_time), 'resets/s')}
+
+def bench_mapgen(size, min_time):
+    rng = np.random.default_rng(0)
+    batch = max(1, 4096 // (size * size))
+    counts = element_counts(size)
+    rate = measure(lambda: generate_layouts(batch, size, *counts, rng=rng), min_time)
+    return {'mapgen': result(rate * batch, 'maps/s')}
+
+def bench_step(size, min_time):
+    """Transitions/s through the interactive loop: choose, step, learn"""
+    environment = make_environment(size)
+    environment.max_steps = size * 4
+    agent = make_agent(size)
+    steps = 1000
+
+    def run():
+        state = environment.position()
+        for _ in range(steps):
+            valid_actions = agent.get_goal_directed_actions(state, environment.goal_pos, environment.grid,
+                                                            environment.goal_masks)
+            action = agent.get_action(state, valid_actions)
+            new_state, reward, done, info = environment.step(action)
+            agent.update_q_table(state, action, reward, new_state)
+            state = environment.reset() if done else new_state
+
+    results = {'env_step': result(measure(run, min_time) * steps, 'steps/s')}
+
+    if size <= 100:
+        batch_env = BatchGridEnvironment(256, size, max_steps=size * 4, seed=0,
+                                         obstacle_count=element_counts(size)[0],
+                                         reward_count=element_counts(size)[1],
+                                         penalty_count=element_counts(size)[2])
+        actions = np.zeros(256, dtype=np.int64)
+
+        def run_batch():
+            batch_env.step(actions + batch_env.rng.integers(0, 4, 256))
+
+        results['batch_step'] = result(measure(run_batch, min_time) * 256, 'steps/s')
+    return results
+
+def bench_agent(size, min_time):
+    agent = make_agent(size)
+    rng = np.random.default_rng(0)
+    count = 1000
+    states = [tuple(s) for s in rng.integers(0, size, (count, 2)).tolist()]
+    next_states = [tuple(s) for s in rng.integers(0, size, (count, 2)).tolist()]
+    actions = rng.integers(0, 4, count).tolist()
+    rewards = rng.random(count).tolist()
+
+    def update():
+        for i in range(count):
+            agent.update_q_table(states[i], actions[i], rewards[i], next_states[i])
+
+    def act():
+        for state in states:
+            agent.get_action(state, [0, 1, 2, 3])
+
+    return {
+        'update_q_table': result(measure(update, min_time) * count, 'calls/s'),
+        'get_action': result(measure(act, min_time) * count, 'calls/s'),
+    }
+
+def bench_path(size, min_time):
+    environment = make_environment(size)
+    agent = make_agent(size)
+    agent.watch(environment)
+
+    def plan():
+        agent.get_optimized_path(environment.position(), environment.goal_pos, environment.grid)
+
+    def invalidate():
+        agent.planner.grid = None
+
+    rewards = [tuple(cell) for cell in np.argwhere(environment.grid == 2).tolist()]
+
+    def consume():
+        # One reward eaten (or put back) since the last plan, as during play
+        cell = rewards[consume.count % len(rewards)]
+        environment.set_cell(*cell, 0 if environment.grid[cell] == 2 else 2)
+        consume.count += 1
+    consume.count = 0
+
+    cold = measure(plan, min_time, repeat=1, setup=invalidate)
+    warm = measure(plan, min_time)
+    changed = measure(plan, min_time, setup=consume)
+    return {
+        'path_cold': result(1000 / cold, 'ms', higher_is_better=False),
+        'path_cached': result(1000 / warm, 'ms', higher_is_better=False),
+        'path_changed': result(1000 / changed, 'ms', higher_is_better=False),
+    }
+
+def bench_draw(size, min_time, max_size=1000):
+    if size > max_size:
+        return {}
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    from ui import GameUI
+
+    environment = make_environment(size)
+    agent = make_agent(size)
+    game_state = GridGame(size)
+    game_state.reset()
+    # The game's window; large grids are zoomed out and scrolled, so cost follows the visible cells
+    ui = GameUI(grid_size=environment.grid_size)
+    ui.draw(environment, game_state, environment.position(), agent)
+
+    def draw():
+        # Move the agent so each frame has real work, as in the game
+        environment.step(environment.rng.integers(0, 4))
+        ui.draw(environment, game_state, environment.position(), agent)
+
+    return {'ui_draw': result(measure(draw, min_time), 'frames/s')}
+
+CASES = {
+    'reset': bench_reset,
+    'mapgen': bench_mapgen,
+    'step': bench_step,
+    'agent': bench_agent,
+    'path': bench_path,
+    'draw': bench_draw,
+}
@@ -0,0 +1,66 @@
+import json
+import platform
+import time
+import numpy as np
+
+def measure(fn, min_time=0.2, repeat=3, setup=None):
+    """Return the best calls/second of `fn` over `repeat` timed rounds
+
+    Each round calls fn until at least min_time has passed. setup, if
+    given, runs untimed before every call (e.g. to invalidate a cache).
+    """
+    best = 0.0
+    for _ in range(repeat):
+        calls = 0
+        elapsed = 0.0
+        while elapsed < min_time:
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            fn()
+            elapsed += time.perf_counter() - start
+            calls += 1
+        best = max(best, calls / elapsed)
+    return best
+
+def result(value, unit, higher_is_better=True):
+    return {'value': float(value), 'unit': unit, 'higher_is_better': higher_is_better}
+
+def environment_info():
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+def save(path, results):
+    with open(path, 'w') as f:
+        json.dump({'meta': environment_info(), 'results': results}, f, indent=2, sort_keys=True)
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)['results']
+
+def compare(results, baseline, tolerance):
+    """Return (name, baseline, current, change) for every case that regressed
+
+    change is the relative slowdown; a case regresses when it is worse
+    than the baseline by more than `tolerance` (0.2 = 20%).
+    """
+    regressions = []
+    for name, current in results.items():
+        if name not in baseline:
+            continue
+        old = baseline[name]['value']
+        new = current['value']
+        if old <= 0 or new <= 0:
+            continue
+        if current['higher_is_better']:
+            change = old / new - 1
+        else:
+            change = new / old - 1
+        if change > tolerance:
+            regressions.append((name, old, new, change))
+    return regressions
@@ -0,0 +1,54 @@
+import argparse
+import os
+import time
+from bench import harness
+from bench.cases import CASES
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+def run(sizes, only=None, min_time=0.2):
+    """Run the selected cases at every size and return {name/size: result}"""
+    results = {}
+    for case_name, case in CASES.items():
+        if only and not any(pattern in case_name for pattern in only):
+            continue
+        for size in sizes:
+            start = time.perf_counter()
+            for metric, value in case(size, min_time).items():
+                key = f"{metric}/{size}"
+                results[key] = value
+                print(f"{key:<24} {value['value']:>14.3f} {value['unit']}")
+            print(f"  ({case_name} at {size} took {time.perf_counter() - start:.1f}s)")
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bench', description="Grid game benchmarks")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--only', nargs='+', help=f"Run only these cases: {', '.join(CASES)}")
+    parser.add_argument('--min-time', type=float, default=0.2, help="Seconds per timed round")
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--baseline', default=None,
+                        help=f"Compare against this results file (default: {DEFAULT_BASELINE} if present)")
+    parser.add_argument('--save-baseline', action='store_true', help=f"Also write {DEFAULT_BASELINE}")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="Allowed slowdown before a case counts as a regression")
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.only, args.min_time)
+    harness.save(args.output, results)
+    print(f"Wrote {args.output}")
+    if args.save_baseline:
+        harness.save(DEFAULT_BASELINE, results)
+        print(f"Wrote {DEFAULT_BASELINE}")
+
+    baseline = args.baseline
+    if baseline is None and not args.save_baseline and os.path.exists(DEFAULT_BASELINE):
+        baseline = DEFAULT_BASELINE
+    if baseline:
+        regressions = harness.compare(results, harness.load(baseline), args.tolerance)
+        for name, old, new, change in regressions:
+            print(f"REGRESSION {name}: {old:.1f} -> {new:.1f} ({change:+.0%} slower)")
+        if regressions:
+            return 1
+        print(f"No regressions against {baseline}")
+    return 0
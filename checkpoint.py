@@ -0,0 +1,188 @@
+import os
+import struct
+import threading
+import numpy as np
+from agent import QLearningAgent
+from qtable import SparseQTable
+
+CHECKPOINT_MAGIC = b'GRIDQCKP'
+CHECKPOINT_VERSION = 3
+# magic, version, grid_size, actions, dtype, learning_rate, discount_factor, epsilon, episodes, layout
+_HEADER = struct.Struct('<8sIII8sdddQI')
+HEADER_SIZE = 64
+# Body after the header: the dense Q-table and visit counts, or the
+# sparse backend's stored states as int64 keys followed by their rows.
+# Version 1 files are dense; their unused header padding reads as layout 0.
+# Since version 3 dense visit counts are int32; older files store them in
+# the Q-table's dtype, which float16 cannot count past 2048 in.
+DENSE, SPARSE = 0, 1
+
+def read_header(path):
+    """Return the checkpoint header as a dict"""
+    with open(path, 'rb') as f:
+        raw = f.read(_HEADER.size)
+    if len(raw) < _HEADER.size:
+        raise ValueError(f"{path} is too short to be a checkpoint")
+    (magic, version, grid_size, actions, dtype, learning_rate, discount_factor,
+     epsilon, episodes, layout) = _HEADER.unpack(raw)
+    if magic != CHECKPOINT_MAGIC:
+        raise ValueError(f"{path} is not a Q-table checkpoint")
+    if version not in (1, 2, CHECKPOINT_VERSION):
+        raise ValueError(f"Unsupported checkpoint version {version}")
+    if layout not in (DENSE, SPARSE):
+        raise ValueError(f"Unknown checkpoint layout {layout}")
+    dtype = np.dtype(dtype.rstrip(b'\0').decode())
+    entries = 0
+    if layout == SPARSE:
+        entries = (os.path.getsize(path) - HEADER_SIZE) // (8 + actions * dtype.itemsize)
+    return {
+        'grid_size': grid_size,
+        'actions': actions,
+        'dtype': dtype,
+        'version': version,
+        'sparse': layout == SPARSE,
+        'entries': entries,
+        'learning_rate': learning_rate,
+        'discount_factor': discount_factor,
+        'epsilon': epsilon,
+        'episodes': episodes,
+    }
+
+def _tables(agent):
+    """Copies of what a checkpoint stores: the dense table, or (keys, rows) for a sparse backend"""
+    if agent.q_backend.dense:
+        return np.array(agent.q_table)
+    return agent.q_backend.export()
+
+def _write(path, grid_size, table, visited_counts, learning_rate, discount_factor, epsilon, episodes):
+    """Write a checkpoint atomically: a temp file renamed over the target
+
+    `table` is a dense (grid_size, grid_size, actions) array or the
+    (keys, rows) of a sparse backend, as returned by _tables().
+    """
+    if isinstance(table, tuple):
+        keys, rows = table
+        layout, values = SPARSE, np.ascontiguousarray(rows)
+    else:
+        layout, values = DENSE, np.ascontiguousarray(table)
+    header = _HEADER.pack(CHECKPOINT_MAGIC, CHECKPOINT_VERSION, grid_size, values.shape[-1],
+                          values.dtype.str.encode(), learning_rate, discount_factor, epsilon, episodes, layout)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(header.ljust(HEADER_SIZE, b'\0'))
+        if layout == SPARSE:
+            f.write(np.ascontiguousarray(keys, dtype=np.int64).tobytes())
+            f.write(values.tobytes())
+        else:
+            if visited_counts is None:
+                visited_counts = np.zeros((grid_size, grid_size))
+            f.write(values.tobytes())
+            f.write(np.ascontiguousarray(visited_counts, dtype=np.int32).tobytes())
+    os.replace(tmp_path, path)
+
+def save_checkpoint(agent, path, episodes=0):
+    """Save the agent's Q-table, visit counts and hyperparameters
+
+    Sparse backends save only their stored states, so the file follows
+    the number of visited states rather than the grid area.
+    """
+    _write(path, agent.grid_size, _tables(agent), agent.visited_counts,
+           agent.learning_rate, agent.discount_factor, agent.epsilon, episodes)
+
+def load_checkpoint(path, mode='c', agent=None):
+    """Warm-start an agent by memory-mapping a checkpoint instead of reading it
+
+    mode follows np.memmap: 'c' (default) is copy-on-write, so learning
+    stays private to this process; 'r+' writes updates straight back to
+    the file; 'r' is read-only. If an agent is passed its tables are
+    replaced, otherwise a new agent is built from the stored
+    hyperparameters, with a SparseQTable for sparse checkpoints.
+    Returns (agent, header).
+
+    The agent keeps its Q-table backend: mapping only applies to a dense
+    checkpoint loaded into a dense agent. Other combinations are copied
+    into the agent's backend, and a dense checkpoint loaded into a sparse
+    agent keeps only the states whose values were learned.
+    """
+    header = read_header(path)
+    grid_size = header['grid_size']
+    dtype = header['dtype']
+    actions = header['actions']
+    if agent is None:
+        q_backend = SparseQTable(grid_size, actions, dtype=dtype) if header['sparse'] else None
+        agent = QLearningAgent(grid_size, header['learning_rate'], header['discount_factor'], header['epsilon'],
+                               q_backend=q_backend)
+    elif agent.grid_size != grid_size:
+        raise ValueError(f"Checkpoint is for grid size {grid_size}, agent uses {agent.grid_size}")
+
+    q_shape = (grid_size, grid_size, actions)
+    if header['sparse']:
+        entries = header['entries']
+        keys = np.fromfile(path, dtype=np.int64, count=entries, offset=HEADER_SIZE)
+        rows = np.fromfile(path, dtype=dtype, count=entries * actions,
+                           offset=HEADER_SIZE + entries * 8).reshape(entries, actions)
+        if agent.q_backend.dense:
+            q_table = agent.q_table
+            q_table[...] = 0
+            q_table[keys // grid_size, keys % grid_size] = rows
+        else:
+            agent.q_backend.load(keys, rows)
+        return agent, header
+    if not agent.q_backend.dense:
+        q_table = np.memmap(path, dtype=dtype, mode='r', offset=HEADER_SIZE, shape=q_shape).reshape(-1, actions)
+        keys = np.flatnonzero((q_table != agent.q_backend.initial_value).any(axis=1))
+        agent.q_backend.load(keys, q_table[keys])
+        return agent, header
+
+    agent.q_table = np.memmap(path, dtype=dtype, mode=mode, offset=HEADER_SIZE, shape=q_shape)
+    counts_dtype = np.int32 if header['version'] >= 3 else dtype
+    agent.visited_counts = np.memmap(path, dtype=counts_dtype, mode=mode,
+                                     offset=HEADER_SIZE + int(np.prod(q_shape)) * dtype.itemsize,
+                                     shape=(grid_size, grid_size))
+    return agent, header
+
+class CheckpointWriter:
+    """Write checkpoints on a background thread
+
+    snapshot() copies the tables on the caller's thread (a memcpy) and
+    hands the copy to the writer; if a write is still pending the newer
+    snapshot replaces it, so a slow disk never queues up stale tables.
+    Episode counts passed to snapshot() are added to base_episodes, e.g.
+    the count stored in the checkpoint a run warm-started from.
+    """
+
+    def __init__(self, path, base_episodes=0):
+        self.path = path
+        self.base_episodes = base_episodes
+        self._pending = None
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def snapshot(self, agent, episodes=0):
+        """Queue a checkpoint of the agent's current tables"""
+        visited_counts = None if agent.visited_counts is None else np.array(agent.visited_counts)
+        pending = (agent.grid_size, _tables(agent), visited_counts,
+                   agent.learning_rate, agent.discount_factor, agent.epsilon,
+                   self.base_episodes + episodes)
+        with self._condition:
+            self._pending = pending
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._pending is None and not self._closed:
+                    self._condition.wait()
+                if self._pending is None:
+                    return
+                pending, self._pending = self._pending, None
+            _write(self.path, *pending)
+
+    def close(self):
+        """Flush any pending snapshot and stop the writer thread"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
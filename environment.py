@@ -1,50 +1,226 @@
+import weakref
 import numpy as np
-import random
+from mapgen import generate_layout
+from game import REWARD_VALUE, PENALTY_VALUE, GOAL_VALUE, STEP_VALUE
+
+# Row/column deltas indexed by action: Up, Right, Down, Left
+ACTION_DELTAS = ((-1, 0), (0, 1), (1, 0), (0, -1))
+
+# Action masks pack the allowed actions of a cell into 4 bits (bit a = action a).
+# MASK_ACTIONS lists the actions of each mask and MASK_BITS unpacks masks to bools.
+MASK_ACTIONS = tuple(tuple(a for a in range(4) if mask >> a & 1) for mask in range(16))
+MASK_BITS = np.array([[mask >> a & 1 for a in range(4)] for mask in range(16)], dtype=bool)
+
+def valid_action_masks(grid):
+    """Mask per cell of the moves that stay on the board and avoid obstacles
+
+    Works on a single (H, W) grid or a stack of grids (..., H, W).
+    """
+    open_cells = (np.asarray(grid) != 1).astype(np.uint8)
+    masks = np.zeros(open_cells.shape, dtype=np.uint8)
+    masks[..., 1:, :] |= open_cells[..., :-1, :]         # Up
+    masks[..., :, :-1] |= open_cells[..., :, 1:] << 1    # Right
+    masks[..., :-1, :] |= open_cells[..., 1:, :] << 2    # Down
+    masks[..., :, 1:] |= open_cells[..., :, :-1] << 3    # Left
+    return masks
+
+def goal_directed_masks(valid, goal):
+    """Valid moves that bring the agent closer to the goal, or all valid moves if none do
+
+    `goal` is a (row, col) pair, or an (N, 2) array for a stack of masks.
+    Goals may lie outside the masks, e.g. when patching a window.
+    """
+    goal = np.asarray(goal)
+    goal_x, goal_y = goal[..., 0, None, None], goal[..., 1, None, None]
+    rows = np.arange(valid.shape[-2])[:, None]
+    cols = np.arange(valid.shape[-1])[None, :]
+    toward = (rows > goal_x) | (cols < goal_y) << 1 | (rows < goal_x) << 2 | (cols > goal_y) << 3
+    preferred = valid & toward
+    return np.where(preferred != 0, preferred, valid).astype(np.uint8)
+
+def patch_action_masks(valid, grid, x, y):
+    """Update the valid masks around (x, y) after that cell changed type"""
+    rows, cols = grid.shape
+    is_open = grid[x, y] != 1
+    for action, (dx, dy) in enumerate(ACTION_DELTAS):
+        # The neighbour that reaches (x, y) by taking `action`
+        nx, ny = x - dx, y - dy
+        if 0 <= nx < rows and 0 <= ny < cols:
+            if is_open:
+                valid[nx, ny] |= 1 << action
+            else:
+                valid[nx, ny] &= ~(1 << action) & 0xF
 
 class GridEnvironment:
-    def __init__(self, grid_size=10):
+    """Single grid episode with a gym-style reset()/step() interface
+
+    Everything step() changes lives in one flat byte buffer, exposed
+    through typed views: `grid` (uint8 cell types), `visited` and
+    `consumed` (bool masks of cells entered and rewards eaten),
+    `action_masks` and `goal_masks` (the allowed and the goal-directed
+    moves of every cell, see MASK_ACTIONS), `agent_pos` and `goal_pos`
+    (int16 [row, col]) and the step count. The masks are built at reset
+    and patched by set_cell(), so deciding a move is one array lookup.
+    snapshot() and restore() are therefore a single buffer copy, cheap
+    enough for search and rollouts to branch many times per move. The
+    views are updated in place, never replaced.
+
+    Caches built from the grid (path planners) can watch() the
+    environment to hear which cells changed instead of diffing the grid.
+    """
+
+    def __init__(self, grid_size=10, max_steps=None):
         self.grid_size = grid_size
-        self.grid = np.zeros((grid_size, grid_size))
-        self.agent_pos = [0, 0]
-        self.goal_pos = [grid_size-1, grid_size-1]
-        self.visited = set()
+        self.max_steps = max_steps  # Truncate episodes after this many steps (None = no limit)
+
+        cells = grid_size * grid_size
+        counters = -(-5 * cells // 8) * 8  # Keep the int64 step counter aligned
+        self._state = np.zeros(counters + 16, dtype=np.uint8)
+        shape = (grid_size, grid_size)
+        self.grid = self._view(np.uint8, 0, shape)  # Cell types 0-4
+        self.visited = self._view(np.bool_, cells, shape)
+        self.consumed = self._view(np.bool_, 2 * cells, shape)
+        self.action_masks = self._view(np.uint8, 3 * cells, shape)
+        self.goal_masks = self._view(np.uint8, 4 * cells, shape)
+        self._steps = self._view(np.int64, counters, (1,))
+        self.agent_pos = self._view(np.int16, counters + 8, (2,))
+        self.goal_pos = self._view(np.int16, counters + 12, (2,))
+        self.goal_pos[:] = grid_size - 1
+        self.rng = np.random.default_rng()
+        self._watchers = weakref.WeakSet()
+
+        # Layout settings used by reset()
+        self.obstacle_count = 10
+        self.reward_count = 5
+        self.penalty_count = 5
+        self.min_goal_distance = None  # None keeps the goal in the far corner
+
+        # Scoring used by step(), defaults match GridGame
+        self.reward_value = REWARD_VALUE
+        self.penalty_value = PENALTY_VALUE
+        self.goal_value = GOAL_VALUE
+        self.step_value = STEP_VALUE
         self.reset()
-    
-    def reset(self):
-        self.grid.fill(0)
-        self.agent_pos = [0, 0]
-        self.goal_pos = [self.grid_size-1, self.grid_size-1]
-        self.visited = set()
-        self.visited.add(tuple(self.agent_pos))
-        
-        # Place elements
-        self._place_elements(1, 10)  # Obstacles
-        self._place_elements(2, 5)    # Rewards
-        self._place_elements(3, 5)    # Penalties
-        self.grid[self.goal_pos[0]][self.goal_pos[1]] = 4  # Goal
-        
-    def _place_elements(self, element_type, count):
-        placed = 0
-        while placed < count:
-            # Avoid placing obstacles near start and goal
-            x, y = random.randint(0, self.grid_size-1), random.randint(0, self.grid_size-1)
-            start_dist = abs(x - 0) + abs(y - 0)
-            goal_dist = abs(x - (self.grid_size-1)) + abs(y - (self.grid_size-1))
-            
-            if (start_dist < 3 or goal_dist < 3):  # Keep start and goal areas clear
-                continue
-            if self.grid[x][y] != 0:
-                continue
-                
-            self.grid[x][y] = element_type
-            placed += 1
-    
+
+    def _view(self, dtype, offset, shape):
+        return np.ndarray(shape, dtype=dtype, buffer=self._state, offset=offset)
+
+    @property
+    def steps(self):
+        return int(self._steps[0])
+
+    @steps.setter
+    def steps(self, value):
+        self._steps[0] = value
+
+    def position(self):
+        """Agent position as a tuple of Python ints (the observation format)"""
+        x, y = self.agent_pos.tolist()
+        return x, y
+
+    def snapshot(self):
+        """Copy of the episode state, for restore()"""
+        return self._state.copy()
+
+    def restore(self, snapshot):
+        """Return to a state taken with snapshot() on an environment of the same size"""
+        np.copyto(self._state, snapshot)
+        for watcher in self._watchers:
+            watcher.grid_replaced()
+
+    def watch(self, watcher):
+        """Report grid changes to `watcher` until it is garbage collected
+
+        watcher.cell_changed(x, y) is called after set_cell() and when a
+        reward is eaten, watcher.grid_replaced() after reset() and
+        restore(). Only a weak reference is kept.
+        """
+        self._watchers.add(watcher)
+
+    def reset(self, seed=None, layout=None):
+        """Start a new episode and return the initial observation
+
+        A layout (e.g. a map from a MapLibrary) is used as-is, otherwise a
+        solvable map is generated from the configured element counts.
+        """
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        if layout is None:
+            layout, goal = generate_layout(self.grid_size, self.obstacle_count, self.reward_count,
+                                           self.penalty_count, self.min_goal_distance, rng=self.rng)
+        else:
+            goals = np.argwhere(np.asarray(layout) == 4)
+            if len(goals) == 0:
+                raise ValueError("layout has no goal cell")
+            goal = goals[0]
+
+        self._state.fill(0)
+        self.grid[:] = layout
+        self.goal_pos[:] = goal[0], goal[1]
+        self.visited[0, 0] = True
+        self.action_masks[:] = valid_action_masks(self.grid)
+        self.goal_masks[:] = goal_directed_masks(self.action_masks, self.goal_pos)
+        for watcher in self._watchers:
+            watcher.grid_replaced()
+        return 0, 0
+
+    def set_cell(self, x, y, value):
+        """Change one cell's type, keeping the action masks around it current"""
+        was_open = self.grid[x, y] != 1
+        self.grid[x, y] = value
+        if was_open != (value != 1):
+            patch_action_masks(self.action_masks, self.grid, x, y)
+            rows = slice(max(0, x - 1), x + 2)
+            cols = slice(max(0, y - 1), y + 2)
+            goal = self.goal_pos - (rows.start, cols.start)
+            self.goal_masks[rows, cols] = goal_directed_masks(self.action_masks[rows, cols], goal)
+        for watcher in self._watchers:
+            watcher.cell_changed(x, y)
+
+    def step(self, action):
+        """Apply one action and return (observation, reward, done, info)
+
+        Moves into walls or obstacles leave the agent in place and cost
+        a normal step. Reward cells are consumed when entered.
+        """
+        dx, dy = ACTION_DELTAS[action]
+        px, py = self.agent_pos.tolist()
+        blocked = not self.action_masks[px, py] >> action & 1
+        if blocked:
+            x, y = px, py
+        else:
+            x, y = px + dx, py + dy
+            self.agent_pos[:] = x, y
+            self.visited[x, y] = True
+        self._steps[0] += 1
+        steps = int(self._steps[0])
+
+        cell_value = int(self.grid[x, y])
+        won = False
+        if blocked or cell_value == 0:  # Empty
+            reward = self.step_value
+        elif cell_value == 2:  # Reward
+            reward = self.reward_value
+            self.grid[x, y] = 0
+            self.consumed[x, y] = True
+            for watcher in self._watchers:
+                watcher.cell_changed(x, y)
+        elif cell_value == 3:  # Penalty
+            reward = self.penalty_value
+        else:  # Goal
+            reward = self.goal_value
+            won = True
+
+        truncated = not won and self.max_steps is not None and steps >= self.max_steps
+        info = {'won': won, 'blocked': blocked, 'truncated': truncated, 'cell': cell_value}
+        return (x, y), reward, won or truncated, info
+
     def get_cell_value(self, x, y):
         if 0 <= x < self.grid_size and 0 <= y < self.grid_size:
-            return self.grid[x][y]
+            return self.grid[x, y]
         return None
-    
+
     def is_valid_position(self, x, y):
-        return (0 <= x < self.grid_size and 
-                0 <= y < self.grid_size and 
-                self.grid[x][y] != 1)  # Not an obstacle
\ No newline at end of file
+        return (0 <= x < self.grid_size and
+                0 <= y < self.grid_size and
+                self.grid[x, y] != 1)  # Not an obstacle
\ No newline at end of file
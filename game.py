@@ -1,5 +1,11 @@
 import time
 
+# Default scoring, shared with GridEnvironment.step
+REWARD_VALUE = 15    # Increased from 10
+PENALTY_VALUE = -5   # Reduced from -10
+GOAL_VALUE = 150     # Increased from 100
+STEP_VALUE = -0.5    # Reduced penalty from -1
+
 class GridGame:
     def __init__(self, grid_size=10, time_limit=30):
         self.grid_size = grid_size
@@ -9,12 +15,16 @@ class GridGame:
         self.game_over = False
         self.won = False
         self.start_time = 0
+        self.elapsed = 0.0  # Simulated seconds, advanced by the game loop
         self.showing_path = False
         self.move_direction = None
         self.move_progress = 0
         self.animation_path = []
         self.animation_index = 0
-        self.animation_speed = 1.0
+        self.reward_value = REWARD_VALUE
+        self.penalty_value = PENALTY_VALUE
+        self.goal_value = GOAL_VALUE
+        self.step_value = STEP_VALUE
     
     def reset(self):
         self.score = 0
@@ -22,15 +32,22 @@ class GridGame:
         self.game_over = False
         self.won = False
         self.start_time = time.time()
+        self.elapsed = 0.0
         self.showing_path = False
         self.move_direction = None
         self.move_progress = 0
         self.animation_path = []
         self.animation_index = 0
     
+    def advance(self, dt):
+        """Advance the game clock by dt simulated seconds"""
+        self.elapsed += dt
+
+    def time_left(self):
+        return max(0, self.time_limit - self.elapsed)
+
     def check_time_limit(self):
-        elapsed = time.time() - self.start_time
-        if elapsed > self.time_limit and not self.game_over:
+        if self.elapsed > self.time_limit and not self.game_over:
             self.game_over = True
             self.won = False
             return True
@@ -41,30 +58,23 @@ class GridGame:
         cell_value = grid[x][y]
         
         if cell_value == 2:  # Reward
-            self.score += 15  # Increased from 10
-            return 15, False
+            self.score += self.reward_value
+            return self.reward_value, False
         elif cell_value == 3:  # Penalty
-            self.score -= 5   # Reduced from -10
-            return -5, False
+            self.score += self.penalty_value
+            return self.penalty_value, False
         elif cell_value == 4:  # Goal
-            self.score += 150  # Increased from 100
+            self.score += self.goal_value
             self.game_over = True
             self.won = True
-            return 150, True
+            return self.goal_value, True
         else:  # Empty cell
-            self.score -= 0.5  # Reduced penalty from -1
-            return -0.5, False
+            self.score += self.step_value
+            return self.step_value, False
     
-    def update_animation(self):
-        if self.move_progress < 1:
-            self.move_progress = min(1, self.move_progress + 0.1)
-            return False
-        
-        if (self.animation_index < len(self.animation_path) - 1 and 
-            time.time() - self.last_animation_time > self.animation_speed):
+    def advance_animation(self):
+        """Move to the next cell of animation_path; the game loop calls this once per move tick"""
+        if self.animation_index < len(self.animation_path) - 1:
             self.animation_index += 1
-            self.last_animation_time = time.time()
-            self.move_progress = 0
             return True
-        
         return False
\ No newline at end of file
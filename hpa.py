@@ -0,0 +1,508 @@
+import heapq
+import threading
+import numpy as np
+from environment import ACTION_DELTAS
+from planner import DistanceFieldPlanner, GridChanges
+
+def _flipped(array, axis, flip):
+    """View of a (k, h, w) array, reversed along axis if flip"""
+    if not flip:
+        return array
+    return array[:, ::-1] if axis == 1 else array[:, :, ::-1]
+
+def _relax(dist, cost):
+    """Lower dist[cell] to dist[neighbour] + cost[cell] until nothing changes, in place
+
+    Each pass sweeps the four directions with a prefix-sum trick: along
+    a row, dist[i] = S[i] + min(dist[j] - S[j] for j <= i) where S is the
+    running sum of cost. Straight runs settle in one pass, so passes
+    follow the number of turns in a path instead of its length.
+    Obstacles (inf cost) take a finite stand-in larger than any real
+    path and are set back to inf at the end.
+
+    dist is (k, h, w) with cost (h, w) or one (k, h, w) cost per field;
+    fields that have settled drop out of later passes.
+    """
+    finite = np.isfinite(cost)
+    wall = cost.shape[-1] * cost.shape[-2] * cost[finite].max(initial=1) + 1  # Above any simple path
+    cost = np.broadcast_to(np.where(finite, cost, wall), dist.shape)
+    sweeps = [(axis, flip, np.cumsum(_flipped(cost, axis, flip), axis=axis))
+              for axis in (1, 2) for flip in (False, True)]
+    active = np.arange(len(dist))
+    while len(active):
+        fields = dist[active]
+        before = fields.copy()
+        for axis, flip, sums in sweeps:
+            if len(active) < len(dist):
+                sums = sums[active]
+            view = _flipped(fields, axis, flip)
+            np.minimum(view, sums + np.minimum.accumulate(view - sums, axis=axis), out=view)
+        dist[active] = fields
+        active = active[(fields != before).any(axis=(1, 2))]
+    dist[dist >= wall] = np.inf
+
+def predecessors(dist):
+    """Action towards each cell's cheapest neighbour in dist (4 at sources and unreachable cells)
+
+    Following these moves from any cell walks a field made by
+    relax_from back to its source.
+    """
+    padded = np.pad(dist, [(0, 0)] * (dist.ndim - 2) + [(1, 1), (1, 1)], constant_values=np.inf)
+    neighbours = np.stack([padded[..., :-2, 1:-1], padded[..., 1:-1, 2:],
+                           padded[..., 2:, 1:-1], padded[..., 1:-1, :-2]])
+    moves = np.argmin(neighbours, axis=0).astype(np.uint8)
+    moves[(dist == 0) | ~np.isfinite(dist)] = 4
+    return moves
+
+def relax_from(cost, sources):
+    """(k, h, w) cheapest cost from each source cell to every cell of `cost`
+
+    Entering a cell costs cost[cell]; all sources are solved together.
+    """
+    dist = np.full((len(sources),) + cost.shape, np.inf)
+    rows, cols = zip(*sources)
+    dist[np.arange(len(sources)), rows, cols] = 0
+    _relax(dist, cost)
+    return dist
+
+def relax_to(cost, target):
+    """(h, w) cheapest cost from every cell of `cost` to the target cell"""
+    # Cost to the target including the cell's own entry cost relaxes like relax_from
+    dist = np.full((1,) + cost.shape, np.inf)
+    dist[(0,) + target] = cost[target]
+    _relax(dist, cost)
+    dist = dist[0] - np.where(np.isfinite(cost), cost, 0)
+    dist[target] = 0
+    return dist
+
+class HierarchicalPlanner:
+    """HPA*-style planner for grids too large for a whole-grid distance field
+
+    The grid is cut into cluster_size x cluster_size clusters. Where two
+    neighbouring clusters share a run of open border cells, the run's
+    middle (or both ends, for long runs) becomes an entrance: a node on
+    each side joined by a one-step edge. Each cluster stores the cheapest
+    in-cluster cost between its entrance nodes, which gives an abstract
+    graph far smaller than the grid. Cell costs match
+    DistanceFieldPlanner.
+
+    For a goal, one reverse Dijkstra over the abstract graph gives every
+    node its cost to the goal and next node. A query then only solves
+    the start's cluster. get_path() refines the abstract route cell by
+    cell from stored in-cluster predecessor moves.
+
+    Paths are not optimal: routes only cross clusters at entrances and
+    follow the cheapest way between them. Nothing bounds the excess. On
+    random 200x200 maps with the default cluster size, paths cost a
+    median 1.01x the DistanceFieldPlanner optimum and up to about 1.2x.
+    Small clusters do worse, past 1.6x in some cases with 4x4 clusters.
+
+    update() rebuilds only the clusters that changed, and their borders
+    if obstacles moved. After watch() the environment reports which
+    cells changed; otherwise the grid is compared with the cached copy. Only
+    the nodes whose route ran through those clusters have their goal
+    costs solved again.
+
+    The first build solves every cluster up front: about 7-8 s on a
+    1000x1000 grid. prepare() runs it on a background thread, so a game
+    can start it early and keep drawing; queries made before it finishes
+    wait for it. After that, on the same watched grid, a full path takes
+    2-3 ms and a path after one reward was eaten about 4 ms (bench
+    path_cold, path_cached and path_changed).
+    """
+
+    def __init__(self, cluster_size=16, penalty_cost=4.0, reward_cost=0.5, long_entrance=6, batch_nodes=4096):
+        self.cluster_size = cluster_size
+        self.long_entrance = long_entrance  # Runs at least this long get an entrance at each end
+        self.batch_nodes = batch_nodes      # Entrances solved together when building clusters
+        self.field = DistanceFieldPlanner(penalty_cost, reward_cost)  # For cell costs
+        self.grid = None
+        self.goal = None
+        self.cost = None
+        self.borders = {}    # (cluster, cluster) -> [(cell, cell)] entrance pairs
+        self.entrances = {}  # cluster -> {cell: [cells across the border]}
+        self.nodes = {}      # cluster -> entrance cells in matrix order
+        self.intra = {}      # cluster -> (k, k) costs between its nodes, row = from
+        self.moves = {}      # cluster -> (k, h, w) predecessors() of each node's field
+        self.goal_cost = None  # node -> cost to the goal
+        self.goal_next = None  # node -> next node towards the goal (None: walk to the goal locally)
+        self.goal_children = None  # node -> nodes whose next node it is
+        self.goal_local = None  # Cost to the goal within the goal's cluster
+        self.changes = None  # GridChanges of the watched environment
+        self._worker = None  # Thread running a prepare()
+        self._error = None   # Exception it raised, re-raised by the next query
+
+    def watch(self, environment):
+        """Take changed cells from the environment instead of diffing its grid"""
+        self.changes = GridChanges(environment)
+
+    def cluster_of(self, x, y):
+        return x // self.cluster_size, y // self.cluster_size
+
+    def _bounds(self, cluster):
+        """Row and column slices of a cluster"""
+        size = self.cluster_size
+        i, j = cluster
+        return slice(i * size, min((i + 1) * size, self.grid.shape[0])), \
+            slice(j * size, min((j + 1) * size, self.grid.shape[1]))
+
+    def _neighbour_clusters(self, cluster):
+        rows, cols = -(-self.grid.shape[0] // self.cluster_size), -(-self.grid.shape[1] // self.cluster_size)
+        i, j = cluster
+        return [(i + di, j + dj) for di, dj in ACTION_DELTAS if 0 <= i + di < rows and 0 <= j + dj < cols]
+
+    def update(self, grid, goal):
+        """Bring the abstract graph in line with `grid` and `goal`"""
+        self._wait()
+        grid = np.asarray(grid)
+        self._update(grid, (int(goal[0]), int(goal[1])), None if self.changes is None else self.changes.take(grid))
+
+    def prepare(self, grid, goal):
+        """Start update() on a background thread; returns True once queries will not wait
+
+        The grid is copied first, so the caller can keep playing. Cells
+        that change meanwhile are picked up by a later update() or prepare().
+        """
+        if not self.ready():
+            return False
+        self._wait()
+        goal = (int(goal[0]), int(goal[1]))
+        grid = np.asarray(grid)
+        changed = None if self.changes is None else self.changes.take(grid)
+        if changed is not None and self.goal == goal and self.goal_cost is not None:
+            # Only reported cells changed since the last build: a quick repair
+            self._update(grid, goal, changed)
+            return True
+        self._worker = threading.Thread(target=self._prepare, args=(grid.copy(), goal, changed), daemon=True)
+        self._worker.start()
+        return False
+
+    def ready(self):
+        """False while a prepare() is still running"""
+        return self._worker is None or not self._worker.is_alive()
+
+    def _prepare(self, grid, goal, changed):
+        try:
+            self._update(grid, goal, changed)
+        except Exception as e:
+            self._error = e
+
+    def _wait(self):
+        """Let a running prepare() finish, passing on anything it raised"""
+        if self._worker is not None:
+            self._worker.join()
+            self._worker = None
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def _update(self, grid, goal, changed):
+        if self.grid is None or grid.shape != self.grid.shape:
+            self._rebuild(grid)
+        elif changed is None:
+            if not np.array_equal(grid, self.grid):
+                self._apply_changes(grid, np.argwhere(grid != self.grid), goal == self.goal)
+        else:
+            changed = [cell for cell in changed if grid[cell] != self.grid[cell]]
+            if changed:
+                self._apply_changes(grid, np.array(changed), goal == self.goal)
+        if goal != self.goal or self.goal_cost is None:
+            self.goal = goal
+            self._solve_goal()
+
+    def _rebuild(self, grid):
+        self.grid = grid.copy()
+        self.cost = self.field.cell_costs(grid)
+        self.borders, self.entrances = {}, {}
+        rows, cols = -(-grid.shape[0] // self.cluster_size), -(-grid.shape[1] // self.cluster_size)
+        clusters = [(i, j) for i in range(rows) for j in range(cols)]
+        for cluster in clusters:
+            self.entrances[cluster] = {}
+        for i, j in clusters:
+            if i + 1 < rows:
+                self._find_entrances((i, j), (i + 1, j))
+            if j + 1 < cols:
+                self._find_entrances((i, j), (i, j + 1))
+        self._build_clusters(clusters)
+        self.goal_cost = None
+
+    def _apply_changes(self, grid, changed, repair):
+        """Rebuild the clusters holding changed cells (and their borders if passability changed)
+
+        With `repair`, the goal costs of the nodes routed through those
+        clusters are solved again; the rest of the abstract graph keeps its costs.
+        """
+        cells = tuple(changed.T)
+        passability = (self.grid[cells] == 1) != (grid[cells] == 1)
+        self.grid[cells] = grid[cells]
+        self.cost[cells] = self.field.cell_costs(grid[cells])
+
+        dirty = {self.cluster_of(x, y) for x, y in changed.tolist()}
+        for x, y in changed[passability].tolist():
+            cluster = self.cluster_of(x, y)
+            for other in self._neighbour_clusters(cluster):
+                self._find_entrances(min(cluster, other), max(cluster, other))
+                dirty.add(other)
+        old_nodes = [node for cluster in dirty for node in self.nodes[cluster]]
+        self._build_clusters(dirty)
+        if repair and self.goal_cost is not None:
+            self._repair_goal(dirty, old_nodes)
+        else:
+            self.goal_cost = None
+
+    def _find_entrances(self, a, b):
+        """(Re)place the entrances on the border between clusters a and b (b below or right of a)"""
+        for cell_a, cell_b in self.borders.pop((a, b), []):
+            for cluster, cell, other in ((a, cell_a, cell_b), (b, cell_b, cell_a)):
+                partners = self.entrances[cluster][cell]
+                partners.remove(other)
+                if not partners:
+                    del self.entrances[cluster][cell]
+
+        rows_a, cols_a = self._bounds(a)
+        if a[0] != b[0]:  # b is below: a's last row faces b's first row
+            line = [(rows_a.stop - 1, y) for y in range(cols_a.start, cols_a.stop)]
+            step = (1, 0)
+        else:  # b is to the right
+            line = [(x, cols_a.stop - 1) for x in range(rows_a.start, rows_a.stop)]
+            step = (0, 1)
+        open_pairs = [(x, y) for x, y in line
+                      if self.grid[x, y] != 1 and self.grid[x + step[0], y + step[1]] != 1]
+
+        pairs = []
+        run = []
+        for cell in open_pairs + [None]:
+            if run and (cell is None or cell[0] - run[-1][0] + cell[1] - run[-1][1] != 1):
+                if len(run) >= self.long_entrance:
+                    pairs += [run[0], run[-1]]
+                else:
+                    pairs.append(run[len(run) // 2])
+                run = []
+            if cell is not None:
+                run.append(cell)
+
+        self.borders[(a, b)] = []
+        for x, y in pairs:
+            cell_a, cell_b = (x, y), (x + step[0], y + step[1])
+            self.borders[(a, b)].append((cell_a, cell_b))
+            self.entrances[a].setdefault(cell_a, []).append(cell_b)
+            self.entrances[b].setdefault(cell_b, []).append(cell_a)
+
+    def _build_clusters(self, clusters):
+        """Costs between each cluster's entrances, solving many clusters per array pass"""
+        batch, count = [], 0
+        for cluster in clusters:
+            nodes = list(self.entrances[cluster])
+            self.nodes[cluster] = nodes
+            if not nodes:
+                self.intra[cluster] = np.zeros((0, 0))
+                self.moves[cluster] = None
+                continue
+            batch.append(cluster)
+            count += len(nodes)
+            if count >= self.batch_nodes:
+                self._solve_clusters(batch)
+                batch, count = [], 0
+        if batch:
+            self._solve_clusters(batch)
+
+    def _solve_clusters(self, clusters):
+        size = self.cluster_size
+        costs = np.full((len(clusters), size, size), np.inf)  # Short edge clusters padded with walls
+        sources = []
+        for index, cluster in enumerate(clusters):
+            rows, cols = self._bounds(cluster)
+            costs[index, :rows.stop - rows.start, :cols.stop - cols.start] = self.cost[rows, cols]
+            sources += [(index, x - rows.start, y - cols.start) for x, y in self.nodes[cluster]]
+        owner, source_rows, source_cols = np.array(sources).T
+        dist = np.full((len(sources), size, size), np.inf)
+        dist[np.arange(len(sources)), source_rows, source_cols] = 0
+        _relax(dist, costs[owner])
+        moves = predecessors(dist)
+
+        start = 0
+        for cluster in clusters:
+            rows, cols = self._bounds(cluster)
+            count = len(self.nodes[cluster])
+            local = slice(start, start + count)
+            self.intra[cluster] = dist[local, source_rows[local], source_cols[local]]
+            self.moves[cluster] = moves[local, :rows.stop - rows.start, :cols.stop - cols.start].copy()
+            start += count
+
+    def _edges_into(self, node):
+        """(other, cost) of the abstract edges that end at node"""
+        cluster = self.cluster_of(*node)
+        nodes = self.nodes[cluster]
+        column = self.intra[cluster][:, nodes.index(node)].tolist()
+        edges = [(other, cost) for other, cost in zip(nodes, column) if other != node]
+        return edges + [(other, self.cost[node]) for other in self.entrances[cluster][node]]
+
+    def _edges_from(self, node):
+        """(other, cost) of the abstract edges that start at node"""
+        cluster = self.cluster_of(*node)
+        nodes = self.nodes[cluster]
+        row = self.intra[cluster][nodes.index(node)].tolist()
+        edges = [(other, cost) for other, cost in zip(nodes, row) if other != node]
+        return edges + [(other, self.cost[other]) for other in self.entrances[cluster][node]]
+
+    def _goal_exit(self, node):
+        """Cost from a node of the goal's cluster to the goal, staying in the cluster"""
+        rows, cols = self._bounds(self.cluster_of(*self.goal))
+        return self.goal_local[node[0] - rows.start, node[1] - cols.start]
+
+    def _solve_goal_local(self):
+        rows, cols = self._bounds(self.cluster_of(*self.goal))
+        self.goal_local = relax_to(self.cost[rows, cols], (self.goal[0] - rows.start, self.goal[1] - cols.start))
+
+    def _set_next(self, node, next_node):
+        old = self.goal_next.pop(node, None)
+        if old is not None:
+            self.goal_children[old].discard(node)
+        self.goal_next[node] = next_node
+        if next_node is not None:
+            self.goal_children.setdefault(next_node, set()).add(node)
+
+    def _solve_goal(self):
+        """Reverse Dijkstra over the abstract graph from the goal"""
+        self._solve_goal_local()
+        self.goal_cost, self.goal_next, self.goal_children = {}, {}, {}
+        self._propagate([(self._goal_exit(node), node, None) for node in self.nodes[self.cluster_of(*self.goal)]])
+
+    def _repair_goal(self, dirty, old_nodes):
+        """Re-solve the goal costs of nodes whose route ran through the dirty clusters"""
+        goal_cluster = self.cluster_of(*self.goal)
+        if goal_cluster in dirty:
+            self._solve_goal_local()
+
+        # Every node routed through a dirty cluster may have lost its route
+        affected = set()
+        stack = old_nodes + [node for cluster in dirty for node in self.nodes[cluster]]
+        while stack:
+            node = stack.pop()
+            if node not in affected:
+                affected.add(node)
+                stack.extend(self.goal_children.get(node, ()))
+        for node in affected:
+            self.goal_cost.pop(node, None)
+            parent = self.goal_next.pop(node, None)
+            if parent is not None and parent not in affected:
+                self.goal_children[parent].discard(node)
+        for node in affected:
+            self.goal_children.pop(node, None)
+
+        # Restart them from their unaffected neighbours (or the goal itself)
+        seeds = []
+        for node in affected:
+            cluster = self.cluster_of(*node)
+            if node not in self.entrances[cluster]:
+                continue  # No longer an entrance
+            best_cost, best_next = np.inf, None
+            if cluster == goal_cluster:
+                best_cost = self._goal_exit(node)
+            for other, cost in self._edges_from(node):
+                cost += self.goal_cost.get(other, np.inf)
+                if cost < best_cost:
+                    best_cost, best_next = cost, other
+            seeds.append((best_cost, node, best_next))
+        self._propagate(seeds)
+
+    def _propagate(self, seeds):
+        """Dijkstra outwards from (cost, node, next node) seeds, keeping any cheaper known costs"""
+        heap = []
+        for cost, node, next_node in seeds:
+            if cost < self.goal_cost.get(node, np.inf):
+                self.goal_cost[node] = cost
+                self._set_next(node, next_node)
+                heap.append((cost, node))
+        heapq.heapify(heap)
+
+        while heap:
+            cost, node = heapq.heappop(heap)
+            if self.goal_cost.get(node) != cost:
+                continue  # Superseded by a cheaper route
+            for other, step in self._edges_into(node):
+                new_cost = cost + step
+                if new_cost < self.goal_cost.get(other, np.inf):
+                    self.goal_cost[other] = new_cost
+                    self._set_next(other, node)
+                    heapq.heappush(heap, (new_cost, other))
+
+    def _entry(self, start):
+        """Cheapest (cost, entrance) to leave the start cluster by, with the start's local field
+
+        The entrance is None when walking straight to the goal inside the
+        cluster is best.
+        """
+        cluster = self.cluster_of(*start)
+        rows, cols = self._bounds(cluster)
+        field = relax_from(self.cost[rows, cols], [(start[0] - rows.start, start[1] - cols.start)])[0]
+        best_cost, best_node = np.inf, None
+        if cluster == self.cluster_of(*self.goal):
+            best_cost = field[self.goal[0] - rows.start, self.goal[1] - cols.start]
+        for node in self.nodes[cluster]:
+            cost = field[node[0] - rows.start, node[1] - cols.start] + self.goal_cost.get(node, np.inf)
+            if cost < best_cost:
+                best_cost, best_node = cost, node
+        return best_cost, best_node, field
+
+    def distance(self, start_pos, goal_pos, grid):
+        """Cost of the planned route from start to goal (inf if unreachable)"""
+        self.update(grid, goal_pos)
+        return float(self._entry((int(start_pos[0]), int(start_pos[1])))[0])
+
+    def _walk_back(self, moves, origin, end):
+        """Cells from a field's source to `end`, following predecessors() moves backwards"""
+        x, y = end[0] - origin[0], end[1] - origin[1]
+        cells = [[x + origin[0], y + origin[1]]]
+        move = moves[x, y]
+        while move != 4:
+            dx, dy = ACTION_DELTAS[move]
+            x, y = x + dx, y + dy
+            cells.append([x + origin[0], y + origin[1]])
+            move = moves[x, y]
+        cells.reverse()
+        return cells
+
+    def get_path(self, start_pos, goal_pos, grid):
+        """Path from start to goal as a list of [x, y] cells (same format as DistanceFieldPlanner)
+
+        Returns just the start cell if the goal is unreachable.
+        """
+        self.update(grid, goal_pos)
+        start = (int(start_pos[0]), int(start_pos[1]))
+        cost, node, field = self._entry(start)
+        if not np.isfinite(cost):
+            return [list(start)]
+
+        cluster = self.cluster_of(*start)
+        origin = (self._bounds(cluster)[0].start, self._bounds(cluster)[1].start)
+        path = self._walk_back(predecessors(field), origin, node if node is not None else self.goal)
+        while node is not None:
+            next_node = self.goal_next[node]
+            if next_node is None:
+                break
+            cluster = self.cluster_of(*node)
+            if self.cluster_of(*next_node) == cluster:
+                rows, cols = self._bounds(cluster)
+                moves = self.moves[cluster][self.nodes[cluster].index(node)]
+                path += self._walk_back(moves, (rows.start, cols.start), next_node)[1:]
+            else:
+                path.append(list(next_node))
+            node = next_node
+
+        if node is not None:
+            # Finish inside the goal's cluster, downhill on its local field
+            rows, cols = self._bounds(self.cluster_of(*self.goal))
+            x, y = node[0] - rows.start, node[1] - cols.start
+            height, width = self.goal_local.shape
+            while self.goal_local[x, y] > 0:
+                best, step = np.inf, None
+                for dx, dy in ACTION_DELTAS:
+                    nx, ny = x + dx, y + dy
+                    if 0 <= nx < height and 0 <= ny < width:
+                        value = self.cost[nx + rows.start, ny + cols.start] + self.goal_local[nx, ny]
+                        if value < best:
+                            best, step = value, (nx, ny)
+                x, y = step
+                path.append([x + rows.start, y + cols.start])
+        return path
@@ -0,0 +1,146 @@
+import multiprocessing as mp
+import time
+from multiprocessing import shared_memory
+import numpy as np
+from environment import GridEnvironment
+from agent import QLearningAgent
+from replay import make_replay
+from trainer import run_episode
+
+# Shared header slots, all int64
+VERSION, GENERATION, EPISODES, WINS = range(4)
+ENV_SETTINGS = ('obstacle_count', 'reward_count', 'penalty_count', 'min_goal_distance',
+                'reward_value', 'penalty_value', 'goal_value', 'step_value')
+# Spawn rather than fork: the game process holds pygame, a display and
+# threads, none of which survive fork. The child only gets the shared
+# memory name and plain parameters.
+_CONTEXT = mp.get_context('spawn')
+
+def _learn(shm_name, shape, commands, learning_params, env_config, max_steps, replay_mode,
+           replay_updates, publish_interval):
+    """Process entry point: train on the latest layout and publish tables"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        header = np.ndarray(4, dtype=np.int64, buffer=shm.buf)
+        tables = np.ndarray((2,) + shape, dtype=np.float64, buffer=shm.buf, offset=header.nbytes)
+        _train_forever(header, tables, commands, shape[0], learning_params, env_config, max_steps,
+                       replay_mode, replay_updates, publish_interval)
+        del header, tables
+    finally:
+        shm.close()
+
+def _train_forever(header, tables, commands, grid_size, learning_params, env_config, max_steps,
+                   replay_mode, replay_updates, publish_interval):
+    environment = GridEnvironment(grid_size, max_steps=max_steps)
+    for name, value in env_config.items():
+        setattr(environment, name, value)
+    agent = QLearningAgent(grid_size, **learning_params)
+    agent.q_table[:] = tables[header[VERSION] % 2]
+    replay = make_replay(replay_mode, grid_size, replay_updates)
+
+    version = int(header[VERSION])
+    generation = int(header[GENERATION])
+    layout = None
+    last_publish = time.perf_counter()
+    while True:
+        # Take every queued command; wait for one while there is nothing to train on
+        while layout is None or not commands.empty():
+            command = commands.get()
+            if command is None:
+                return
+            layout, generation, reset = command
+            if reset:
+                agent.q_table.fill(0)
+            if replay is not None:
+                replay.new_map()
+
+        _, _, won = run_episode(agent, environment, layout=layout, replay=replay)
+        header[EPISODES] += 1
+        header[WINS] += won
+
+        now = time.perf_counter()
+        if now - last_publish >= publish_interval:
+            # Fill the buffer readers are not using, then flip the version to it.
+            # The version is written after the table, so a reader that sees
+            # the same version before and after its copy got a whole table.
+            tables[(version + 1) % 2] = agent.q_table
+            header[GENERATION] = generation
+            version += 1
+            header[VERSION] = version
+            last_publish = now
+
+class BackgroundLearner:
+    """Trains on the current layout in a subprocess while the game renders
+
+    The learner plays simulated episodes of the layout given to
+    set_layout() as fast as it can, starting from the agent's Q-table,
+    and every `publish_interval` seconds publishes its table into one of
+    two shared-memory buffers and bumps a version number. poll() copies
+    the newest table into the on-screen agent without taking any lock:
+    it checks the version before and after the copy and simply keeps the
+    old table if the learner published over it meanwhile. Only dense
+    Q-table backends are supported.
+    """
+
+    def __init__(self, agent, environment, max_steps=200, replay_mode='dyna', replay_updates=4,
+                 publish_interval=0.1):
+        if not agent.q_backend.dense:
+            raise ValueError("BackgroundLearner needs a dense Q-table backend")
+        self.shape = agent.q_table.shape
+        self.generation = 0
+        self.version = 0
+        header_bytes = 4 * 8
+        self._shm = shared_memory.SharedMemory(create=True, size=header_bytes + 2 * int(np.prod(self.shape)) * 8)
+        self._header = np.ndarray(4, dtype=np.int64, buffer=self._shm.buf)
+        self._header.fill(0)
+        self._tables = np.ndarray((2,) + self.shape, dtype=np.float64, buffer=self._shm.buf, offset=header_bytes)
+        self._tables[0] = agent.q_table
+        self._staging = np.empty(self.shape)
+
+        learning_params = {'learning_rate': agent.learning_rate, 'discount_factor': agent.discount_factor,
+                           'epsilon': agent.epsilon}
+        env_config = {name: getattr(environment, name) for name in ENV_SETTINGS}
+        self._commands = _CONTEXT.Queue()
+        self._process = _CONTEXT.Process(
+            target=_learn, daemon=True,
+            args=(self._shm.name, self.shape, self._commands, learning_params, env_config, max_steps,
+                  replay_mode, replay_updates, publish_interval))
+        self._process.start()
+
+    @property
+    def episodes(self):
+        return int(self._header[EPISODES])
+
+    @property
+    def wins(self):
+        return int(self._header[WINS])
+
+    def set_layout(self, layout, reset=False):
+        """Train on `layout` from now on; reset=True also clears the learned table"""
+        if reset:
+            self.generation += 1
+        self._commands.put((np.array(layout, dtype=np.uint8), self.generation, reset))
+
+    def poll(self, agent):
+        """Copy a newly published table into the agent; returns True if it did"""
+        version = int(self._header[VERSION])
+        if version == self.version or int(self._header[GENERATION]) != self.generation:
+            return False
+        np.copyto(self._staging, self._tables[version % 2])
+        if int(self._header[VERSION]) != version:
+            return False  # Overwritten while copying, try again next time
+        np.copyto(agent.q_table, self._staging)
+        self.version = version
+        return True
+
+    def close(self):
+        """Stop the learner process and release the shared memory"""
+        self._commands.put(None)
+        self._process.join(timeout=5)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join()
+        self._commands.close()
+        del self._header, self._tables
+        self._shm.close()
+        self._shm.unlink()
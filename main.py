@@ -1,13 +1,65 @@
-import pygame
 import time
+_process_start = time.perf_counter()
+import os
 import sys
-import numpy as np
-from environment import GridEnvironment
+from environment import GridEnvironment, ACTION_DELTAS
 from agent import QLearningAgent
+from planning_agent import ValueIterationAgent
 from game import GridGame
-from ui import GameUI
+from checkpoint import CheckpointWriter, load_checkpoint
+from profiler import PhaseProfiler, StartupTimer
+from recording import EpisodeRecorder
+from replay import make_replay
+from learner import BackgroundLearner
+from metrics import MetricsWriter, StreamingAggregator
+
+def agent_step(environment, agent, game_state, profiler, recorder=None, replay=None, metrics=None):
+    """Let the AI make one move, returning its direction (None if it did not move)"""
+    state = environment.position()
+    
+    with profiler.phase('ai_decision'):
+        # Get actions prioritized toward goal
+        valid_actions = agent.get_goal_directed_actions(state, environment.goal_pos, environment.grid,
+                                                        environment.goal_masks)
+        if not valid_actions:
+            return None
+        action = agent.get_action(state, valid_actions)
+    
+    with profiler.phase('env_step'):
+        new_pos, reward, done, info = environment.step(action)
+
+    with profiler.phase('q_update'):
+        td_error = agent.update_q_table(state, action, reward, new_pos)
+    replay_squares = 0.0
+    if replay is not None:
+        with profiler.phase('replay'):
+            replay_squares = replay.step(agent, state, action, reward, new_pos, info['won'],
+                                         info['cell'] == 2 and not info['blocked'])
+    apply_step(game_state, recorder, action, reward, done, info, metrics, td_error,
+               None if td_error is None else agent.learning_rate * td_error, replay_squares)
+    return None if info['blocked'] else action
+
+def apply_step(game_state, recorder, action, reward, done, info, metrics=None, td_error=None, q_delta=None,
+               batch_delta_squares=0.0):
+    """Book one environment step into the game state, the recording and the metrics"""
+    if recorder is not None:
+        recorder.record(action, reward, info['won'])
+    if metrics is not None:
+        metrics.record(action, reward, info, td_error, q_delta, batch_delta_squares)
+    game_state.score += reward
+    game_state.steps += 1
+    if done:
+        game_state.won = info['won']
+        game_state.game_over = True
 
 def main():
+    startup = StartupTimer(_process_start)
+    startup.mark('imports')
+    # pygame and the UI are only needed for the window, so importing main stays light
+    import pygame
+    from ui import GameUI
+    startup.mark('import pygame')
+
     # Game configuration for higher win rate
     grid_size = 10
     time_limit = 30  # Double the time limit
@@ -16,6 +68,16 @@ def main():
         'discount_factor': 0.97, # More future reward consideration
         'epsilon': 0.1           # Less random exploration
     }
+    checkpoint_path = None            # Set to a file name to save and warm start the policy (see trainer.py)
+    keep_policy_on_reset = False      # Set to True so R starts a new map but keeps what was learned
+    checkpoint_interval = 10          # Seconds between background snapshots
+    trace_path = 'trace.json'         # Chrome trace written by F12
+    record_path = None                # Set to a file name to record every episode (see recording.py)
+    use_value_iteration = False       # Solve each map from the known dynamics instead of learning
+    replay_mode = 'dyna'              # Extra updates per move: 'off', 'uniform', 'prioritized' or 'dyna'
+    replay_updates = 4                # Batched replay updates after every real move
+    background_learning = False       # Train on the current map in a subprocess (toggle with L)
+    metrics_dir = None                # Set to a directory to stream episode metrics (see metrics.py)
     
     # Initialize game components
     try:
@@ -28,18 +90,56 @@ def main():
         environment.penalty_count = 2            # Fewer penalties
         environment.min_goal_distance = 8        # Ensure goal isn't too close
         environment.reset()
-        
-        print("Creating smarter AI agent...")
-        agent = QLearningAgent(grid_size, **learning_params)
+        startup.mark('environment')
         
         print("Initializing game state...")
         game_state = GridGame(grid_size, time_limit)
-        game_state.animation_speed = 0.3         # Faster visual feedback
         game_state.reward_value = 15             # Higher reward points
         game_state.penalty_value = -3            # Reduced penalty impact
         game_state.goal_value = 150              # More valuable goal
+        game_state.step_value = 1                # Small reward for exploration
+
+        # The environment scores moves, so hand it the game's values
+        environment.reward_value = game_state.reward_value
+        environment.penalty_value = game_state.penalty_value
+        environment.goal_value = game_state.goal_value
+        environment.step_value = game_state.step_value
+
+        print("Creating smarter AI agent...")
+        if use_value_iteration:
+            # Plans with the environment's scoring and needs no exploration
+            agent_class = ValueIterationAgent
+            agent_params = dict(learning_params, epsilon=0.0,
+                                reward_value=environment.reward_value,
+                                penalty_value=environment.penalty_value,
+                                goal_value=environment.goal_value,
+                                step_value=environment.step_value)
+        else:
+            agent_class, agent_params = QLearningAgent, learning_params
+        agent = agent_class(grid_size, **agent_params)
+        agent.watch(environment)
+        agent.prepare_path(environment.goal_pos, environment.grid)  # Large grids build in the background
+        # The planner already has exact values, so replay only helps the learner
+        replay = None if use_value_iteration else make_replay(replay_mode, grid_size, replay_updates)
+        checkpoint_writer = None
+        if checkpoint_path:
+            if os.path.exists(checkpoint_path):
+                try:
+                    load_checkpoint(checkpoint_path, agent=agent)
+                    print(f"Warm start from {checkpoint_path}")
+                except ValueError as e:
+                    print(f"Ignoring checkpoint: {e}")
+            checkpoint_writer = CheckpointWriter(checkpoint_path)
+        startup.mark('agent')
+        
+        recorder = EpisodeRecorder(record_path) if record_path else None
+        if recorder is not None:
+            recorder.begin(environment)
+        metrics = MetricsWriter(metrics_dir) if metrics_dir else None
+        episode_stats = StreamingAggregator()
         
-        ui = GameUI()
+        profiler = PhaseProfiler()
+        ui = GameUI(grid_size=environment.grid_size, profiler=profiler, startup=startup)
         print("All components initialized successfully")
     except Exception as e:
         print(f"Initialization failed: {e}")
@@ -49,115 +149,241 @@ def main():
     running = True
     auto_play = True
     clock = pygame.time.Clock()
-    last_move_time = time.time()
-    move_interval = 0.4  # seconds between moves
+    last_frame_time = time.perf_counter()
+    last_checkpoint_time = time.time()
+    move_interval = 0.4      # Simulated seconds per agent move
+    max_catch_up_steps = 5   # Moves per frame before a slow frame drops time
+    accumulator = 0.0        # Simulated time not yet spent on moves
+    previous_pos = environment.position()  # Where the interpolated sprite starts
+
+    # Turbo mode trains on the current map as fast as possible and only
+    # renders once per frame; episodes restart on the same layout
+    turbo = False
+    turbo_steps = 500        # Agent moves per rendered frame
+    turbo_episodes = 0
+    turbo_wins = 0
+    episode_layout = environment.grid.copy()
+    quiet_profiler = profiler.untraced()  # Per-move phases would flood the trace in turbo
+
+    def end_episode():
+        """Log the episode being played, if it has moves not logged yet"""
+        if metrics is not None:
+            row = metrics.end(game_state.score, game_state.won, game_state.elapsed)
+            if row is not None:
+                episode_stats.add(row)
+
+    def start_learner():
+        if use_value_iteration:
+            print("Background learning is not used with value iteration")
+            return None
+        learner = BackgroundLearner(agent, environment, replay_mode=replay_mode, replay_updates=replay_updates)
+        learner.set_layout(episode_layout)
+        return learner
+
+    learner = start_learner() if background_learning else None
 
     print("\nGame Controls:")
     print("- SPACE: Toggle AI/Path view")
     print("- R: Reset game")
-    print("- +/-: Adjust speed")
+    print("- +/-: Adjust speed (moves per frame in turbo)")
+    print("- T: Toggle turbo training")
+    print("- H: Toggle performance HUD")
+    print("- L: Toggle background learning on the current map")
+    print("- F12: Save Chrome trace of recent frames")
+    print("- Arrows / [ ] / wheel: Scroll and zoom the board, F: follow the agent")
+    print("- M: Cycle minimap (cells, visit counts, best Q-values), click it to jump")
     print("\nStarting main game loop...")
 
     while running:
         current_time = time.time()
+        frame_start = time.perf_counter()
+        frame_time = min(frame_start - last_frame_time, 0.25)  # Ignore long stalls (window drags)
+        last_frame_time = frame_start
         
         # Handle events
-        for event in pygame.event.get():
+        with profiler.phase('events'):
+            events = pygame.event.get()
+        for event in events:
             if event.type == pygame.QUIT:
                 running = False
+            elif ui.handle_event(event):
+                pass  # Camera, zoom and minimap controls
             elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_SPACE and not game_state.game_over:
+                if event.key == pygame.K_SPACE and not game_state.game_over and not turbo:
+                    if not game_state.showing_path and not agent.prepare_path(environment.goal_pos,
+                                                                              environment.grid):
+                        print("Path planner is still building, try again shortly")
+                        continue
                     game_state.showing_path = not game_state.showing_path
+                    game_state.move_direction = None
+                    game_state.move_progress = 0
                     if game_state.showing_path:
-                        game_state.animation_path = agent.get_optimized_path(
-                            environment.agent_pos,
-                            environment.goal_pos,
-                            environment.grid
-                        )
+                        with profiler.phase('path_planning'):
+                            game_state.animation_path = agent.get_optimized_path(
+                                environment.position(),
+                                environment.goal_pos,
+                                environment.grid
+                            )
                         game_state.animation_index = 0
                 elif event.key == pygame.K_r:
+                    end_episode()
                     environment.reset()
-                    agent = QLearningAgent(grid_size, **learning_params)
+                    episode_layout = environment.grid.copy()
+                    if recorder is not None:
+                        recorder.begin(environment)
+                    if replay is not None:
+                        replay.new_map()
+                    if keep_policy_on_reset:
+                        agent.reset_visits()
+                    else:
+                        agent = agent_class(grid_size, **agent_params)
+                        agent.watch(environment)
+                    agent.prepare_path(environment.goal_pos, environment.grid)
+                    if learner is not None:
+                        learner.set_layout(episode_layout, reset=not keep_policy_on_reset)
                     game_state.reset()
-                    last_move_time = current_time
+                    accumulator = 0.0
+                elif event.key == pygame.K_t:
+                    turbo = not turbo
+                    turbo_episodes = turbo_wins = 0
+                    game_state.showing_path = False
+                    game_state.move_direction = None
+                    accumulator = 0.0
+                    print(f"Turbo {'on' if turbo else 'off'}")
                 elif event.key == pygame.K_PLUS:
-                    move_interval = min(1.5, move_interval + 0.1)
+                    if turbo:
+                        turbo_steps = min(20000, turbo_steps * 2)
+                    else:
+                        move_interval = min(1.5, move_interval + 0.1)
                 elif event.key == pygame.K_MINUS:
-                    move_interval = max(0.1, move_interval - 0.1)
+                    if turbo:
+                        turbo_steps = max(10, turbo_steps // 2)
+                    else:
+                        move_interval = max(0.1, move_interval - 0.1)
+                elif event.key == pygame.K_l:
+                    if learner is None:
+                        learner = start_learner()
+                        if learner is not None:
+                            print("Background learning on")
+                    else:
+                        print(f"Background learning off after {learner.episodes} episodes, "
+                              f"win rate {learner.wins / max(learner.episodes, 1):.0%}")
+                        learner.close()
+                        learner = None
+                elif event.key == pygame.K_h:
+                    ui.show_hud = not ui.show_hud
+                    profiler.enabled = ui.show_hud
+                    profiler.reset()
+                elif event.key == pygame.K_F12:
+                    if profiler.spans:
+                        count = profiler.export_chrome_trace(trace_path)
+                        print(f"Wrote {count} spans to {trace_path}")
+                    else:
+                        print("Nothing recorded yet - press H to start profiling")
+
+        # Follow the background learner's latest policy (a lock-free table copy)
+        if learner is not None:
+            with profiler.phase('learner_poll'):
+                learner.poll(agent)
 
         # Game logic
-        if not game_state.game_over:
-            if current_time - last_move_time > move_interval:
-                last_move_time = current_time
+        if turbo:
+            with profiler.phase('turbo_steps'):
+                for _ in range(turbo_steps):
+                    if game_state.game_over:
+                        end_episode()
+                        turbo_episodes += 1
+                        turbo_wins += game_state.won
+                        if turbo_episodes % 1000 == 0:
+                            rolling = (f", last {episode_stats.window}: {episode_stats.rolling_win_rate:.0%}"
+                                       if episode_stats.episodes >= episode_stats.window else "")
+                            print(f"Turbo: {turbo_episodes} episodes, "
+                                  f"win rate {turbo_wins / turbo_episodes:.0%}{rolling}")
+                        environment.reset(layout=episode_layout)
+                        if recorder is not None:
+                            recorder.begin(environment)
+                        agent.reset_visits()
+                        game_state.reset()
+                    agent_step(environment, agent, game_state, quiet_profiler, recorder, replay, metrics)
+                    game_state.advance(move_interval)
+                    game_state.check_time_limit()
+            previous_pos = environment.position()
+            game_state.move_direction = None
+
+        elif not game_state.game_over:
+            # Fixed timestep: spend real time on whole moves, carry the rest over
+            accumulator += frame_time
+            game_state.advance(frame_time)
+            moves = 0
+            while accumulator >= move_interval and not game_state.game_over:
+                if moves == max_catch_up_steps:
+                    accumulator = 0.0
+                    break
+                accumulator -= move_interval
+                moves += 1
                 
                 if not game_state.showing_path and auto_play:
-                    state = environment.agent_pos
-                    goal = environment.goal_pos
-                    
-                    # Get actions prioritized toward goal
-                    valid_actions = agent.get_goal_directed_actions(
-                        state, 
-                        goal, 
-                        environment.grid
-                    )
-                    
-                    if valid_actions:
-                        action = agent.get_action(state, valid_actions)
-                        new_pos = list(state)
-                        # Update position based on action
-                        if action == 0: new_pos[0] -= 1
-                        elif action == 1: new_pos[1] += 1
-                        elif action == 2: new_pos[0] += 1
-                        elif action == 3: new_pos[1] -= 1
-                        
-                        if (0 <= new_pos[0] < grid_size and 
-                            0 <= new_pos[1] < grid_size and
-                            environment.grid[new_pos[0]][new_pos[1]] != 1):
-                            
-                            environment.agent_pos = new_pos
-                            environment.visited.add(tuple(new_pos))
-                            
-                            # Calculate rewards
-                            cell_value = environment.grid[new_pos[0]][new_pos[1]]
-                            if cell_value == 2:    # Reward
-                                reward = game_state.reward_value
-                                environment.grid[new_pos[0]][new_pos[1]] = 0
-                            elif cell_value == 3:  # Penalty
-                                reward = game_state.penalty_value
-                            elif cell_value == 4:  # Goal
-                                reward = game_state.goal_value
-                                game_state.won = True
-                                game_state.game_over = True
-                            else:                # Empty
-                                reward = 1       # Small reward for exploration
-                            
-                            agent.update_q_table(state, action, reward, new_pos)
-                            game_state.score += reward
-                            game_state.steps += 1
-                
+                    previous_pos = environment.position()
+                    game_state.move_direction = agent_step(environment, agent, game_state,
+                                                           profiler, recorder, replay, metrics)
+
                 elif game_state.showing_path:
-                    # Follow the precomputed path
-                    if game_state.update_animation():
-                        new_pos = game_state.animation_path[game_state.animation_index]
-                        environment.agent_pos = new_pos
-                        if environment.grid[new_pos[0]][new_pos[1]] == 4:
-                            game_state.score += game_state.goal_value
-                            game_state.won = True
-                            game_state.game_over = True
-
-        # Check time limit
-        game_state.check_time_limit()
+                    # Follow the precomputed path one cell per move tick, through the
+                    # environment so it is scored and recorded
+                    previous_pos = environment.position()
+                    game_state.move_direction = None
+                    if game_state.advance_animation():
+                        x, y = game_state.animation_path[game_state.animation_index]
+                        ax, ay = previous_pos
+                        action = ACTION_DELTAS.index((x - ax, y - ay))
+                        new_pos, reward, done, info = environment.step(action)
+                        apply_step(game_state, recorder, action, reward, done, info, metrics)
+                        game_state.move_direction = None if info['blocked'] else action
+
+            # Check time limit
+            game_state.check_time_limit()
+            if game_state.game_over:
+                end_episode()
+
+        # Draw the agent part of the way through its last move
+        if game_state.move_direction is not None and not game_state.game_over:
+            game_state.move_progress = min(1.0, accumulator / move_interval)
+            draw_pos = previous_pos
+        else:
+            draw_pos = environment.position()
+
+        if checkpoint_writer is not None and current_time - last_checkpoint_time > checkpoint_interval:
+            checkpoint_writer.snapshot(agent)
+            last_checkpoint_time = current_time
         
         # Rendering
         try:
-            ui.draw(environment, game_state, environment.agent_pos, agent,
-                    game_state.move_progress, game_state.move_direction)
+            with profiler.phase('render'):
+                ui.draw(environment, game_state, draw_pos, agent,
+                        game_state.move_progress, game_state.move_direction)
         except Exception as e:
             print(f"Rendering error: {e}")
             running = False
+
+        if startup is not None:
+            startup.mark('first frame')
+            print(startup.report())
+            startup = None
         
-        clock.tick(60)
+        with profiler.phase('frame_wait'):
+            clock.tick(60)
+        profiler.end_frame()
     
+    if learner is not None:
+        learner.close()
+    if checkpoint_writer is not None:
+        checkpoint_writer.snapshot(agent)
+        checkpoint_writer.close()
+    if recorder is not None:
+        recorder.close()
+    if metrics is not None:
+        metrics.close()
+        print(episode_stats.report())
     pygame.quit()
     sys.exit()
 
@@ -0,0 +1,230 @@
+import struct
+import numpy as np
+
+CLEAR_RADIUS = 3  # Keep start and goal areas clear
+LARGE_GRID_CELLS = 1 << 16  # Above this, maps are sampled and flood-filled one at a time
+
+LIBRARY_MAGIC = b'GRIDMAPS'
+LIBRARY_VERSION = 1
+# magic, version, grid_size, count, seed, chunk_size, obstacles, rewards, penalties, min_goal_distance
+_HEADER = struct.Struct('<8sIIQqIIIIi')
+_HEADER_SIZE = 64
+
+def generate_layouts(count, grid_size, obstacle_count=10, reward_count=5, penalty_count=5,
+                     min_goal_distance=None, rng=None, max_attempts=100):
+    """Generate `count` solvable layouts at once
+
+    Returns a (count, grid_size, grid_size) uint8 array of cell types and
+    a (count, 2) array of goal positions. The agent always starts at (0, 0).
+    Without min_goal_distance the goal sits in the far corner, otherwise it
+    is drawn uniformly from cells at least that Manhattan distance away.
+    Layouts whose goal cannot be reached are redrawn.
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    n = grid_size
+    grids = np.zeros((count, n, n), dtype=np.uint8)
+    goals = np.zeros((count, 2), dtype=np.int64)
+
+    pending = np.arange(count)
+    for _ in range(max_attempts):
+        new_grids, new_goals = _sample_layouts(len(pending), n, obstacle_count, reward_count,
+                                               penalty_count, min_goal_distance, rng)
+        solvable = is_solvable(new_grids, new_goals)
+        grids[pending[solvable]] = new_grids[solvable]
+        goals[pending[solvable]] = new_goals[solvable]
+        pending = pending[~solvable]
+        if len(pending) == 0:
+            return grids, goals
+
+    raise RuntimeError(f"Could not generate a solvable layout in {max_attempts} attempts")
+
+def generate_layout(grid_size, obstacle_count=10, reward_count=5, penalty_count=5,
+                    min_goal_distance=None, seed=None, rng=None):
+    """Generate a single solvable layout, deterministic for a given seed"""
+    if rng is None:
+        rng = np.random.default_rng(seed)
+    grids, goals = generate_layouts(1, grid_size, obstacle_count, reward_count, penalty_count,
+                                    min_goal_distance, rng)
+    return grids[0], goals[0]
+
+def _sample_layouts(count, n, obstacle_count, reward_count, penalty_count, min_goal_distance, rng):
+    """Draw goals and all element placements in one pass (no solvability check)"""
+    x, y = np.indices((n, n))
+    start_dist = (x + y).ravel()
+
+    if min_goal_distance is None:
+        goals = np.full((count, 2), n - 1, dtype=np.int64)
+    else:
+        candidates = np.flatnonzero(start_dist >= max(min_goal_distance, 1))
+        if len(candidates) == 0:
+            raise ValueError(f"No cell is {min_goal_distance} steps from the start")
+        picks = candidates[rng.integers(0, len(candidates), size=count)]
+        goals = np.stack([picks // n, picks % n], axis=1)
+
+    counts = (obstacle_count, reward_count, penalty_count)
+    total = sum(counts)
+    types = np.repeat(np.arange(1, 4, dtype=np.uint8), counts)
+    grids = np.zeros((count, n * n), dtype=np.uint8)
+
+    if n * n > LARGE_GRID_CELLS:
+        # Per-cell keys would cost count * H * W floats; draw indices directly
+        for i, (gx, gy) in enumerate(goals):
+            goal_dist = np.abs(x.ravel() - gx) + np.abs(y.ravel() - gy)
+            eligible = np.flatnonzero((start_dist >= CLEAR_RADIUS) & (goal_dist >= CLEAR_RADIUS))
+            if len(eligible) < total:
+                raise ValueError(f"Grid of size {n} has too few free cells for {total} elements")
+            grids[i, rng.choice(eligible, size=total, replace=False)] = types
+        grids[np.arange(count), goals[:, 0] * n + goals[:, 1]] = 4  # Goal
+        return grids.reshape(count, n, n), goals
+
+    goal_dist = (np.abs(x.ravel()[None, :] - goals[:, :1]) +
+                 np.abs(y.ravel()[None, :] - goals[:, 1:]))
+    eligible = (start_dist[None, :] >= CLEAR_RADIUS) & (goal_dist >= CLEAR_RADIUS)
+    if (eligible.sum(axis=1) < total).any():
+        raise ValueError(f"Grid of size {n} has too few free cells for {total} elements")
+
+    if total > 0:
+        # Random keys per cell; the `total` smallest eligible keys are used,
+        # in key order, so the types land on a uniform random subset
+        keys = rng.random((count, n * n))
+        keys[~eligible] = np.inf
+        chosen = np.argpartition(keys, total - 1, axis=1)[:, :total]
+        order = np.argsort(np.take_along_axis(keys, chosen, axis=1), axis=1)
+        chosen = np.take_along_axis(chosen, order, axis=1)
+        np.put_along_axis(grids, chosen, types[None, :], axis=1)
+
+    grids[np.arange(count), goals[:, 0] * n + goals[:, 1]] = 4  # Goal
+    return grids.reshape(count, n, n), goals
+
+def reachable(grids, start=(0, 0)):
+    """Flood fill from `start` through non-obstacle cells for a stack of grids"""
+    grids = np.asarray(grids)
+    passable = grids != 1
+    if grids.shape[-1] * grids.shape[-2] > LARGE_GRID_CELLS:
+        # Whole-array dilation needs one pass per BFS layer; expand a frontier instead
+        flat = passable.reshape(-1, grids.shape[-2], grids.shape[-1])
+        reach = np.stack([_reachable_frontier(grid, start) for grid in flat])
+        return reach.reshape(passable.shape)
+
+    reach = np.zeros_like(passable)
+    reach[..., start[0], start[1]] = passable[..., start[0], start[1]]
+
+    while True:
+        grown = reach.copy()
+        grown[..., 1:, :] |= reach[..., :-1, :]
+        grown[..., :-1, :] |= reach[..., 1:, :]
+        grown[..., :, 1:] |= reach[..., :, :-1]
+        grown[..., :, :-1] |= reach[..., :, 1:]
+        grown &= passable
+        if np.array_equal(grown, reach):
+            return reach
+        reach = grown
+
+def _reachable_frontier(passable, start):
+    """Breadth-first flood fill of one grid, touching each cell once"""
+    rows, cols = passable.shape
+    flat = passable.ravel()
+    seen = np.zeros(rows * cols, dtype=bool)
+    origin = start[0] * cols + start[1]
+    frontier = np.array([origin] if flat[origin] else [], dtype=np.int64)
+    seen[frontier] = True
+
+    while len(frontier):
+        r, c = np.divmod(frontier, cols)
+        neighbours = np.concatenate([frontier[r > 0] - cols, frontier[r < rows - 1] + cols,
+                                     frontier[c > 0] - 1, frontier[c < cols - 1] + 1])
+        neighbours = neighbours[flat[neighbours] & ~seen[neighbours]]
+        frontier = np.unique(neighbours)
+        seen[frontier] = True
+    return seen.reshape(rows, cols)
+
+def is_solvable(grids, goals, start=(0, 0)):
+    """Return a bool per grid telling whether its goal is reachable from start"""
+    reach = reachable(grids, start)
+    return reach[np.arange(len(goals)), goals[:, 0], goals[:, 1]]
+
+def pack_grids(grids):
+    """Pack cell types two per byte, returning (count, ceil(H*W / 2)) uint8"""
+    flat = np.asarray(grids, dtype=np.uint8).reshape(len(grids), -1)
+    if flat.shape[1] % 2:
+        flat = np.pad(flat, ((0, 0), (0, 1)))
+    return flat[:, 0::2] | (flat[:, 1::2] << 4)
+
+def unpack_grids(packed, grid_size):
+    """Inverse of pack_grids"""
+    packed = np.asarray(packed, dtype=np.uint8)
+    flat = np.empty((len(packed), packed.shape[1] * 2), dtype=np.uint8)
+    flat[:, 0::2] = packed & 0x0F
+    flat[:, 1::2] = packed >> 4
+    return flat[:, :grid_size * grid_size].reshape(-1, grid_size, grid_size)
+
+class MapLibrary:
+    """Read-only, memory-mapped collection of pre-generated layouts
+
+    File layout: a 64 byte header, then (count, 2) uint16 goal positions,
+    then (count, ceil(H*W / 2)) nibble-packed grids. Map i is always the
+    same for a given seed, chunk size and element counts.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            header = _HEADER.unpack(f.read(_HEADER.size))
+        (magic, version, self.grid_size, self.count, self.seed, self.chunk_size,
+         self.obstacle_count, self.reward_count, self.penalty_count, min_goal_distance) = header
+        if magic != LIBRARY_MAGIC:
+            raise ValueError(f"{path} is not a map library")
+        if version != LIBRARY_VERSION:
+            raise ValueError(f"Unsupported map library version {version}")
+        self.min_goal_distance = None if min_goal_distance < 0 else min_goal_distance
+
+        row_bytes = (self.grid_size * self.grid_size + 1) // 2
+        self.goals = np.memmap(path, dtype=np.uint16, mode='r', offset=_HEADER_SIZE,
+                               shape=(self.count, 2))
+        self.packed = np.memmap(path, dtype=np.uint8, mode='r',
+                                offset=_HEADER_SIZE + self.count * 4,
+                                shape=(self.count, row_bytes))
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        """Return map `index` as a (grid_size, grid_size) uint8 grid"""
+        return unpack_grids(self.packed[index:index + 1], self.grid_size)[0]
+
+    def layouts(self, indices):
+        """Return (grids, goals) for an array of map indices"""
+        indices = np.asarray(indices)
+        return (unpack_grids(self.packed[indices], self.grid_size),
+                self.goals[indices].astype(np.int64))
+
+    @classmethod
+    def create(cls, path, count, grid_size, seed=0, obstacle_count=10, reward_count=5,
+               penalty_count=5, min_goal_distance=None, chunk_size=4096):
+        """Generate `count` layouts into a new library file and open it"""
+        header = _HEADER.pack(LIBRARY_MAGIC, LIBRARY_VERSION, grid_size, count, seed, chunk_size,
+                              obstacle_count, reward_count, penalty_count,
+                              -1 if min_goal_distance is None else min_goal_distance)
+        row_bytes = (grid_size * grid_size + 1) // 2
+        with open(path, 'wb') as f:
+            f.write(header.ljust(_HEADER_SIZE, b'\0'))
+            f.truncate(_HEADER_SIZE + count * 4 + count * row_bytes)
+
+        goals = np.memmap(path, dtype=np.uint16, mode='r+', offset=_HEADER_SIZE, shape=(count, 2))
+        packed = np.memmap(path, dtype=np.uint8, mode='r+', offset=_HEADER_SIZE + count * 4,
+                           shape=(count, row_bytes))
+
+        # Each chunk has its own seed so any chunk can be regenerated alone
+        for chunk, start in enumerate(range(0, count, chunk_size)):
+            stop = min(start + chunk_size, count)
+            rng = np.random.default_rng([seed, chunk])
+            grids, chunk_goals = generate_layouts(stop - start, grid_size, obstacle_count,
+                                                  reward_count, penalty_count, min_goal_distance, rng)
+            packed[start:stop] = pack_grids(grids)
+            goals[start:stop] = chunk_goals
+
+        packed.flush()
+        goals.flush()
+        del packed, goals
+        return cls(path)
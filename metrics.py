@@ -0,0 +1,369 @@
+import argparse
+import glob
+import math
+import os
+import queue
+import re
+import threading
+import numpy as np
+
+# Column name and dtype of each chunk file
+EPISODE_COLUMNS = (
+    ('episode', np.int64),
+    ('score', np.float64),
+    ('steps', np.int32),
+    ('won', np.bool_),
+    ('time_to_goal', np.float32),   # Seconds, NaN unless won: game clock in main.py, wall time in trainer.py
+    ('rewards', np.int32),          # Reward cells collected
+    ('penalties', np.int32),        # Penalty cells entered
+    ('td_error', np.float32),       # Mean |TD error| of the episode's online updates
+    ('td_error_max', np.float32),
+    ('q_delta_norm', np.float32),   # L2 norm of the Q-value changes, online and replayed
+)
+STEP_COLUMNS = (
+    ('episode', np.int64),
+    ('step', np.int32),
+    ('action', np.uint8),
+    ('reward', np.float32),
+    ('td_error', np.float32),       # NaN for steps without a Q-update
+)
+KINDS = ('episodes', 'steps')
+
+def _chunk_paths(directory, kind):
+    """Chunk files of one kind, oldest first"""
+    pattern = re.compile(rf"{kind}-(\d+)\.npz$")
+    paths = []
+    for path in glob.glob(os.path.join(directory, f"{kind}-*.npz")):
+        match = pattern.search(path)
+        if match:
+            paths.append((int(match.group(1)), path))
+    return [path for _, path in sorted(paths)]
+
+def read_chunks(directory, kind='episodes'):
+    """Yield each chunk of a metrics directory as a {column: array} dict
+
+    Only one chunk is held at a time, so any number of episodes can be
+    scanned in constant memory.
+    """
+    for path in _chunk_paths(directory, kind):
+        with np.load(path) as chunk:
+            yield {name: chunk[name] for name in chunk.files}
+
+def _save_chunk(path, columns):
+    """Write one chunk atomically: a temp file renamed over the target"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **columns)
+    os.replace(tmp_path, path)
+
+class _ChunkBuffer:
+    """Preallocated columns filled row by row, handed off whole when full"""
+
+    def __init__(self, columns, size):
+        self.columns = columns
+        self.size = size
+        self._new()
+
+    def _new(self):
+        self.data = {name: np.zeros(self.size, dtype=dtype) for name, dtype in self.columns}
+        self.count = 0
+
+    def take(self):
+        """Return the filled rows and start a fresh chunk"""
+        data = {name: column[:self.count] for name, column in self.data.items()}
+        self._new()
+        return data
+
+class MetricsWriter:
+    """Stream per-episode (and optionally per-step) metrics to chunk files
+
+    Call record() after every step and end() when the episode is over.
+    Rows go into preallocated NumPy columns on the caller's thread; each
+    full chunk is handed to a background thread that saves it as
+    `<kind>-NNNNNN.npz` in `directory`, one array per column. The hand-off
+    queue holds at most `queue_size` chunks: if the disk falls that far
+    behind, record() blocks instead of letting memory grow. Existing
+    chunks are never rewritten, so a rerun appends after them and keeps
+    counting episodes from where the last run stopped.
+    """
+
+    def __init__(self, directory, chunk_size=4096, step_metrics=False, step_chunk_size=65536, queue_size=16):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self._next_chunk = {}
+        for kind in KINDS:
+            paths = _chunk_paths(directory, kind)
+            self._next_chunk[kind] = int(re.search(r"(\d+)\.npz$", paths[-1]).group(1)) + 1 if paths else 0
+        self.episodes = 0
+        paths = _chunk_paths(directory, 'episodes')
+        if paths:
+            with np.load(paths[-1]) as chunk:
+                episodes = chunk['episode']
+                self.episodes = int(episodes[-1]) + 1 if len(episodes) else 0
+
+        self._buffers = {'episodes': _ChunkBuffer(EPISODE_COLUMNS, chunk_size)}
+        if step_metrics:
+            self._buffers['steps'] = _ChunkBuffer(STEP_COLUMNS, step_chunk_size)
+        self._step_buffer = self._buffers.get('steps')
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._begin()
+
+    def _begin(self):
+        self._step = 0
+        self._rewards = 0
+        self._penalties = 0
+        self._td_sum = 0.0
+        self._td_max = 0.0
+        self._td_count = 0
+        self._delta_squares = 0.0
+
+    def record(self, action, reward, info, td_error=None, q_delta=None, batch_delta_squares=0.0):
+        """Log one step; info is the dict returned by GridEnvironment.step
+
+        q_delta is the step's own Q change and batch_delta_squares the
+        squared norm of the replay updates that followed it.
+        """
+        if not info['blocked']:
+            if info['cell'] == 2:
+                self._rewards += 1
+            elif info['cell'] == 3:
+                self._penalties += 1
+        if td_error is not None:
+            error = abs(td_error)
+            self._td_sum += error
+            self._td_count += 1
+            if error > self._td_max:
+                self._td_max = error
+        if q_delta is not None:
+            self._delta_squares += q_delta * q_delta
+        self._delta_squares += batch_delta_squares
+
+        buffer = self._step_buffer
+        if buffer is not None:
+            i = buffer.count
+            data = buffer.data
+            data['episode'][i] = self.episodes
+            data['step'][i] = self._step
+            data['action'][i] = action
+            data['reward'][i] = reward
+            data['td_error'][i] = np.nan if td_error is None else td_error
+            buffer.count += 1
+            if buffer.count == buffer.size:
+                self._hand_off('steps')
+        self._step += 1
+
+    def end(self, score, won, elapsed=None):
+        """Close the current episode and return its row as a dict
+
+        `elapsed` is the time in seconds the episode took, stored as
+        time_to_goal if it was won. Returns None (and writes nothing) if
+        no step was recorded since the last end(), so calling it again
+        for an episode that is already over is harmless.
+        """
+        if self._step == 0:
+            return None
+        row = {
+            'episode': self.episodes,
+            'score': score,
+            'steps': self._step,
+            'won': bool(won),
+            'time_to_goal': elapsed if won and elapsed is not None else np.nan,
+            'rewards': self._rewards,
+            'penalties': self._penalties,
+            'td_error': self._td_sum / self._td_count if self._td_count else np.nan,
+            'td_error_max': self._td_max if self._td_count else np.nan,
+            'q_delta_norm': np.sqrt(self._delta_squares),
+        }
+        buffer = self._buffers['episodes']
+        i = buffer.count
+        for name, value in row.items():
+            buffer.data[name][i] = value
+        buffer.count += 1
+        if buffer.count == buffer.size:
+            self._hand_off('episodes')
+        self.episodes += 1
+        self._begin()
+        return row
+
+    def _hand_off(self, kind):
+        path = os.path.join(self.directory, f"{kind}-{self._next_chunk[kind]:06d}.npz")
+        self._next_chunk[kind] += 1
+        self._queue.put((path, self._buffers[kind].take()))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            _save_chunk(*item)
+
+    def flush(self):
+        """Queue the partly filled chunks; later rows go into new chunk files"""
+        for kind, buffer in self._buffers.items():
+            if buffer.count:
+                self._hand_off(kind)
+
+    def close(self):
+        """Write everything recorded so far and stop the writer thread"""
+        self.flush()
+        self._queue.put(None)
+        self._thread.join()
+
+class QuantileSketch:
+    """Quantiles of a stream to a relative accuracy, in bounded memory
+
+    Values are counted in logarithmic buckets, bucket k holding
+    magnitudes in (gamma ** (k - 1), gamma ** k] with
+    gamma = (1 + a) / (1 - a), so a reported quantile is within a
+    fraction `a` of the true value at that rank however the values
+    arrive - drifting streams such as TD errors included. Memory grows
+    with the log of the value range, not the number of values.
+    Magnitudes below `min_value` count as zero. Results are clamped to
+    the smallest and largest value seen, so those come out exact.
+    """
+
+    def __init__(self, relative_accuracy=0.01, min_value=1e-9):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.min_value = min_value
+        self._log_gamma = math.log(self.gamma)
+        self.count = 0
+        self.zeros = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.positive = {}
+        self.negative = {}
+
+    def add(self, x):
+        self.count += 1
+        self.min = min(self.min, x)
+        self.max = max(self.max, x)
+        if x > self.min_value:
+            k = math.ceil(math.log(x) / self._log_gamma)
+            self.positive[k] = self.positive.get(k, 0) + 1
+        elif x < -self.min_value:
+            k = math.ceil(math.log(-x) / self._log_gamma)
+            self.negative[k] = self.negative.get(k, 0) + 1
+        else:
+            self.zeros += 1
+
+    def _value(self, k):
+        return 2 * self.gamma ** k / (self.gamma + 1)
+
+    def quantile(self, q):
+        if self.count == 0:
+            return float('nan')
+        rank = q * (self.count - 1)
+        seen = 0
+        value = self.max
+        for k in sorted(self.negative, reverse=True):
+            seen += self.negative[k]
+            if seen > rank:
+                value = -self._value(k)
+                break
+        else:
+            seen += self.zeros
+            if seen > rank:
+                value = 0.0
+            else:
+                for k in sorted(self.positive):
+                    seen += self.positive[k]
+                    if seen > rank:
+                        value = self._value(k)
+                        break
+        return min(max(value, self.min), self.max)
+
+class StreamingAggregator:
+    """Win rates and percentiles over any number of episodes in constant memory
+
+    add() takes episode rows as returned by MetricsWriter.end() (or read
+    back with read_chunks). The rolling win rate covers the last `window`
+    episodes through a ring buffer; percentiles of each field in `fields`
+    come from a QuantileSketch per field. NaN values (time_to_goal of lost
+    episodes, td_error without learning) are left out of the percentiles.
+    """
+
+    def __init__(self, window=1000, quantiles=(0.5, 0.9, 0.99),
+                 fields=('score', 'steps', 'time_to_goal', 'td_error', 'q_delta_norm')):
+        self.window = window
+        self.quantiles = quantiles
+        self.fields = fields
+        self.episodes = 0
+        self.wins = 0
+        self.score_sum = 0.0
+        self._recent = np.zeros(window, dtype=bool)
+        self._recent_wins = 0
+        self.sketches = {field: QuantileSketch() for field in fields}
+
+    def add(self, row):
+        won = bool(row['won'])
+        i = self.episodes % self.window
+        self._recent_wins += won - int(self._recent[i])
+        self._recent[i] = won
+        self.episodes += 1
+        self.wins += won
+        self.score_sum += row['score']
+        for field, sketch in self.sketches.items():
+            value = row[field]
+            if value == value:  # Skip NaN
+                sketch.add(value)
+
+    def add_chunk(self, columns):
+        """Add every row of a {column: array} chunk"""
+        names = ('won', 'score') + tuple(self.fields)
+        for values in zip(*(columns[name].tolist() for name in names)):
+            self.add(dict(zip(names, values)))
+
+    @property
+    def win_rate(self):
+        return self.wins / self.episodes if self.episodes else float('nan')
+
+    @property
+    def rolling_win_rate(self):
+        """Win rate over the last `window` episodes"""
+        count = min(self.episodes, self.window)
+        return self._recent_wins / count if count else float('nan')
+
+    def percentiles(self, field):
+        """{quantile: estimate} for one field"""
+        return {q: self.sketches[field].quantile(q) for q in self.quantiles}
+
+    def summary(self):
+        return {
+            'episodes': self.episodes,
+            'win_rate': self.win_rate,
+            'rolling_win_rate': self.rolling_win_rate,
+            'mean_score': self.score_sum / self.episodes if self.episodes else float('nan'),
+            'percentiles': {field: self.percentiles(field) for field in self.fields},
+        }
+
+    def report(self):
+        """Multi-line text summary"""
+        stats = self.summary()
+        lines = [f"Episodes: {stats['episodes']}  Win rate: {stats['win_rate']:.1%} "
+                 f"(last {min(self.episodes, self.window)}: {stats['rolling_win_rate']:.1%})  "
+                 f"Mean score: {stats['mean_score']:.1f}"]
+        for field, values in stats['percentiles'].items():
+            if not self.sketches[field].count:
+                continue  # e.g. time_to_goal of headless runs
+            quantiles = "  ".join(f"p{q * 100:g} {value:.3g}" for q, value in values.items())
+            lines.append(f"  {field:>13}: {quantiles}")
+        return "\n".join(lines)
+
+def summarize(directory, window=1000):
+    """Stream a metrics directory through a StreamingAggregator"""
+    aggregator = StreamingAggregator(window)
+    for chunk in read_chunks(directory):
+        aggregator.add_chunk(chunk)
+    return aggregator
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize a metrics directory written by MetricsWriter")
+    parser.add_argument('directory')
+    parser.add_argument('--window', type=int, default=1000, help="Episodes in the rolling win rate")
+    args = parser.parse_args()
+    print(summarize(args.directory, args.window).report())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import argparse
+import multiprocessing as mp
+import queue
+import random
+import time
+from multiprocessing import shared_memory
+import numpy as np
+from environment import GridEnvironment
+from agent import QLearningAgent
+from trainer import run_episode
+
+SYNC_POLICIES = ('hogwild', 'average')
+
+def _make_environment(grid_size, max_steps, env_config):
+    environment = GridEnvironment(grid_size, max_steps=max_steps)
+    for name, value in (env_config or {}).items():
+        setattr(environment, name, value)
+    return environment
+
+def _worker(worker_id, shm_name, shape, lock, results, *args):
+    """Process entry point: attach to the shared Q-table and train"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        shared = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        results.put((worker_id, _train_worker(worker_id, shared, lock, *args)))
+        del shared
+    finally:
+        shm.close()
+
+def _train_worker(worker_id, shared, lock, grid_size, episodes, learning_params, max_steps,
+                  env_config, sync, sync_interval, workers, seed, layout_seed):
+    """Train one agent against the shared Q-table and return its episode stats"""
+    # Forked workers inherit the parent's RNG state, so reseed both sources
+    worker_seed = None if seed is None else seed + worker_id
+    random.seed(worker_seed)
+    environment = _make_environment(grid_size, max_steps, env_config)
+    environment.rng = np.random.default_rng(worker_seed)
+    agent = QLearningAgent(grid_size, **learning_params)
+    agent.rng = np.random.default_rng(worker_seed)
+
+    if sync == 'hogwild':
+        agent.q_table = shared  # Lock-free: every update lands in shared memory
+    else:
+        agent.q_table = shared.copy()
+        base = agent.q_table.copy()
+
+    scores = np.zeros(episodes)
+    steps = np.zeros(episodes, dtype=np.int64)
+    won = np.zeros(episodes, dtype=bool)
+    for episode in range(episodes):
+        scores[episode], steps[episode], won[episode] = run_episode(agent, environment, layout_seed)
+
+        if sync == 'average' and ((episode + 1) % sync_interval == 0 or episode == episodes - 1):
+            # Move the shared table by this worker's share of the average change
+            with lock:
+                shared += (agent.q_table - base) / workers
+                agent.q_table[:] = shared
+            base[:] = agent.q_table
+
+    return {'scores': scores, 'steps': steps, 'won': won}
+
+def train_parallel(grid_size=10, workers=4, episodes=1000, sync='hogwild', sync_interval=50,
+                   learning_params=None, max_steps=200, env_config=None, seed=None, layout_seed=None):
+    """Train `workers` processes into one Q-table held in shared memory
+
+    Each worker runs `episodes` episodes with its own GridEnvironment and
+    QLearningAgent. With sync='hogwild' all workers update the shared
+    table directly without locking; with sync='average' each keeps a
+    private copy and every `sync_interval` episodes folds its averaged
+    change into the shared table under a lock. A layout_seed makes every
+    episode in every worker use the same map.
+
+    Returns an agent holding the learned table and the per-worker stats.
+    """
+    if sync not in SYNC_POLICIES:
+        raise ValueError(f"Unknown sync policy {sync!r}, expected one of {SYNC_POLICIES}")
+    learning_params = learning_params or {}
+    shape = (grid_size, grid_size, 4)
+
+    shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * 8)
+    try:
+        shared = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        shared.fill(0)
+        lock = mp.Lock()
+        results = mp.Queue()
+
+        processes = [
+            mp.Process(target=_worker, args=(worker_id, shm.name, shape, lock, results, grid_size,
+                                             episodes, learning_params, max_steps, env_config, sync,
+                                             sync_interval, workers, seed, layout_seed))
+            for worker_id in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        # Drain results before joining so no worker blocks on a full queue
+        worker_results = {}
+        while len(worker_results) < workers:
+            try:
+                worker_id, stats = results.get(timeout=1)
+            except queue.Empty:
+                if any(process.exitcode not in (None, 0) for process in processes):
+                    raise RuntimeError("A training worker exited with an error")
+                continue
+            worker_results[worker_id] = stats
+        for process in processes:
+            process.join()
+
+        agent = QLearningAgent(grid_size, **learning_params)
+        agent.q_table[:] = shared
+        del shared
+    finally:
+        shm.close()
+        shm.unlink()
+
+    return agent, [worker_results[worker_id] for worker_id in range(workers)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Multiprocess Q-learning trainer")
+    parser.add_argument('--workers', type=int, default=mp.cpu_count())
+    parser.add_argument('--episodes', type=int, default=1000, help="Episodes per worker")
+    parser.add_argument('--grid-size', type=int, default=10)
+    parser.add_argument('--max-steps', type=int, default=200)
+    parser.add_argument('--sync', choices=SYNC_POLICIES, default='hogwild')
+    parser.add_argument('--sync-interval', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--layout-seed', type=int, default=None, help="Fixed layout seed")
+    args = parser.parse_args()
+
+    learning_params = {'learning_rate': 0.4, 'discount_factor': 0.97, 'epsilon': 0.1}
+    start = time.perf_counter()
+    agent, results = train_parallel(args.grid_size, args.workers, args.episodes, args.sync,
+                                    args.sync_interval, learning_params, args.max_steps,
+                                    seed=args.seed, layout_seed=args.layout_seed)
+    elapsed = time.perf_counter() - start
+
+    won = np.concatenate([r['won'] for r in results])
+    steps = np.concatenate([r['steps'] for r in results])
+    print(f"Workers: {args.workers}  Episodes: {len(won)} in {elapsed:.2f}s "
+          f"({len(won) / elapsed:.0f} episodes/s, {steps.sum() / elapsed:.0f} steps/s)")
+    print(f"Win rate: {won.mean():.1%}  Max |Q|: {np.abs(agent.q_table).max():.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+import heapq
+import numpy as np
+from environment import ACTION_DELTAS, MASK_ACTIONS, patch_action_masks, valid_action_masks
+
+class GridChanges:
+    """Cells of a watched environment's grid changed since the last take()
+
+    Register it with GridEnvironment.watch(). take(grid) returns the
+    changed (x, y) cells, or None when the caller has to compare the
+    whole grid: `grid` is not the watched grid, the grid was replaced
+    (reset, restore), or more than `limit` cells changed.
+    """
+
+    def __init__(self, environment, limit=None):
+        self.grid = environment.grid
+        self.limit = limit
+        self.cells = set()
+        self.complete = False  # Nothing is known until the first full comparison
+        environment.watch(self)
+
+    def cell_changed(self, x, y):
+        if self.complete:
+            self.cells.add((int(x), int(y)))
+            if self.limit is not None and len(self.cells) > self.limit:
+                self.grid_replaced()
+
+    def grid_replaced(self):
+        self.complete = False
+        self.cells = set()
+
+    def take(self, grid):
+        """Changed cells since the last call (None: compare the whole grid)"""
+        if grid is not self.grid:
+            # The caller's cache now follows another grid
+            self.grid_replaced()
+            return None
+        cells, complete = self.cells, self.complete
+        self.cells, self.complete = set(), True
+        return list(cells) if complete else None
+
+class DistanceFieldPlanner:
+    """Cost-to-goal field over the whole grid, used for path queries
+
+    Entering a cell costs 1, a penalty cell costs 1 + penalty_cost and a
+    reward cell costs reward_cost (kept positive so the field is well
+    defined). Obstacles cannot be entered. The field is cached by grid
+    contents and goal; when only a few cells change (a reward consumed)
+    it is repaired locally instead of recomputed. After watch(), the
+    environment reports the changed cells; otherwise update() compares
+    the whole grid with its cached copy.
+    """
+
+    def __init__(self, penalty_cost=4.0, reward_cost=0.5, max_incremental_cells=64):
+        if reward_cost <= 0:
+            raise ValueError("reward_cost must be positive")
+        self.penalty_cost = penalty_cost
+        self.reward_cost = reward_cost
+        self.max_incremental_cells = max_incremental_cells
+        self.grid = None
+        self.goal = None
+        self.cost = None
+        self.distance = None
+        self.masks = None  # Valid-move masks of the cached grid
+        self.changes = None  # GridChanges of the watched environment
+
+    def watch(self, environment):
+        """Take changed cells from the environment instead of diffing its grid"""
+        self.changes = GridChanges(environment, self.max_incremental_cells)
+
+    def cell_costs(self, grid):
+        """Cost of entering each cell (inf for obstacles)"""
+        grid = np.asarray(grid)
+        cost = np.ones(grid.shape)
+        cost[grid == 1] = np.inf
+        cost[grid == 2] = self.reward_cost
+        cost[grid == 3] = 1 + self.penalty_cost
+        return cost
+
+    def update(self, grid, goal):
+        """Bring the cached field in line with `grid` and `goal`, returning it"""
+        goal = (int(goal[0]), int(goal[1]))
+        grid = np.asarray(grid)
+        changed = None if self.changes is None else self.changes.take(grid)
+
+        if self.grid is None or goal != self.goal or grid.shape != self.grid.shape:
+            self._rebuild(grid, goal)
+            return self.distance
+
+        if changed is None:
+            changed = np.argwhere(grid != self.grid).tolist()
+        else:
+            changed = [(x, y) for x, y in changed if grid[x, y] != self.grid[x, y]]
+        if len(changed) > self.max_incremental_cells:
+            self._rebuild(grid, goal)
+        else:
+            for x, y in changed:
+                self.grid[x, y] = grid[x, y]
+                patch_action_masks(self.masks, self.grid, x, y)
+                self._update_cell(x, y, grid[x, y])
+        return self.distance
+
+    def prepare(self, grid, goal):
+        """Get ready for queries on `grid` and `goal`; the field is quick to build, so always True"""
+        self.update(grid, goal)
+        return True
+
+    def _rebuild(self, grid, goal):
+        self.grid = grid.copy()
+        self.goal = goal
+        self.masks = valid_action_masks(self.grid)
+        self.cost = self.cell_costs(grid)
+        self.distance = np.full(grid.shape, np.inf)
+        self.distance[goal] = 0
+        self._relax()
+
+    def _relax(self):
+        """Bellman-Ford sweeps with whole-array shifts until nothing improves"""
+        dist = self.distance
+        cost = self.cost
+        while True:
+            through = dist + cost  # Cost of any path that enters a cell next
+            best = dist.copy()
+            np.minimum(best[1:, :], through[:-1, :], out=best[1:, :])
+            np.minimum(best[:-1, :], through[1:, :], out=best[:-1, :])
+            np.minimum(best[:, 1:], through[:, :-1], out=best[:, 1:])
+            np.minimum(best[:, :-1], through[:, 1:], out=best[:, :-1])
+            best[self.goal] = 0
+            if np.array_equal(best, dist):
+                break
+            dist = best
+        self.distance = dist
+
+    def _neighbours(self, x, y):
+        rows, cols = self.distance.shape
+        return [(x + dx, y + dy) for dx, dy in ACTION_DELTAS if 0 <= x + dx < rows and 0 <= y + dy < cols]
+
+    def _update_cell(self, x, y, cell_value):
+        """Repair the field after one cell changed type
+
+        Only cells whose distance can change are visited: Dijkstra from a
+        frontier around (x, y) instead of sweeping the whole grid.
+        """
+        old_cost = self.cost[x, y]
+        new_cost = self.cell_costs(np.array([[cell_value]]))[0, 0]
+        if new_cost == old_cost:
+            return
+
+        dist = self.distance
+        frontier = []
+        if new_cost > old_cost:
+            # Only cells whose best path enters (x, y) can get worse: reset
+            # them and restart each from its unaffected neighbours.
+            # Dependents must be found with the costs the field was built on.
+            affected = self._dependents(x, y)
+            self.cost[x, y] = new_cost
+            for cell in affected:
+                dist[cell] = np.inf
+            for cell in affected:
+                best = min(dist[n] + self.cost[n] for n in self._neighbours(*cell))
+                if best < np.inf:
+                    frontier.append((best, cell))
+            for best, cell in frontier:
+                dist[cell] = best
+        else:
+            self.cost[x, y] = new_cost
+            through = dist[x, y] + new_cost
+            for cell in self._neighbours(x, y):
+                if through < dist[cell]:
+                    dist[cell] = through
+                    frontier.append((through, cell))
+        heapq.heapify(frontier)
+        self._settle(frontier)
+
+    def _dependents(self, x, y):
+        """Cells whose shortest path to the goal runs through (x, y)
+
+        A neighbour depends on a cell when its distance is exactly the
+        cell's distance plus the cell's cost. Ties are included, which only
+        costs a little extra work.
+        """
+        dist, cost = self.distance, self.cost
+        found = {(x, y)}
+        stack = [(x, y)]
+        while stack:
+            cell = stack.pop()
+            through = dist[cell] + cost[cell]
+            if through == np.inf:
+                continue
+            for other in self._neighbours(*cell):
+                if other not in found and other != self.goal and dist[other] == through:
+                    found.add(other)
+                    stack.append(other)
+        found.discard((x, y))
+        return list(found)
+
+    def _settle(self, frontier):
+        """Dijkstra from a heap of (distance, cell) entries until no distance improves"""
+        dist, cost = self.distance, self.cost
+        while frontier:
+            value, cell = heapq.heappop(frontier)
+            if value > dist[cell]:
+                continue  # Improved since it was queued
+            through = value + cost[cell]
+            if through == np.inf:
+                continue  # Obstacles are never entered
+            for other in self._neighbours(*cell):
+                if through < dist[other]:
+                    dist[other] = through
+                    heapq.heappush(frontier, (through, other))
+
+    def next_action(self, x, y):
+        """Action that follows the field downhill from (x, y), or None"""
+        best_action, best_value = None, np.inf
+        for action in MASK_ACTIONS[self.masks[x, y]]:
+            dx, dy = ACTION_DELTAS[action]
+            value = self.cost[x + dx, y + dy] + self.distance[x + dx, y + dy]
+            if value < best_value:
+                best_action, best_value = action, value
+        return best_action
+
+    def get_path(self, start_pos, goal_pos, grid):
+        """Cheapest path from start to goal as a list of [x, y] cells
+
+        Returns just the start cell if the goal is unreachable.
+        """
+        self.update(grid, goal_pos)
+        x, y = int(start_pos[0]), int(start_pos[1])
+        path = [[x, y]]
+        if not np.isfinite(self.distance[x, y]):
+            return path
+
+        while (x, y) != self.goal:
+            action = self.next_action(x, y)
+            if action is None:
+                break
+            dx, dy = ACTION_DELTAS[action]
+            x, y = x + dx, y + dy
+            path.append([x, y])
+        return path
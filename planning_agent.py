@@ -0,0 +1,200 @@
+import heapq
+import numpy as np
+from agent import QLearningAgent
+from environment import ACTION_DELTAS, MASK_ACTIONS, valid_action_masks
+from game import REWARD_VALUE, PENALTY_VALUE, GOAL_VALUE, STEP_VALUE
+
+class ValueIterationAgent(QLearningAgent):
+    """Agent that solves the known grid dynamics instead of learning them
+
+    Values come from value iteration over the whole grid: each sweep
+    backs up all cells at once using array shifts for the four moves
+    and a per-cell reward map built from the cell types (the same
+    scoring as GridEnvironment.step). The result is written to the
+    Q-table, so get_action and checkpoints work as for QLearningAgent.
+
+    The plan follows the grid it is given in get_goal_directed_actions
+    (or plan()). When only reward cells changed, e.g. one was consumed,
+    prioritized sweeping re-solves the cells around the change, most
+    urgent first, and falls back to full sweeps if too many cells need
+    updating. Intended for one GridEnvironment at a time.
+    """
+
+    def __init__(self, grid_size, learning_rate=0.0, discount_factor=0.97, epsilon=0.0, q_backend=None,
+                 reward_value=REWARD_VALUE, penalty_value=PENALTY_VALUE, goal_value=GOAL_VALUE,
+                 step_value=STEP_VALUE, tolerance=1e-6, max_iterations=10000, max_sweep_updates=None):
+        # learning_rate is accepted for drop-in use but unused: there is nothing to learn
+        super().__init__(grid_size, learning_rate, discount_factor, epsilon, q_backend)
+        if not self.q_backend.dense:
+            raise ValueError("ValueIterationAgent needs a dense Q-table backend")
+        self.reward_value = reward_value
+        self.penalty_value = penalty_value
+        self.goal_value = goal_value
+        self.step_value = step_value
+        self.tolerance = tolerance
+        self.max_iterations = max_iterations
+        # Past this many single-cell backups a full vectorized solve is cheaper
+        self.max_sweep_updates = grid_size * grid_size if max_sweep_updates is None else max_sweep_updates
+        self.grid = None
+        self.goal = None
+        self.values = np.zeros((grid_size, grid_size))
+        self.sweeps = 0    # Full-grid sweeps run so far
+        self.backups = 0   # Single-cell backups run by prioritized sweeping
+
+    def _neighbours(self, values, fill):
+        """(4, n, n) values of the cell each action moves into, `fill` off the grid"""
+        out = np.full((4,) + values.shape, fill, dtype=values.dtype)
+        out[0, 1:, :] = values[:-1, :]  # Up
+        out[1, :, :-1] = values[:, 1:]  # Right
+        out[2, :-1, :] = values[1:, :]  # Down
+        out[3, :, 1:] = values[:, :-1]  # Left
+        return out
+
+    def _build_model(self, grid, goal):
+        """Per-action reward and continuation maps for the current grid"""
+        enter_reward = np.full(grid.shape, float(self.step_value))
+        enter_reward[grid == 2] = self.reward_value
+        enter_reward[grid == 3] = self.penalty_value
+        enter_reward[goal] = self.goal_value
+        terminal = np.zeros(grid.shape, dtype=bool)
+        terminal[goal] = True
+
+        # Moves off the grid or into obstacles leave the agent in place
+        self._masks = valid_action_masks(grid)
+        self._open = self._neighbours(grid != 1, False)
+        self._rewards = np.where(self._open, self._neighbours(enter_reward, 0.0), self.step_value)
+        self._continue = np.where(self._open & self._neighbours(terminal, False), 0.0, self.discount_factor)
+
+    def _backup(self, values):
+        """Q-values (4, n, n) of one Bellman backup of `values`"""
+        next_values = np.where(self._open, self._neighbours(values, 0.0), values)
+        return self._rewards + self._continue * next_values
+
+    def _terminal_values(self, values):
+        values[self.goal] = 0.0  # The episode ends at the goal
+        values[self.grid == 1] = 0.0  # Never occupied
+
+    def _solve(self):
+        """Full value iteration, warm-started from the current values"""
+        values = self.values
+        for _ in range(self.max_iterations):
+            new_values = self._backup(values).max(axis=0)
+            self._terminal_values(new_values)
+            self.sweeps += 1
+            converged = np.abs(new_values - values).max() <= self.tolerance
+            values = new_values
+            if converged:
+                break
+        self.values = values
+
+    def _backup_cell(self, x, y):
+        best = -np.inf
+        for action, (dx, dy) in enumerate(ACTION_DELTAS):
+            if self._open[action, x, y]:
+                next_value = self.values[x + dx, y + dy]
+            else:
+                next_value = self.values[x, y]
+            best = max(best, self._rewards[action, x, y] + self._continue[action, x, y] * next_value)
+        return best
+
+    def _sweep(self, changed):
+        """Prioritized sweeping outward from the changed cells"""
+        rows, cols = self.values.shape
+        heap = []
+        for x, y in changed:
+            # Cells that can move into a changed cell see a new reward
+            for dx, dy in ACTION_DELTAS:
+                px, py = x - dx, y - dy
+                if 0 <= px < rows and 0 <= py < cols:
+                    heap.append((-np.inf, px, py))
+        heapq.heapify(heap)
+
+        updates = 0
+        while heap:
+            if updates >= self.max_sweep_updates:
+                self._solve()
+                return
+            _, x, y = heapq.heappop(heap)
+            if (x, y) == self.goal or self.grid[x, y] == 1:
+                continue
+            new_value = self._backup_cell(x, y)
+            change = abs(new_value - self.values[x, y])
+            self.values[x, y] = new_value
+            updates += 1
+            self.backups += 1
+            if change > self.tolerance:
+                for dx, dy in ACTION_DELTAS:
+                    px, py = x - dx, y - dy
+                    if 0 <= px < rows and 0 <= py < cols:
+                        heapq.heappush(heap, (-change, px, py))
+
+    def plan(self, grid, goal):
+        """Bring values and Q-table in line with `grid` and `goal`"""
+        goal = (int(goal[0]), int(goal[1]))
+        grid = np.asarray(grid)
+        if self.grid is not None and goal == self.goal and grid.shape == self.grid.shape:
+            changed = np.argwhere(grid != self.grid)
+            if len(changed) == 0:
+                return
+            cells = tuple(changed.T)
+            # Only reward cells come and go during an episode (2 <-> 0); anything
+            # else, e.g. an obstacle added or removed, changes the moves and needs a full solve
+            rewards_only = np.isin(self.grid[cells], (0, 2)).all() and np.isin(grid[cells], (0, 2)).all()
+            self.grid = grid.copy()
+            self._build_model(self.grid, goal)
+            if rewards_only:
+                self._sweep(changed.tolist())
+            else:
+                self._solve()
+        else:
+            self.grid = grid.copy()
+            self.goal = goal
+            self._build_model(self.grid, goal)
+            self._solve()
+
+        q_values = np.moveaxis(self._backup(self.values), 0, -1)
+        self.q_backend.array[...] = q_values
+
+    def get_goal_directed_actions(self, state, goal, grid, masks=None):
+        """Plan for the grid and return every valid action (the plan already points at the goal)
+
+        `masks` is accepted for drop-in use; the plan keeps its own valid-move masks.
+        """
+        self.plan(grid, goal)
+        return MASK_ACTIONS[self._masks[state[0], state[1]]]
+
+    def update_q_table(self, state, action, reward, new_state):
+        """Nothing to learn: values come from the model, so there is no TD error either"""
+
+    def prepare_path(self, goal_pos, grid):
+        """Paths come from the plan, so there is no planner to build"""
+        return True
+
+    def get_optimized_path(self, start_pos, goal_pos, grid):
+        """Follow the greedy policy from start, consuming rewards along the way"""
+        saved = (self.grid, self.goal, self.values.copy(), self.q_backend.array.copy())
+        scratch = np.array(grid, dtype=np.uint8)
+        x, y = int(start_pos[0]), int(start_pos[1])
+        path = [[x, y]]
+
+        for _ in range(4 * scratch.size):
+            if (x, y) == (int(goal_pos[0]), int(goal_pos[1])):
+                break
+            self.plan(scratch, goal_pos)
+            valid_actions = MASK_ACTIONS[self._masks[x, y]]
+            if not valid_actions:
+                break
+            row = self.q_backend.row(x, y)
+            action = max(valid_actions, key=lambda a: row[a])
+            dx, dy = ACTION_DELTAS[action]
+            x, y = x + dx, y + dy
+            if scratch[x, y] == 2:
+                scratch[x, y] = 0
+            path.append([x, y])
+
+        # Restore the plan for the real grid and goal
+        self.grid, self.goal, self.values = saved[0], saved[1], saved[2]
+        if self.grid is not None:
+            self._build_model(self.grid, self.goal)
+        self.q_backend.array[...] = saved[3]
+        return path
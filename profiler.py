@@ -0,0 +1,193 @@
+import json
+import time
+import numpy as np
+
+class _NullPhase:
+    """Context manager that does nothing, shared by every disabled phase"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_PHASE = _NullPhase()
+
+class _Phase:
+    __slots__ = ('profiler', 'index', 'trace')
+
+    def __init__(self, profiler, index, trace=True):
+        self.profiler = profiler
+        self.index = index
+        self.trace = trace
+
+    def __enter__(self):
+        # [start, time spent in nested phases]
+        self.profiler._open.append([time.perf_counter(), 0.0])
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        open_phases = self.profiler._open
+        start, children = open_phases.pop()
+        if open_phases:
+            open_phases[-1][1] += end - start
+        self.profiler.record(self.index, start, end, children, self.trace)
+        return False
+
+class _UntracedProfiler:
+    """View of a PhaseProfiler whose phases count toward frame totals but leave no trace spans"""
+
+    def __init__(self, profiler):
+        self.profiler = profiler
+
+    def phase(self, name):
+        return self.profiler.phase(name, trace=False)
+
+class PhaseProfiler:
+    """Per-frame phase timings kept in fixed-size ring buffers
+
+    Wrap work in `with profiler.phase('name'):` and call end_frame() once
+    per frame. Per-frame totals go into a (frames, phases) ring used for
+    percentiles; individual spans go into a second ring that can be
+    exported as a Chrome trace. While disabled, phase() returns a shared
+    no-op context manager, so instrumentation costs one method call.
+
+    Phases may nest. Frame totals hold each phase's self time, the time
+    not spent in phases nested inside it, so they add up to the frame.
+    Trace spans keep their full duration.
+    """
+
+    def __init__(self, capacity=600, trace_capacity=1 << 16, max_phases=32, enabled=False):
+        self.enabled = enabled
+        self.capacity = capacity
+        self.trace_capacity = trace_capacity
+        self.phase_names = []
+        self._phases = {}
+        self._open = []
+
+        self.frame_phase_times = np.zeros((capacity, max_phases))
+        self.frame_intervals = np.zeros(capacity)
+        self.frames = 0
+        self._current = np.zeros(max_phases)
+        self._last_frame_end = None
+
+        self.trace_phase = np.zeros(trace_capacity, dtype=np.int16)
+        self.trace_start = np.zeros(trace_capacity)
+        self.trace_duration = np.zeros(trace_capacity)
+        self.spans = 0
+        self._origin = time.perf_counter()
+
+    def phase(self, name, trace=True):
+        """Context manager timing one phase of the current frame
+
+        With trace=False the phase still counts toward the frame totals
+        but is not added to the trace, for phases run thousands of times
+        a frame.
+        """
+        if not self.enabled:
+            return _NULL_PHASE
+        timer = self._phases.get((name, trace))
+        if timer is None:
+            if name in self.phase_names:
+                index = self.phase_names.index(name)
+            elif len(self.phase_names) == len(self._current):
+                raise ValueError(f"More than {len(self._current)} profiler phases")
+            else:
+                index = len(self.phase_names)
+                self.phase_names.append(name)
+            timer = _Phase(self, index, trace)
+            self._phases[(name, trace)] = timer
+        return timer
+
+    def untraced(self):
+        """An object with phase(name) that times phases without tracing them"""
+        return _UntracedProfiler(self)
+
+    def record(self, index, start, end, children=0.0, trace=True):
+        """Add a span's self time (its duration less `children`) to the frame and trace it"""
+        duration = end - start
+        self._current[index] += duration - children
+        if not trace:
+            return
+        slot = self.spans % self.trace_capacity
+        self.trace_phase[slot] = index
+        self.trace_start[slot] = start - self._origin
+        self.trace_duration[slot] = duration
+        self.spans += 1
+
+    def end_frame(self):
+        """Close the current frame and start the next one"""
+        now = time.perf_counter()
+        if not self.enabled:
+            self._last_frame_end = None
+            return
+        slot = self.frames % self.capacity
+        self.frame_phase_times[slot] = self._current
+        self.frame_intervals[slot] = 0 if self._last_frame_end is None else now - self._last_frame_end
+        self._current[:] = 0
+        self._last_frame_end = now
+        self.frames += 1
+
+    def reset(self):
+        self.frames = 0
+        self.spans = 0
+        self._current[:] = 0
+        self._last_frame_end = None
+
+    def stats(self):
+        """Return (fps, {phase: (p50_ms, p99_ms)}) over the buffered frames"""
+        count = min(self.frames, self.capacity)
+        if count == 0:
+            return 0.0, {}
+        intervals = self.frame_intervals[:count]
+        intervals = intervals[intervals > 0]
+        fps = len(intervals) / intervals.sum() if len(intervals) else 0.0
+
+        phase_count = len(self.phase_names)
+        p50, p99 = np.percentile(self.frame_phase_times[:count, :phase_count] * 1000, [50, 99], axis=0)
+        return fps, {name: (p50[i], p99[i]) for i, name in enumerate(self.phase_names)}
+
+    def export_chrome_trace(self, path):
+        """Write the buffered spans as Chrome trace JSON (chrome://tracing, Perfetto)"""
+        count = min(self.spans, self.trace_capacity)
+        order = np.argsort(self.trace_start[:count], kind='stable')
+        events = [
+            {
+                'name': self.phase_names[self.trace_phase[i]],
+                'ph': 'X',
+                'ts': round(self.trace_start[i] * 1e6, 3),
+                'dur': round(self.trace_duration[i] * 1e6, 3),
+                'pid': 0,
+                'tid': 0,
+            }
+            for i in order.tolist()
+        ]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        return len(events)
+
+class StartupTimer:
+    """Wall-clock cost of each cold-start step
+
+    Call mark(name) after each step; it records the time since the
+    previous mark (or since `start`, a perf_counter() value).
+    """
+
+    def __init__(self, start=None):
+        self.start = time.perf_counter() if start is None else start
+        self.steps = []  # (name, seconds)
+        self._last = self.start
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.steps.append((name, now - self._last))
+        self._last = now
+
+    def total(self):
+        return self._last - self.start
+
+    def report(self):
+        lines = [f"Startup took {self.total() * 1000:.0f} ms"]
+        lines += [f"  {name:<16} {seconds * 1000:8.1f} ms" for name, seconds in self.steps]
+        return "\n".join(lines)
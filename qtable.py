@@ -0,0 +1,177 @@
+from collections import OrderedDict
+import numpy as np
+
+class DenseQTable:
+    """Q-values for every (x, y, action) in one preallocated array
+
+    dtype can be lowered to float32 or float16 to halve or quarter the
+    memory; float16 keeps about three significant digits, so very small
+    learning-rate steps may round away.
+    """
+
+    dense = True
+
+    def __init__(self, grid_size, actions=4, dtype=np.float64, array=None):
+        self.grid_size = grid_size
+        self.actions = actions
+        self.array = np.zeros((grid_size, grid_size, actions), dtype=dtype) if array is None else array
+
+    def row(self, x, y, touch=True):
+        """Q-values of all actions in state (x, y); touch only matters to SparseQTable"""
+        return self.array[x, y]
+
+    def rows(self, xs, ys, touch=True):
+        """(N, actions) Q-values for arrays of states"""
+        return self.array[xs, ys]
+
+    def get(self, x, y, action):
+        return self.array[x, y, action]
+
+    def set(self, x, y, action, value):
+        self.array[x, y, action] = value
+
+    def add(self, xs, ys, actions, deltas):
+        """Add deltas to distinct (x, y, action) entries"""
+        self.array[xs, ys, actions] += deltas
+
+    def memory_bytes(self):
+        return self.array.nbytes
+
+class SparseQTable:
+    """Q-values stored only for states that have been written
+
+    States live in a fixed pool of `capacity` rows addressed through a
+    hash map. Reading an unseen state returns `initial_value` without
+    allocating; writing one claims a row, evicting the least recently
+    used state when the pool is full. Memory therefore follows the number
+    of visited states instead of the grid area.
+
+    Reads count as uses unless they pass touch=False, which bulk readers
+    (viewers, exports) should do so that scanning the table does not
+    reorder what gets evicted.
+    """
+
+    dense = False
+
+    def __init__(self, grid_size, actions=4, capacity=1 << 20, dtype=np.float32, initial_value=0.0):
+        self.grid_size = grid_size
+        self.actions = actions
+        self.capacity = capacity
+        self.dtype = np.dtype(dtype)
+        self.initial_value = initial_value
+        self.evictions = 0
+
+        self._slots = OrderedDict()  # state key -> row, in least to most recently used order
+        self._values = np.empty((0, actions), dtype=self.dtype)
+        self._default = np.full(actions, initial_value, dtype=self.dtype)
+        self._default.setflags(write=False)
+
+    def __len__(self):
+        return len(self._slots)
+
+    def _slot(self, key):
+        """Row for a state key, claiming (and possibly evicting) one if needed"""
+        slot = self._slots.get(key)
+        if slot is not None:
+            self._slots.move_to_end(key)
+            return slot
+
+        if len(self._slots) < self.capacity:
+            slot = len(self._slots)
+            if slot >= len(self._values):
+                self._grow()
+        else:
+            _, slot = self._slots.popitem(last=False)
+            self.evictions += 1
+        self._values[slot] = self.initial_value
+        self._slots[key] = slot
+        return slot
+
+    def _grow(self):
+        """Double the row pool (up to capacity) so memory tracks usage"""
+        size = min(self.capacity, max(64, 2 * len(self._values)))
+        values = np.empty((size, self.actions), dtype=self.dtype)
+        values[:len(self._values)] = self._values
+        self._values = values
+
+    def row(self, x, y, touch=True):
+        key = int(x) * self.grid_size + int(y)
+        slot = self._slots.get(key)
+        if slot is None:
+            return self._default
+        if touch:
+            self._slots.move_to_end(key)
+        return self._values[slot]
+
+    def rows(self, xs, ys, touch=True):
+        keys = np.asarray(xs, dtype=np.int64) * self.grid_size + np.asarray(ys, dtype=np.int64)
+        out = np.full((len(keys), self.actions), self.initial_value, dtype=self.dtype)
+        slots = self._slots
+        if not touch:
+            found = [(i, slot) for i, slot in enumerate(map(slots.get, keys.tolist())) if slot is not None]
+            if found:
+                index, found_slots = zip(*found)
+                out[list(index)] = self._values[list(found_slots)]
+            return out
+        for i, key in enumerate(keys.tolist()):
+            slot = slots.get(key)
+            if slot is not None:
+                slots.move_to_end(key)
+                out[i] = self._values[slot]
+        return out
+
+    def get(self, x, y, action):
+        return self.row(x, y)[action]
+
+    def set(self, x, y, action, value):
+        slot = self._slot(int(x) * self.grid_size + int(y))  # May grow the pool
+        self._values[slot, action] = value
+
+    def add(self, xs, ys, actions, deltas):
+        keys = np.asarray(xs, dtype=np.int64) * self.grid_size + np.asarray(ys, dtype=np.int64)
+        for key, action, delta in zip(keys.tolist(), np.asarray(actions).tolist(), np.asarray(deltas).tolist()):
+            slot = self._slot(key)
+            self._values[slot, action] += delta
+
+    def export(self):
+        """(keys, rows) copies of the stored states, least recently used first
+
+        A key is x * grid_size + y. Memory follows the stored states, not
+        the grid area, so this is what checkpoints save.
+        """
+        keys = np.fromiter(self._slots.keys(), dtype=np.int64, count=len(self._slots))
+        slots = np.fromiter(self._slots.values(), dtype=np.int64, count=len(self._slots))
+        return keys, self._values[slots]
+
+    def load(self, keys, rows):
+        """Replace the contents with (keys, rows) as returned by export()"""
+        keys = np.asarray(keys, dtype=np.int64)[-self.capacity:]
+        rows = np.asarray(rows, dtype=self.dtype).reshape(-1, self.actions)[-self.capacity:]
+        self._slots = OrderedDict(zip(keys.tolist(), range(len(keys))))
+        self._values = rows.copy()
+
+    @property
+    def array(self):
+        """Dense copy of the table (for small grids and viewers)"""
+        dense = np.full((self.grid_size, self.grid_size, self.actions), self.initial_value, dtype=self.dtype)
+        keys, rows = self.export()
+        dense[keys // self.grid_size, keys % self.grid_size] = rows
+        return dense
+
+    def memory_bytes(self):
+        # Rough per-entry cost of the hash map on top of the row pool
+        return self._values.nbytes + len(self._slots) * 100
+
+Q_TABLE_KINDS = ('dense', 'float32', 'float16', 'sparse')
+
+def make_q_table(kind, grid_size, actions=4, **kwargs):
+    """Build a Q-table backend by name"""
+    if kind == 'dense':
+        return DenseQTable(grid_size, actions, **kwargs)
+    if kind == 'float32':
+        return DenseQTable(grid_size, actions, dtype=np.float32, **kwargs)
+    if kind == 'float16':
+        return DenseQTable(grid_size, actions, dtype=np.float16, **kwargs)
+    if kind == 'sparse':
+        return SparseQTable(grid_size, actions, **kwargs)
+    raise ValueError(f"Unknown Q-table kind {kind!r}, expected one of {Q_TABLE_KINDS}")
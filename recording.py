@@ -0,0 +1,367 @@
+import argparse
+import struct
+import sys
+import numpy as np
+from environment import GridEnvironment
+from mapgen import pack_grids, unpack_grids
+
+RECORD_MAGIC = b'GRIDEPIS'
+RECORD_VERSION = 1
+FLAG_LAYOUT = 1  # The packed grid follows the header; otherwise the map comes from the seed
+# magic, version, grid_size, flags, keyframe_interval, seed, steps, keyframes, mask_bytes,
+# obstacles, rewards, penalties, min_goal_distance, max_steps,
+# reward_value, penalty_value, goal_value, step_value, final_score, won
+_HEADER = struct.Struct('<8sIIIIqQIIIIIiiddddd?')
+
+KEYFRAME_DTYPE = np.dtype([('step', '<u4'), ('score', '<f8'), ('x', '<u2'), ('y', '<u2')])
+
+class EpisodeLog:
+    """One recorded episode: how to rebuild its map, every action, and keyframes
+
+    Keyframes hold the step, score and agent position, plus one bit per
+    initial reward cell (in row-major order) telling whether it has been
+    consumed, so any step can be rebuilt without replaying from the start.
+    """
+
+    def __init__(self, grid_size, config, scoring, max_steps=None, seed=None, layout=None,
+                 keyframe_interval=64):
+        self.grid_size = grid_size
+        self.config = config      # obstacle_count, reward_count, penalty_count, min_goal_distance
+        self.scoring = scoring    # reward_value, penalty_value, goal_value, step_value
+        self.max_steps = max_steps
+        self.seed = seed
+        self.layout = layout
+        self.keyframe_interval = keyframe_interval
+        self.actions = np.zeros(0, dtype=np.uint8)
+        self.keyframes = np.zeros(0, dtype=KEYFRAME_DTYPE)
+        self.consumed = np.zeros((0, 0), dtype=np.uint8)
+        self.final_score = 0.0
+        self.won = False
+
+    @property
+    def steps(self):
+        return len(self.actions)
+
+    def make_environment(self):
+        """Return a GridEnvironment reset to this episode's first step"""
+        environment = GridEnvironment(self.grid_size, max_steps=self.max_steps)
+        (environment.obstacle_count, environment.reward_count,
+         environment.penalty_count, environment.min_goal_distance) = self.config
+        (environment.reward_value, environment.penalty_value,
+         environment.goal_value, environment.step_value) = self.scoring
+        if self.layout is not None:
+            environment.reset(layout=self.layout)
+        else:
+            environment.reset(self.seed)
+        return environment
+
+    def to_bytes(self):
+        min_goal_distance = self.config[3]
+        header = _HEADER.pack(
+            RECORD_MAGIC, RECORD_VERSION, self.grid_size,
+            FLAG_LAYOUT if self.layout is not None else 0, self.keyframe_interval,
+            0 if self.seed is None else self.seed, self.steps, len(self.keyframes),
+            self.consumed.shape[1], *self.config[:3],
+            -1 if min_goal_distance is None else min_goal_distance,
+            -1 if self.max_steps is None else self.max_steps,
+            *self.scoring, self.final_score, self.won)
+        parts = [header]
+        if self.layout is not None:
+            parts.append(pack_grids(self.layout[None]).tobytes())
+        parts += [self.actions.tobytes(), self.keyframes.tobytes(), self.consumed.tobytes()]
+        return b''.join(parts)
+
+    @classmethod
+    def from_buffer(cls, buffer, offset=0):
+        """Parse one record, returning (log, offset just past it)"""
+        (magic, version, grid_size, flags, keyframe_interval, seed, steps, keyframes, mask_bytes,
+         obstacles, rewards, penalties, min_goal_distance, max_steps,
+         reward_value, penalty_value, goal_value, step_value,
+         final_score, won) = _HEADER.unpack_from(buffer, offset)
+        if magic != RECORD_MAGIC:
+            raise ValueError(f"No episode record at offset {offset}")
+        if version != RECORD_VERSION:
+            raise ValueError(f"Unsupported episode record version {version}")
+        offset += _HEADER.size
+
+        layout = None
+        if flags & FLAG_LAYOUT:
+            row_bytes = (grid_size * grid_size + 1) // 2
+            packed = np.frombuffer(buffer, dtype=np.uint8, count=row_bytes, offset=offset)
+            layout = unpack_grids(packed[None], grid_size)[0]
+            offset += row_bytes
+
+        log = cls(grid_size, (obstacles, rewards, penalties, None if min_goal_distance < 0 else min_goal_distance),
+                  (reward_value, penalty_value, goal_value, step_value),
+                  None if max_steps < 0 else max_steps, None if layout is not None else seed,
+                  layout, keyframe_interval)
+        log.actions = np.frombuffer(buffer, dtype=np.uint8, count=steps, offset=offset)
+        offset += steps
+        log.keyframes = np.frombuffer(buffer, dtype=KEYFRAME_DTYPE, count=keyframes, offset=offset)
+        offset += keyframes * KEYFRAME_DTYPE.itemsize
+        log.consumed = np.frombuffer(buffer, dtype=np.uint8, count=keyframes * mask_bytes,
+                                     offset=offset).reshape(keyframes, mask_bytes)
+        offset += keyframes * mask_bytes
+        log.final_score = final_score
+        log.won = won
+        return log, offset
+
+def read_episodes(path):
+    """Return every EpisodeLog stored in a recording file"""
+    with open(path, 'rb') as f:
+        buffer = f.read()
+    logs = []
+    offset = 0
+    while offset < len(buffer):
+        log, offset = EpisodeLog.from_buffer(buffer, offset)
+        logs.append(log)
+    return logs
+
+def _consumed_bits(environment, reward_cells):
+    return np.packbits(environment.consumed.ravel()[reward_cells])
+
+class EpisodeRecorder:
+    """Append episodes to a recording file as they are played
+
+    Call begin() right after resetting the environment, record() after
+    every step and end() (or begin() for the next episode) when it is
+    over. Pass the seed given to reset() to store it instead of the map;
+    otherwise the packed grid is stored. Records are appended, so one
+    file can hold any number of episodes.
+    """
+
+    def __init__(self, path, keyframe_interval=64):
+        self.path = path
+        self.keyframe_interval = keyframe_interval
+        self.file = open(path, 'ab')
+        self.episodes = 0
+        self._log = None
+
+    def begin(self, environment, seed=None):
+        self.end()
+        self._environment = environment
+        grid = environment.grid
+        self._reward_cells = np.flatnonzero(grid.ravel() == 2)
+        self._log = EpisodeLog(
+            environment.grid_size,
+            (environment.obstacle_count, environment.reward_count,
+             environment.penalty_count, environment.min_goal_distance),
+            (environment.reward_value, environment.penalty_value,
+             environment.goal_value, environment.step_value),
+            environment.max_steps, seed,
+            None if seed is not None else np.array(grid, dtype=np.uint8),
+            self.keyframe_interval)
+        self._actions = bytearray()
+        self._keyframes = []
+        self._masks = []
+        self._score = 0.0
+        self._won = False
+        self._keyframe()
+
+    def record(self, action, reward, won=False):
+        """Log one step taken in the environment passed to begin()"""
+        self._actions.append(action)
+        self._score += reward
+        self._won = self._won or won
+        if len(self._actions) % self.keyframe_interval == 0:
+            self._keyframe()
+
+    def _keyframe(self):
+        x, y = self._environment.position()
+        self._keyframes.append((len(self._actions), self._score, x, y))
+        self._masks.append(_consumed_bits(self._environment, self._reward_cells))
+
+    def end(self):
+        """Write the current episode, if any"""
+        log = self._log
+        if log is None:
+            return
+        log.actions = np.frombuffer(bytes(self._actions), dtype=np.uint8)
+        log.keyframes = np.array(self._keyframes, dtype=KEYFRAME_DTYPE)
+        log.consumed = np.array(self._masks, dtype=np.uint8).reshape(len(self._masks),
+                                                                     (len(self._reward_cells) + 7) // 8)
+        log.final_score = self._score
+        log.won = self._won
+        self.file.write(log.to_bytes())
+        self.episodes += 1
+        self._log = None
+        self._environment = None
+
+    def close(self):
+        self.end()
+        self.file.close()
+
+class ReplayPlayer:
+    """Rebuild the environment at any step of a recorded episode
+
+    seek() restores the nearest keyframe at or before the step and
+    replays the few actions after it. Positions are worked out once for
+    the whole episode (moves only depend on the static obstacles), so
+    the visited trail is exact at every step.
+    """
+
+    def __init__(self, log):
+        self.log = log
+        self.environment = log.make_environment()
+        self.initial_state = self.environment.snapshot()
+        self.initial_grid = self.environment.grid.copy()
+        self.reward_cells = np.flatnonzero(self.initial_grid.ravel() == 2)
+        self.positions = self._trace_positions()
+        self.step = 0
+        self.score = 0.0
+
+    def _trace_positions(self):
+        """Agent position after every step, (steps + 1, 2)"""
+        environment = self.environment
+        passable = self.initial_grid != 1
+        deltas = np.array(((-1, 0), (0, 1), (1, 0), (0, -1)))
+        size = environment.grid_size
+        positions = np.zeros((self.log.steps + 1, 2), dtype=np.int64)
+        x, y = environment.position()
+        positions[0] = x, y
+        for i, (dx, dy) in enumerate(deltas[self.log.actions].tolist()):
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < size and 0 <= ny < size and passable[nx, ny]:
+                x, y = nx, ny
+            positions[i + 1] = x, y
+        return positions
+
+    def seek(self, step):
+        """Put the environment at `step` (0 = start) and return it"""
+        log = self.log
+        step = max(0, min(step, log.steps))
+        index = np.searchsorted(log.keyframes['step'], step, side='right') - 1
+        keyframe = log.keyframes[index]
+
+        environment = self.environment
+        environment.restore(self.initial_state)
+        consumed = self.reward_cells[np.unpackbits(log.consumed[index])[:len(self.reward_cells)].astype(bool)]
+        environment.grid.ravel()[consumed] = 0
+        environment.consumed.ravel()[consumed] = True
+        environment.agent_pos[:] = keyframe['x'], keyframe['y']
+        environment.steps = int(keyframe['step'])
+        self.score = float(keyframe['score'])
+
+        for action in log.actions[environment.steps:step].tolist():
+            _, reward, _, _ = environment.step(action)
+            self.score += reward
+
+        environment.visited[tuple(self.positions[:step + 1].T)] = True
+        self.step = step
+        return environment
+
+def verify(log):
+    """Re-simulate a log from the start, returning a list of mismatches (empty if it replays exactly)"""
+    environment = log.make_environment()
+    reward_cells = np.flatnonzero(environment.grid.ravel() == 2)
+    by_step = {int(step): i for i, step in enumerate(log.keyframes['step'])}
+    errors = []
+    score = 0.0
+    won = False
+
+    for step in range(log.steps + 1):
+        index = by_step.get(step)
+        if index is not None:
+            keyframe = log.keyframes[index]
+            if (int(keyframe['x']), int(keyframe['y'])) != environment.position():
+                errors.append(f"step {step}: agent at {environment.position()}, "
+                              f"recorded {(int(keyframe['x']), int(keyframe['y']))}")
+            if not np.isclose(keyframe['score'], score):
+                errors.append(f"step {step}: score {score}, recorded {keyframe['score']}")
+            if not np.array_equal(_consumed_bits(environment, reward_cells), log.consumed[index]):
+                errors.append(f"step {step}: consumed rewards differ")
+        if step == log.steps:
+            break
+        _, reward, done, info = environment.step(int(log.actions[step]))
+        score += reward
+        won = won or info['won']
+
+    if not np.isclose(score, log.final_score) or won != log.won:
+        errors.append(f"final score {score} won={won}, recorded {log.final_score} won={log.won}")
+    return errors
+
+def play(logs, episode=0):
+    """Step through recorded episodes in a window
+
+    Left/Right: one step, Page Up/Down: one keyframe, Home/End: start/end,
+    SPACE: play/pause, N/P: next/previous episode.
+    """
+    import pygame
+    from game import GridGame
+    from ui import GameUI
+
+    player = ReplayPlayer(logs[episode])
+    size = player.log.grid_size
+    cell_size = max(12, 600 // size)
+    ui = GameUI(width=max(900, size * cell_size + 100), height=size * cell_size + 300,
+                grid_size=size, cell_size=cell_size, agent_size=cell_size - 10)
+    game_state = GridGame(size)
+    clock = pygame.time.Clock()
+    playing = False
+    running = True
+    target = 0
+
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN:
+                interval = player.log.keyframe_interval
+                if event.key == pygame.K_RIGHT:
+                    target = player.step + 1
+                elif event.key == pygame.K_LEFT:
+                    target = player.step - 1
+                elif event.key == pygame.K_PAGEDOWN:
+                    target = player.step + interval
+                elif event.key == pygame.K_PAGEUP:
+                    target = player.step - interval
+                elif event.key == pygame.K_HOME:
+                    target = 0
+                elif event.key == pygame.K_END:
+                    target = player.log.steps
+                elif event.key == pygame.K_SPACE:
+                    playing = not playing
+                elif event.key in (pygame.K_n, pygame.K_p):
+                    episode = (episode + (1 if event.key == pygame.K_n else -1)) % len(logs)
+                    player = ReplayPlayer(logs[episode])
+                    ui.invalidate()
+                    target = 0
+        if playing:
+            target = player.step + 1
+            playing = target < player.log.steps
+
+        environment = player.seek(target)
+        game_state.score = player.score
+        game_state.steps = player.step
+        pygame.display.set_caption(f"Episode {episode + 1}/{len(logs)}  step {player.step}/{player.log.steps}")
+        ui.draw(environment, game_state, environment.position(), None)
+        clock.tick(30 if playing else 60)
+    pygame.quit()
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and check recorded episodes")
+    parser.add_argument('command', choices=('verify', 'play', 'info'))
+    parser.add_argument('path')
+    parser.add_argument('--episode', type=int, default=0, help="Episode to start playback at")
+    args = parser.parse_args()
+
+    logs = read_episodes(args.path)
+    if args.command == 'info':
+        steps = sum(log.steps for log in logs)
+        wins = sum(log.won for log in logs)
+        print(f"{len(logs)} episodes, {steps} steps, {wins} won")
+    elif args.command == 'verify':
+        failed = 0
+        for i, log in enumerate(logs):
+            errors = verify(log)
+            if errors:
+                failed += 1
+                print(f"Episode {i}: " + "; ".join(errors[:3]))
+        print(f"{len(logs) - failed}/{len(logs)} episodes replay exactly")
+        return 1 if failed else 0
+    else:
+        play(logs, args.episode)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+import numpy as np
+from environment import ACTION_DELTAS
+
+class ReplayBuffer:
+    """Fixed-size ring buffer of transitions stored as NumPy columns
+
+    Once full, new transitions overwrite the oldest. sample() draws
+    uniformly or, with prioritized=True, in proportion to
+    (|TD error| + eps) ** alpha; new transitions start at the highest
+    priority seen so they are replayed at least once.
+    """
+
+    def __init__(self, capacity=10000, alpha=0.6, eps=1e-3):
+        self.capacity = capacity
+        self.alpha = alpha
+        self.eps = eps
+        self.states = np.zeros((capacity, 2), dtype=np.int32)
+        self.actions = np.zeros(capacity, dtype=np.uint8)
+        self.rewards = np.zeros(capacity)
+        self.next_states = np.zeros((capacity, 2), dtype=np.int32)
+        self.dones = np.zeros(capacity, dtype=bool)
+        self.priorities = np.zeros(capacity)
+        self.size = 0
+        self.position = 0
+        self._max_priority = 1.0
+
+    def __len__(self):
+        return self.size
+
+    def clear(self):
+        self.size = 0
+        self.position = 0
+        self._max_priority = 1.0
+
+    def add(self, state, action, reward, next_state, done):
+        i = self.position
+        self.states[i] = state
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.next_states[i] = next_state
+        self.dones[i] = done
+        self.priorities[i] = self._max_priority
+        self.position = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def add_batch(self, states, actions, rewards, next_states, dones):
+        """Append many transitions at once (e.g. one step of a batch environment)"""
+        count = len(actions)
+        if count > self.capacity:
+            # Only the newest `capacity` transitions would survive anyway
+            states, actions, rewards = states[-self.capacity:], actions[-self.capacity:], rewards[-self.capacity:]
+            next_states, dones = next_states[-self.capacity:], dones[-self.capacity:]
+            count = self.capacity
+        index = (self.position + np.arange(count)) % self.capacity
+        self.states[index] = states
+        self.actions[index] = actions
+        self.rewards[index] = rewards
+        self.next_states[index] = next_states
+        self.dones[index] = dones
+        self.priorities[index] = self._max_priority
+        self.position = (self.position + count) % self.capacity
+        self.size = min(self.size + count, self.capacity)
+
+    def sample(self, batch_size, rng, prioritized=False):
+        """Return (indices, states, actions, rewards, next_states, dones), or None if empty"""
+        if self.size == 0:
+            return None
+        if prioritized:
+            weights = np.cumsum(self.priorities[:self.size] ** self.alpha)
+            indices = np.searchsorted(weights, rng.random(batch_size) * weights[-1], side='right')
+            indices = np.minimum(indices, self.size - 1)
+        else:
+            indices = rng.integers(0, self.size, batch_size)
+        return (indices, self.states[indices], self.actions[indices], self.rewards[indices],
+                self.next_states[indices], self.dones[indices])
+
+    def update_priorities(self, indices, td_errors):
+        priorities = np.abs(td_errors) + self.eps
+        self.priorities[indices] = priorities
+        self._max_priority = max(self._max_priority, priorities.max())
+
+class TransitionModel:
+    """Last observed outcome of every (state, action), for Dyna-Q planning
+
+    The grid is deterministic, so the most recent transition from a
+    (state, action) is its model. A consumed reward changes what entering
+    its cell is worth, so forget_into() drops every pair that moves into
+    that cell until it is observed again. sample() draws previously seen
+    pairs uniformly and returns the simulated transitions in the same
+    layout as ReplayBuffer.sample.
+    """
+
+    def __init__(self, grid_size, actions=4):
+        self.grid_size = grid_size
+        self.next_states = np.zeros((grid_size, grid_size, actions, 2), dtype=np.int32)
+        self.rewards = np.zeros((grid_size, grid_size, actions))
+        self.dones = np.zeros((grid_size, grid_size, actions), dtype=bool)
+        self.seen = np.zeros((grid_size, grid_size, actions), dtype=bool)
+        self._seen_index = None  # Flat indices of seen pairs, rebuilt after new pairs arrive
+
+    def __len__(self):
+        return int(self.seen.sum())
+
+    def clear(self):
+        self.seen[:] = False
+        self._seen_index = None
+
+    def add(self, state, action, reward, next_state, done):
+        x, y = state
+        if not self.seen[x, y, action]:
+            self.seen[x, y, action] = True
+            self._seen_index = None
+        self.next_states[x, y, action] = next_state
+        self.rewards[x, y, action] = reward
+        self.dones[x, y, action] = done
+
+    def forget_into(self, cell):
+        """Drop the modelled moves into `cell`, e.g. after its reward was consumed"""
+        x, y = cell
+        for action, (dx, dy) in enumerate(ACTION_DELTAS):
+            px, py = x - dx, y - dy
+            if 0 <= px < self.grid_size and 0 <= py < self.grid_size and self.seen[px, py, action]:
+                self.seen[px, py, action] = False
+                self._seen_index = None
+
+    def add_batch(self, states, actions, rewards, next_states, dones):
+        states = np.asarray(states)
+        xs, ys = states[:, 0], states[:, 1]
+        self.seen[xs, ys, actions] = True
+        self.next_states[xs, ys, actions] = next_states
+        self.rewards[xs, ys, actions] = rewards
+        self.dones[xs, ys, actions] = dones
+        self._seen_index = None
+
+    def sample(self, batch_size, rng, prioritized=False):
+        """Simulated transitions from seen pairs; `prioritized` is not supported and ignored"""
+        if self._seen_index is None:
+            self._seen_index = np.flatnonzero(self.seen)
+        if len(self._seen_index) == 0:
+            return None
+        flat = self._seen_index[rng.integers(0, len(self._seen_index), batch_size)]
+        cells, actions = np.divmod(flat, self.seen.shape[-1])
+        xs, ys = np.divmod(cells, self.grid_size)
+        return (flat, np.stack([xs, ys], axis=1), actions, self.rewards[xs, ys, actions],
+                self.next_states[xs, ys, actions], self.dones[xs, ys, actions])
+
+class ExperienceReplay:
+    """Extra batched updates after every real step
+
+    Wraps a ReplayBuffer (experience replay) or a TransitionModel
+    (Dyna-Q). step() stores the real transition, then runs `updates`
+    batched Q-updates of `batch_size` sampled transitions through
+    QLearningAgent.replay(). Pass consumed=True when the step ate a
+    reward so a TransitionModel stops simulating it. step() returns the
+    squared norm of the batched Q changes.
+    """
+
+    def __init__(self, source, updates=4, batch_size=32, prioritized=False):
+        if prioritized and not isinstance(source, ReplayBuffer):
+            raise ValueError("Prioritized sampling needs a ReplayBuffer")
+        self.source = source
+        self.updates = updates
+        self.batch_size = batch_size
+        self.prioritized = prioritized
+
+    def step(self, agent, state, action, reward, next_state, done, consumed=False):
+        self.source.add(state, action, reward, next_state, done)
+        if consumed and isinstance(self.source, TransitionModel):
+            self.source.forget_into(next_state)
+        return agent.replay(self.source, self.batch_size, self.updates, self.prioritized)
+
+    def new_map(self):
+        """Forget transitions from the previous layout"""
+        self.source.clear()
+
+REPLAY_MODES = ('off', 'uniform', 'prioritized', 'dyna')
+
+def make_replay(mode, grid_size, updates=4, batch_size=32, capacity=10000):
+    """Build the ExperienceReplay for one of REPLAY_MODES (None for 'off')"""
+    if mode == 'off':
+        return None
+    if mode == 'dyna':
+        return ExperienceReplay(TransitionModel(grid_size), updates, batch_size)
+    if mode in ('uniform', 'prioritized'):
+        return ExperienceReplay(ReplayBuffer(capacity), updates, batch_size, prioritized=mode == 'prioritized')
+    raise ValueError(f"Unknown replay mode {mode!r}, expected one of {REPLAY_MODES}")
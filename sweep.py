@@ -0,0 +1,219 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from environment import GridEnvironment
+from agent import QLearningAgent
+from replay import REPLAY_MODES, make_replay
+from trainer import run_episode
+
+# The settings main.py plays with; every sweep axis overrides one of these
+DEFAULT_CONFIG = {
+    'learning_rate': 0.4,
+    'discount_factor': 0.97,
+    'epsilon': 0.1,
+    'replay_mode': 'dyna',
+    'obstacle_count': 4,
+    'reward_count': 10,
+    'penalty_count': 2,
+    'min_goal_distance': 8,
+    'reward_value': 15,
+    'penalty_value': -3,
+    'goal_value': 150,
+    'step_value': 1,
+}
+LEARNING_KEYS = ('learning_rate', 'discount_factor', 'epsilon')
+
+def config_id(config):
+    """Stable short id of a configuration, used to resume sweeps"""
+    return hashlib.sha1(json.dumps(config, sort_keys=True).encode()).hexdigest()[:12]
+
+def make_configs(axes):
+    """Every combination of the {name: [values]} axes, on top of DEFAULT_CONFIG"""
+    names = list(axes)
+    return [dict(DEFAULT_CONFIG, **dict(zip(names, values)))
+            for values in itertools.product(*(axes[name] for name in names))]
+
+def evaluate(config, seeds, episodes_per_seed, grid_size=10, max_steps=75):
+    """Play episodes_per_seed episodes on each seeded map with a fresh agent
+
+    Mirrors a game session: the agent learns online and keeps its
+    Q-table across episodes on the same map. max_steps defaults to the
+    moves that fit in main.py's 30 s time limit. Returns summed stats
+    so rounds can be merged.
+    """
+    wins = 0
+    episodes = 0
+    score_sum = 0.0
+    goal_steps = 0
+    for seed in seeds:
+        random.seed(seed)
+        environment = GridEnvironment(grid_size, max_steps=max_steps)
+        for name, value in config.items():
+            if name not in LEARNING_KEYS and hasattr(environment, name):
+                setattr(environment, name, value)
+        agent = QLearningAgent(grid_size, **{name: config[name] for name in LEARNING_KEYS})
+        agent.rng = np.random.default_rng(seed)
+        replay = make_replay(config['replay_mode'], grid_size)
+        for _ in range(episodes_per_seed):
+            score, steps, won = run_episode(agent, environment, seed, replay=replay)
+            episodes += 1
+            score_sum += score
+            if won:
+                wins += 1
+                goal_steps += steps
+    return {'wins': wins, 'episodes': episodes, 'score_sum': score_sum, 'goal_steps': goal_steps}
+
+def _new_entry(config):
+    return {'config': config, 'rounds': set(), 'wins': 0, 'episodes': 0, 'score_sum': 0.0,
+            'goal_steps': 0, 'stopped': False}
+
+def load_results(path):
+    """Rebuild {config_id: entry} from a results file written by run_sweep"""
+    entries = {}
+    if not os.path.exists(path):
+        return entries
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # A line cut short by an interrupted run
+            entry = entries.setdefault(record['id'], _new_entry(record['config']))
+            if record.get('stopped'):
+                entry['stopped'] = True
+            elif record['round'] not in entry['rounds']:
+                entry['rounds'].add(record['round'])
+                for key in ('wins', 'episodes', 'score_sum', 'goal_steps'):
+                    entry[key] += record[key]
+    return entries
+
+def win_rate_bounds(entry, z=2.0):
+    """Normal-approximation confidence interval of an entry's win rate"""
+    n = max(entry['episodes'], 1)
+    p = entry['wins'] / n
+    margin = z * np.sqrt((p * (1 - p) + 1 / n) / n)  # 1/n keeps 0% and 100% from looking certain
+    return p - margin, p + margin
+
+def run_sweep(configs, path, rounds=5, seeds_per_round=8, episodes_per_seed=5, workers=None,
+              grid_size=10, max_steps=75, base_seed=0, z=2.0):
+    """Evaluate configs over a process pool, streaming results to a JSONL file
+
+    Round r plays seeds base_seed + r * seeds_per_round onwards, the same
+    maps for every configuration. Each finished (config, round) is
+    appended to `path` straight away, and rounds already in the file are
+    skipped, so an interrupted sweep picks up where it left off. After
+    each round, configs whose win rate is clearly below the best (upper
+    bound under the best lower bound) are stopped.
+    """
+    entries = load_results(path)
+    for config in configs:
+        entries.setdefault(config_id(config), _new_entry(config))
+    ids = [config_id(config) for config in configs]
+
+    with ProcessPoolExecutor(workers) as pool, open(path, 'a') as out:
+        for round_index in range(rounds):
+            seeds = range(base_seed + round_index * seeds_per_round,
+                          base_seed + (round_index + 1) * seeds_per_round)
+            pending = {}
+            for cid in ids:
+                entry = entries[cid]
+                if not entry['stopped'] and round_index not in entry['rounds']:
+                    future = pool.submit(evaluate, entry['config'], seeds, episodes_per_seed, grid_size, max_steps)
+                    pending[future] = cid
+
+            start = time.perf_counter()
+            for future in as_completed(pending):
+                cid = pending[future]
+                stats = future.result()
+                entry = entries[cid]
+                entry['rounds'].add(round_index)
+                for key, value in stats.items():
+                    entry[key] += value
+                out.write(json.dumps({'id': cid, 'round': round_index, 'config': entry['config'], **stats}) + "\n")
+                out.flush()
+            if pending:
+                print(f"Round {round_index + 1}/{rounds}: {len(pending)} configs "
+                      f"in {time.perf_counter() - start:.1f}s")
+
+            active = [cid for cid in ids if not entries[cid]['stopped']]
+            if len(active) > 1:
+                best_lower = max(win_rate_bounds(entries[cid], z)[0] for cid in active)
+                for cid in active:
+                    if win_rate_bounds(entries[cid], z)[1] < best_lower:
+                        entries[cid]['stopped'] = True
+                        out.write(json.dumps({'id': cid, 'config': entries[cid]['config'], 'stopped': True,
+                                              'round': round_index}) + "\n")
+                out.flush()
+
+    return [entries[cid] for cid in ids]
+
+def summarize(entries):
+    """Result rows sorted best first: win rate, then mean score"""
+    rows = []
+    for entry in entries:
+        episodes = max(entry['episodes'], 1)
+        rows.append({
+            'id': config_id(entry['config']),
+            'config': entry['config'],
+            'episodes': entry['episodes'],
+            'win_rate': entry['wins'] / episodes,
+            'mean_score': entry['score_sum'] / episodes,
+            'steps_to_goal': entry['goal_steps'] / entry['wins'] if entry['wins'] else float('nan'),
+            'stopped': entry['stopped'],
+        })
+    rows.sort(key=lambda row: (row['win_rate'], row['mean_score']), reverse=True)
+    return rows
+
+def print_table(rows, axes, limit=20):
+    names = list(axes)
+    header = " ".join(f"{name[:14]:>14}" for name in names)
+    print(f"{header} {'episodes':>8} {'win':>6} {'score':>8} {'steps':>6}")
+    for row in rows[:limit]:
+        values = " ".join(f"{str(row['config'][name])[:14]:>14}" for name in names)
+        print(f"{values} {row['episodes']:>8} {row['win_rate']:>6.1%} {row['mean_score']:>8.1f} "
+              f"{row['steps_to_goal']:>6.1f}{'  (stopped)' if row['stopped'] else ''}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel hyperparameter sweep over headless games")
+    parser.add_argument('--learning-rate', type=float, nargs='+', default=[0.1, 0.2, 0.4, 0.6])
+    parser.add_argument('--discount-factor', type=float, nargs='+', default=[0.9, 0.97, 0.99])
+    parser.add_argument('--epsilon', type=float, nargs='+', default=[0.05, 0.1, 0.2])
+    parser.add_argument('--replay-mode', choices=REPLAY_MODES, nargs='+', default=[DEFAULT_CONFIG['replay_mode']])
+    parser.add_argument('--obstacle-count', type=int, nargs='+', default=[DEFAULT_CONFIG['obstacle_count']])
+    parser.add_argument('--reward-count', type=int, nargs='+', default=[DEFAULT_CONFIG['reward_count']])
+    parser.add_argument('--min-goal-distance', type=int, nargs='+', default=[DEFAULT_CONFIG['min_goal_distance']])
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--seeds-per-round', type=int, default=8, help="Maps per round, each with a fresh agent")
+    parser.add_argument('--episodes-per-seed', type=int, default=5)
+    parser.add_argument('--max-steps', type=int, default=75, help="Moves per episode (30 s at 0.4 s per move)")
+    parser.add_argument('--grid-size', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', default='sweep_results.jsonl', help="Results file; rerun to resume")
+    args = parser.parse_args()
+
+    axes = {
+        'learning_rate': args.learning_rate,
+        'discount_factor': args.discount_factor,
+        'epsilon': args.epsilon,
+        'replay_mode': args.replay_mode,
+        'obstacle_count': args.obstacle_count,
+        'reward_count': args.reward_count,
+        'min_goal_distance': args.min_goal_distance,
+    }
+    configs = make_configs(axes)
+    print(f"Sweeping {len(configs)} configurations into {args.output}")
+    start = time.perf_counter()
+    entries = run_sweep(configs, args.output, args.rounds, args.seeds_per_round, args.episodes_per_seed,
+                        args.workers, args.grid_size, args.max_steps)
+    print(f"Done in {time.perf_counter() - start:.1f}s")
+    # Only show the axes that were actually swept
+    print_table(summarize(entries), {name: values for name, values in axes.items() if len(values) > 1} or axes)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import numpy as np
+from agent import QLearningAgent
+from qtable import SparseQTable
+
+def _agent(q_backend=None):
+    agent = QLearningAgent(6, learning_rate=0.5, discount_factor=0.9, q_backend=q_backend)
+    values = np.random.default_rng(0).normal(size=(6, 6, 4))
+    for (x, y, action), value in np.ndenumerate(values):
+        agent.q_backend.set(x, y, action, value)
+    return agent
+
+def test_batch_matches_serial_updates_on_unique_pairs():
+    # States in the left half, next states in the right, so no update changes another's target
+    rng = np.random.default_rng(1)
+    cells = [(x, y) for x in range(6) for y in range(3)]
+    states = np.array([cells[i] for i in rng.permutation(len(cells))[:10]])
+    actions = rng.integers(0, 4, size=10)
+    next_states = np.column_stack([rng.integers(0, 6, size=10), rng.integers(3, 6, size=10)])
+    rewards = rng.normal(size=10)
+
+    for q_backend in (None, SparseQTable(6, dtype=np.float64)):
+        batched, serial = _agent(q_backend), _agent()
+        td_errors = batched.update_batch(states, actions, rewards, next_states, np.zeros(10, dtype=bool))
+        expected = [serial.update_q_table(s, a, r, n) for s, a, r, n in zip(states, actions, rewards, next_states)]
+        np.testing.assert_allclose(td_errors, expected)
+        np.testing.assert_allclose(batched.q_table, serial.q_table)
+
+def test_duplicate_pairs_take_the_mean_td_error():
+    agent = _agent()
+    before = agent.q_table[2, 2, 1]
+    states = [(2, 2), (2, 2), (2, 2)]
+    next_states = [(2, 3), (1, 2), (2, 3)]
+    rewards = [1.0, -4.0, 10.0]
+    dones = [False, False, True]
+    td_errors = agent.update_batch(states, [1, 1, 1], rewards, next_states, dones)
+
+    q = _agent().q_table
+    targets = [1.0 + 0.9 * q[2, 3].max(), -4.0 + 0.9 * q[1, 2].max(), 10.0]
+    np.testing.assert_allclose(td_errors, np.array(targets) - before)
+    # One step of the averaged error, not three steps or the last one only
+    np.testing.assert_allclose(agent.q_table[2, 2, 1], before + 0.5 * np.mean(td_errors))
+    untouched = np.ones(q.shape, dtype=bool)
+    untouched[2, 2, 1] = False
+    np.testing.assert_array_equal(agent.q_table[untouched], q[untouched])
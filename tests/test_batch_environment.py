@@ -0,0 +1,72 @@
+import numpy as np
+from batch_environment import BatchGridEnvironment
+from environment import goal_directed_masks, valid_action_masks
+
+RIGHT, DOWN = 1, 2
+
+def _load(batch, grids):
+    """Put hand-made layouts into every environment, as _reset_envs would"""
+    grids = np.array(grids, dtype=np.uint8)
+    batch.grids[:] = grids
+    batch.goal_pos[:] = [np.argwhere(grid == 4)[0] for grid in grids]
+    batch.valid_masks[:] = valid_action_masks(batch.grids)
+    batch.goal_masks[:] = goal_directed_masks(batch.valid_masks, batch.goal_pos)
+    batch.agent_pos[:] = 0
+    batch.steps[:] = 0
+    batch.scores[:] = 0
+
+def _layout(**cells):
+    grid = np.zeros((5, 5), dtype=np.uint8)
+    if 'goal' not in cells:
+        grid[4, 4] = 4
+    for value, positions in cells.items():
+        for x, y in positions:
+            grid[x, y] = {'reward': 2, 'penalty': 3, 'obstacle': 1, 'goal': 4}[value]
+    return grid
+
+def _batch(num_envs, **kwargs):
+    return BatchGridEnvironment(num_envs, grid_size=5, obstacle_count=2, reward_count=2, penalty_count=1, **kwargs)
+
+def test_rewards_are_consumed_per_environment():
+    batch = _batch(3, seed=0)
+    layout = _layout(reward=[(0, 1)], penalty=[(1, 0)])
+    _load(batch, [layout, layout, layout])
+
+    positions, rewards, dones, info = batch.step(np.array([RIGHT, DOWN, RIGHT]))
+    assert positions.tolist() == [[0, 1], [1, 0], [0, 1]]
+    assert rewards.tolist() == [batch.reward_value, batch.penalty_value, batch.reward_value]
+    assert not dones.any()
+    # Each environment only loses the reward it collected
+    assert batch.grids[0, 0, 1] == 0 and batch.grids[2, 0, 1] == 0
+    assert batch.grids[1, 0, 1] == 2
+    assert batch.grids[1, 1, 0] == 3  # Penalties stay
+
+    # Stepping off and back onto an eaten reward scores an empty step
+    batch.step(np.array([DOWN, RIGHT, DOWN]))
+    _, rewards, _, _ = batch.step(np.array([0, 3, 0]))
+    assert rewards[0] == batch.step_value
+
+def test_finished_environments_reset_inside_step():
+    batch = _batch(2, max_steps=3, seed=1)
+    _load(batch, [_layout(goal=[(0, 1)], reward=[(1, 0)]), _layout(reward=[(1, 0)])])
+    original = batch.grids.copy()
+
+    positions, rewards, dones, info = batch.step(np.array([RIGHT, DOWN]))
+    assert dones.tolist() == [True, False]
+    assert info['won'].tolist() == [True, False]
+    # The winner restarts on a new map; the learning next state is where it moved
+    assert info['final_positions'][0].tolist() == [0, 1]
+    assert info['final_scores'][0] == batch.goal_value
+    assert positions[0].tolist() == [0, 0]
+    assert batch.steps[0] == 0 and batch.scores[0] == 0
+    assert not np.array_equal(batch.grids[0], original[0])
+    assert batch.grids[(0,) + tuple(batch.goal_pos[0])] == 4
+    # The other environment is untouched by the reset
+    assert positions[1].tolist() == [1, 0] and batch.steps[1] == 1
+
+    batch.step(np.array([RIGHT, RIGHT]))
+    positions, _, dones, info = batch.step(np.array([DOWN, RIGHT]))
+    assert dones[1] and info['truncated'][1] and not info['won'][1]
+    assert info['final_steps'][1] == 3
+    assert info['final_positions'][1].tolist() == [1, 2]
+    assert positions[1].tolist() == [0, 0] and batch.steps[1] == 0
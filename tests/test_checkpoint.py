@@ -0,0 +1,98 @@
+import os
+import numpy as np
+from agent import QLearningAgent
+from checkpoint import (CHECKPOINT_MAGIC, HEADER_SIZE, _HEADER, CheckpointWriter, load_checkpoint, read_header,
+                        save_checkpoint)
+from qtable import DenseQTable, SparseQTable
+
+def _sparse_agent(grid_size=3000):
+    agent = QLearningAgent(grid_size, q_backend=SparseQTable(grid_size))
+    for i, (x, y) in enumerate([(0, 0), (5, 7), (2999, 1), (1234, 2345)]):
+        for action in range(4):
+            agent.q_backend.set(x, y, action, i + action / 10)
+    return agent
+
+def test_sparse_checkpoint_keeps_backend_and_size(tmp_path):
+    path = str(tmp_path / 'sparse.ckpt')
+    agent = _sparse_agent()
+    save_checkpoint(agent, path, episodes=7)
+    # Header plus four keys and rows, not a 3000 x 3000 table
+    assert os.path.getsize(path) < 1024
+    assert read_header(path)['sparse']
+
+    loaded, header = load_checkpoint(path)
+    assert isinstance(loaded.q_backend, SparseQTable)
+    assert header['episodes'] == 7
+    assert len(loaded.q_backend) == 4
+    for x, y in [(0, 0), (5, 7), (2999, 1), (1234, 2345), (10, 10)]:
+        np.testing.assert_array_equal(loaded.q_backend.row(x, y), agent.q_backend.row(x, y))
+
+    # Loading into an existing sparse agent replaces its contents but keeps it sparse
+    target = QLearningAgent(3000, q_backend=SparseQTable(3000))
+    target.q_backend.set(1, 1, 0, 5.0)
+    load_checkpoint(path, agent=target)
+    assert isinstance(target.q_backend, SparseQTable)
+    assert target.q_backend.get(1, 1, 0) == 0.0
+    assert target.q_backend.get(5, 7, 2) == agent.q_backend.get(5, 7, 2)
+
+def test_writer_snapshots_sparse_backend(tmp_path):
+    path = str(tmp_path / 'async.ckpt')
+    agent = _sparse_agent()
+    writer = CheckpointWriter(path)
+    writer.snapshot(agent, 3)
+    writer.close()
+    loaded, header = load_checkpoint(path)
+    assert header['episodes'] == 3
+    np.testing.assert_array_equal(loaded.q_backend.row(1234, 2345), agent.q_backend.row(1234, 2345))
+
+def test_dense_and_sparse_checkpoints_cross_load(tmp_path):
+    dense = QLearningAgent(8)
+    dense.q_table[2, 3] = [1, 2, 3, 4]
+    dense_path = str(tmp_path / 'dense.ckpt')
+    save_checkpoint(dense, dense_path)
+
+    sparse = QLearningAgent(8, q_backend=SparseQTable(8))
+    load_checkpoint(dense_path, agent=sparse)
+    assert isinstance(sparse.q_backend, SparseQTable)
+    assert len(sparse.q_backend) == 1
+    np.testing.assert_array_equal(sparse.q_table, dense.q_table)
+
+    sparse_path = str(tmp_path / 'sparse.ckpt')
+    save_checkpoint(sparse, sparse_path)
+    target = QLearningAgent(8)
+    target.q_table[0, 0] = 9
+    load_checkpoint(sparse_path, agent=target)
+    assert isinstance(target.q_backend, DenseQTable)
+    np.testing.assert_array_equal(target.q_table, dense.q_table)
+
+def test_visit_counts_are_int32_whatever_the_q_dtype(tmp_path):
+    path = str(tmp_path / 'half.ckpt')
+    agent = QLearningAgent(4, q_backend=DenseQTable(4, dtype=np.float16))
+    agent.visited_counts[1, 2] = 5000  # Past float16's exact integers
+    save_checkpoint(agent, path)
+    loaded, header = load_checkpoint(path)
+    assert header['version'] == 3
+    assert loaded.visited_counts.dtype == np.int32
+    assert loaded.visited_counts[1, 2] == 5000
+
+def test_version_2_counts_load_in_the_q_dtype(tmp_path):
+    path = str(tmp_path / 'v2.ckpt')
+    q_table = np.arange(4 * 4 * 4, dtype=np.float32).reshape(4, 4, 4)
+    counts = np.full((4, 4), 3, dtype=np.float32)
+    header = _HEADER.pack(CHECKPOINT_MAGIC, 2, 4, 4, b'<f4', 0.1, 0.9, 0.1, 12, 0)
+    with open(path, 'wb') as f:
+        f.write(header.ljust(HEADER_SIZE, b'\0') + q_table.tobytes() + counts.tobytes())
+    loaded, header = load_checkpoint(path)
+    assert header['episodes'] == 12
+    np.testing.assert_array_equal(loaded.q_table, q_table)
+    np.testing.assert_array_equal(loaded.visited_counts, counts)
+
+def test_untouched_reads_keep_the_eviction_order():
+    table = SparseQTable(10, capacity=2)
+    table.set(0, 0, 0, 1.0)
+    table.set(0, 1, 0, 2.0)
+    np.testing.assert_array_equal(table.rows([0, 0, 5], [0, 1, 5], touch=False)[:, 0], [1.0, 2.0, 0.0])
+    assert table.row(0, 0, touch=False)[0] == 1.0
+    table.set(0, 2, 0, 3.0)  # Evicts (0, 0), still the least recently used
+    assert table.get(0, 0, 0) == 0.0
+    assert table.get(0, 1, 0) == 2.0
@@ -0,0 +1,19 @@
+import numpy as np
+import pytest
+from environment import GridEnvironment
+
+def test_layout_without_goal_is_rejected():
+    environment = GridEnvironment(10)
+    environment.reset(seed=1)
+    before = environment.snapshot()
+    with pytest.raises(ValueError, match="no goal"):
+        environment.reset(layout=np.zeros((10, 10), dtype=np.uint8))
+    # The running episode is left alone
+    np.testing.assert_array_equal(environment.snapshot(), before)
+
+def test_layout_goal_is_used():
+    layout = np.zeros((10, 10), dtype=np.uint8)
+    layout[3, 7] = 4
+    environment = GridEnvironment(10)
+    assert environment.reset(layout=layout) == (0, 0)
+    assert environment.goal_pos.tolist() == [3, 7]
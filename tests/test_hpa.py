@@ -0,0 +1,57 @@
+import numpy as np
+from environment import ACTION_DELTAS, GridEnvironment
+from hpa import HierarchicalPlanner
+from planner import DistanceFieldPlanner
+
+def _environment(seed, size=200):
+    environment = GridEnvironment(size)
+    environment.obstacle_count = size * size // 5
+    environment.reward_count = size * size // 20
+    environment.penalty_count = size * size // 40
+    environment.reset(seed=seed)
+    return environment
+
+def _path_cost(planner, path):
+    return sum(planner.cost[x, y] for x, y in path[1:])
+
+def _check_path(environment, path, start):
+    assert path[0] == list(start)
+    assert path[-1] == environment.goal_pos.tolist()
+    for (x, y), (nx, ny) in zip(path, path[1:]):
+        assert (nx - x, ny - y) in ACTION_DELTAS
+        assert environment.grid[nx, ny] != 1
+
+def test_paths_are_valid_and_near_optimal():
+    for seed in range(3):
+        environment = _environment(seed)
+        exact = DistanceFieldPlanner()
+        exact.update(environment.grid, environment.goal_pos)
+        planner = HierarchicalPlanner()
+        rng = np.random.default_rng(seed)
+        open_cells = np.argwhere(np.isfinite(exact.distance) & (environment.grid != 1))
+        for x, y in open_cells[rng.choice(len(open_cells), 10)].tolist():
+            path = planner.get_path((x, y), environment.goal_pos, environment.grid)
+            _check_path(environment, path, (x, y))
+            cost = _path_cost(exact, path)
+            assert cost == planner.distance((x, y), environment.goal_pos, environment.grid)
+            assert exact.distance[x, y] <= cost <= 1.3 * exact.distance[x, y]
+
+def test_background_build_then_reported_changes():
+    environment = _environment(4)
+    planner = HierarchicalPlanner()
+    planner.watch(environment)
+    planner.prepare(environment.grid, environment.goal_pos)
+    # Eat rewards while it builds; they are applied by the next query
+    for x, y in np.argwhere(environment.grid == 2)[:20].tolist():
+        environment.set_cell(x, y, 0)
+    path = planner.get_path((0, 0), environment.goal_pos, environment.grid)
+    assert planner.ready()
+    _check_path(environment, path, (0, 0))
+    np.testing.assert_array_equal(planner.grid, environment.grid)
+
+    fresh = HierarchicalPlanner()
+    assert (planner.distance((0, 0), environment.goal_pos, environment.grid)
+            == fresh.distance((0, 0), environment.goal_pos, environment.grid.copy()))
+    # With the graph built for this goal, a few reported cells are repaired at once
+    environment.set_cell(*np.argwhere(environment.grid == 2)[0].tolist(), 0)
+    assert planner.prepare(environment.grid, environment.goal_pos)
@@ -0,0 +1,63 @@
+from collections import deque
+import numpy as np
+from mapgen import CLEAR_RADIUS, MapLibrary, generate_layout, generate_layouts, reachable
+
+def _flood(grid, start=(0, 0)):
+    """Plain breadth-first search, the reference for reachable()"""
+    rows, cols = grid.shape
+    seen = np.zeros(grid.shape, dtype=bool)
+    if grid[start] == 1:
+        return seen
+    seen[start] = True
+    queue = deque([start])
+    while queue:
+        x, y = queue.popleft()
+        for nx, ny in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)):
+            if 0 <= nx < rows and 0 <= ny < cols and grid[nx, ny] != 1 and not seen[nx, ny]:
+                seen[nx, ny] = True
+                queue.append((nx, ny))
+    return seen
+
+def test_layouts_are_deterministic_per_seed():
+    first = generate_layouts(20, 12, 30, 6, 4, min_goal_distance=10, rng=np.random.default_rng(7))
+    again = generate_layouts(20, 12, 30, 6, 4, min_goal_distance=10, rng=np.random.default_rng(7))
+    other = generate_layouts(20, 12, 30, 6, 4, min_goal_distance=10, rng=np.random.default_rng(8))
+    np.testing.assert_array_equal(first[0], again[0])
+    np.testing.assert_array_equal(first[1], again[1])
+    assert not np.array_equal(first[0], other[0])
+
+    # Large grids take the one-at-a-time path
+    big = generate_layout(260, 5000, 100, 100, seed=3)
+    np.testing.assert_array_equal(big[0], generate_layout(260, 5000, 100, 100, seed=3)[0])
+
+def test_library_maps_follow_the_seed(tmp_path):
+    library = MapLibrary.create(str(tmp_path / 'a.maps'), 10, 10, seed=5, chunk_size=4)
+    again = MapLibrary.create(str(tmp_path / 'b.maps'), 10, 10, seed=5, chunk_size=4)
+    for i in range(len(library)):
+        np.testing.assert_array_equal(library[i], again[i])
+    # Each chunk regenerates on its own from (seed, chunk)
+    grids, goals = generate_layouts(4, 10, rng=np.random.default_rng([5, 1]))
+    np.testing.assert_array_equal(library.layouts(np.arange(4, 8))[0], grids)
+    np.testing.assert_array_equal(library.layouts(np.arange(4, 8))[1], goals)
+
+def test_generated_layouts_are_solvable():
+    rng = np.random.default_rng(0)
+    grids, goals = generate_layouts(200, 10, obstacle_count=35, reward_count=5, penalty_count=5,
+                                    min_goal_distance=8, rng=rng)
+    for grid, goal in zip(grids, goals):
+        assert _flood(grid)[tuple(goal)]
+        assert grid[tuple(goal)] == 4
+        assert [(grid == value).sum() for value in (1, 2, 3, 4)] == [35, 5, 5, 1]
+        assert (grid[np.add.outer(np.arange(10), np.arange(10)) < CLEAR_RADIUS] == 0).all()
+
+def test_reachable_matches_breadth_first_search():
+    rng = np.random.default_rng(1)
+    small = (rng.random((30, 16, 16)) < 0.4).astype(np.uint8)
+    np.testing.assert_array_equal(reachable(small), np.stack([_flood(grid) for grid in small]))
+    # Above LARGE_GRID_CELLS the frontier flood fill is used
+    large = (rng.random((260, 260)) < 0.35).astype(np.uint8)
+    large[0, 0] = 0
+    np.testing.assert_array_equal(reachable(large[None])[0], _flood(large))
+    blocked = small[0].copy()
+    blocked[0, 0] = 1
+    assert not reachable(blocked[None]).any()
@@ -0,0 +1,30 @@
+import numpy as np
+from agent import QLearningAgent
+from environment import GridEnvironment
+from metrics import MetricsWriter, read_chunks
+from replay import make_replay
+from trainer import run_episode
+
+def _episodes(tmp_path, replay_mode):
+    environment = GridEnvironment(10)
+    agent = QLearningAgent(10)
+    agent.rng = np.random.default_rng(0)
+    metrics = MetricsWriter(str(tmp_path / replay_mode))
+    replay = make_replay(replay_mode, 10)
+    for _ in range(20):
+        run_episode(agent, environment, seed=4, replay=replay, metrics=metrics)
+    metrics.close()
+    return next(read_chunks(str(tmp_path / replay_mode)))
+
+def test_trainer_episodes_have_time_to_goal(tmp_path):
+    episodes = _episodes(tmp_path, 'off')
+    assert episodes['won'].any()
+    won = episodes['time_to_goal'][episodes['won']]
+    assert np.isfinite(won).all() and (won > 0).all()
+    assert np.isnan(episodes['time_to_goal'][~episodes['won']]).all()
+
+def test_q_delta_norm_counts_replay_updates(tmp_path):
+    online = _episodes(tmp_path, 'off')['q_delta_norm']
+    replayed = _episodes(tmp_path, 'dyna')['q_delta_norm']
+    # Dyna adds batched updates after every move on top of the online one
+    assert replayed[0] > online[0]
@@ -0,0 +1,44 @@
+import numpy as np
+from environment import ACTION_DELTAS, GridEnvironment
+from planner import DistanceFieldPlanner
+
+def _fresh(environment):
+    planner = DistanceFieldPlanner()
+    planner.update(environment.grid.copy(), environment.goal_pos)
+    return planner
+
+def test_watched_repairs_match_a_full_rebuild():
+    environment = GridEnvironment(24)
+    environment.obstacle_count = 60
+    environment.reward_count = 40
+    environment.reset(seed=5)
+    planner = DistanceFieldPlanner()
+    planner.watch(environment)
+    planner.update(environment.grid, environment.goal_pos)
+
+    rng = np.random.default_rng(1)
+    goal = tuple(environment.goal_pos.tolist())
+    for _ in range(150):
+        x, y = rng.integers(0, 24, size=2).tolist()
+        if (x, y) != goal:
+            environment.set_cell(x, y, rng.choice([0, 1, 2, 3]))
+        planner.update(environment.grid, environment.goal_pos)
+        np.testing.assert_array_equal(planner.distance, _fresh(environment).distance)
+        np.testing.assert_array_equal(planner.masks, environment.action_masks)
+
+def test_eaten_rewards_reach_the_planner():
+    environment = GridEnvironment(10)
+    environment.reset(seed=2)
+    planner = DistanceFieldPlanner()
+    planner.watch(environment)
+    path = planner.get_path(environment.position(), environment.goal_pos, environment.grid)
+    assert any(environment.grid[x, y] == 2 for x, y in path)
+    for x, y in path[1:]:
+        px, py = environment.position()
+        environment.step(ACTION_DELTAS.index((x - px, y - py)))
+        planner.update(environment.grid, environment.goal_pos)
+        np.testing.assert_array_equal(planner.distance, _fresh(environment).distance)
+    # Nothing left to report, and a reset makes the next update compare the whole grid
+    assert planner.changes.take(environment.grid) == []
+    environment.reset(seed=3)
+    assert planner.changes.take(environment.grid) is None
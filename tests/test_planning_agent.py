@@ -0,0 +1,48 @@
+import numpy as np
+from environment import GridEnvironment
+from planning_agent import ValueIterationAgent
+
+def _map(seed, grid_size=12):
+    environment = GridEnvironment(grid_size)
+    environment.obstacle_count = 20
+    environment.reset(seed)
+    return environment.grid.copy(), tuple(int(v) for v in environment.goal_pos)
+
+def _solved(grid, goal):
+    agent = ValueIterationAgent(len(grid))
+    agent.plan(grid, goal)
+    return agent
+
+def test_obstacle_changes_match_full_solve():
+    grid, goal = _map(3)
+    agent = _solved(grid, goal)
+
+    # Remove every obstacle, one plan() at a time, then put them back
+    obstacles = [tuple(cell) for cell in np.argwhere(grid == 1)]
+    assert obstacles
+    for step in (0, 1):
+        for x, y in obstacles:
+            grid[x, y] = step
+            agent.plan(grid, goal)
+            expected = _solved(grid, goal)
+            np.testing.assert_allclose(agent.values, expected.values, atol=1e-4)
+            np.testing.assert_allclose(agent.q_table, expected.q_table, atol=1e-4)
+
+def test_reward_changes_match_full_solve():
+    grid, goal = _map(5)
+    agent = _solved(grid, goal)
+    for x, y in np.argwhere(grid == 2):
+        grid[x, y] = 0
+        agent.plan(grid, goal)
+        np.testing.assert_allclose(agent.values, _solved(grid, goal).values, atol=1e-4)
+
+def test_optimized_path_keeps_the_planned_goal():
+    grid, goal = _map(7)
+    agent = _solved(grid, goal)
+    start, other_goal = (tuple(int(v) for v in cell) for cell in np.argwhere(grid == 0)[[0, -1]])
+    agent.get_optimized_path(start, other_goal, grid)
+    assert agent.goal == goal
+
+    # Planning for the other goal afterwards must not reuse the first goal's values
+    agent.plan(grid, other_goal)
+    np.testing.assert_allclose(agent.values, _solved(grid, other_goal).values, atol=1e-4)
@@ -0,0 +1,21 @@
+import itertools
+import profiler as profiler_module
+from profiler import PhaseProfiler
+
+def test_nested_phases_report_self_time(monkeypatch):
+    clock = itertools.count()
+    monkeypatch.setattr(profiler_module.time, 'perf_counter', lambda: float(next(clock)))
+    profiler = PhaseProfiler(enabled=True)
+    untraced = profiler.untraced()
+    with profiler.phase('turbo'):          # Enters at 0
+        for _ in range(3):
+            with untraced.phase('step'):  # One tick each
+                pass
+    profiler.end_frame()                   # turbo spans 0..7
+
+    turbo, step = (profiler.phase_names.index(name) for name in ('turbo', 'step'))
+    assert profiler.frame_phase_times[0, step] == 3
+    assert profiler.frame_phase_times[0, turbo] == 4
+    # Only the outer phase is traced, with its full duration
+    assert profiler.spans == 1
+    assert profiler.trace_duration[0] == 7
@@ -0,0 +1,53 @@
+import numpy as np
+from agent import QLearningAgent
+from environment import GridEnvironment
+from recording import EpisodeLog, EpisodeRecorder, ReplayPlayer, read_episodes, verify
+from trainer import run_episode
+
+def _record(path, keyframe_interval=8):
+    """Two seeded episodes and one stored as a layout"""
+    environment = GridEnvironment(10, max_steps=120)
+    agent = QLearningAgent(10, epsilon=0.3)
+    agent.rng = np.random.default_rng(0)
+    recorder = EpisodeRecorder(path, keyframe_interval)
+    run_episode(agent, environment, seed=11, recorder=recorder)
+    run_episode(agent, environment, seed=12, recorder=recorder)
+    run_episode(agent, environment, layout=environment.grid.copy(), recorder=recorder)
+    recorder.close()
+    return read_episodes(path)
+
+def test_round_trip_replays_exactly(tmp_path):
+    logs = _record(str(tmp_path / 'episodes.rec'))
+    assert len(logs) == 3
+    assert [log.seed for log in logs] == [11, 12, None]
+    assert logs[2].layout is not None
+
+    for log in logs:
+        assert log.steps > 8
+        assert verify(log) == []
+        copy, end = EpisodeLog.from_buffer(log.to_bytes())
+        assert end == len(log.to_bytes())
+        np.testing.assert_array_equal(copy.actions, log.actions)
+        np.testing.assert_array_equal(copy.keyframes, log.keyframes)
+        np.testing.assert_array_equal(copy.consumed, log.consumed)
+        assert (copy.config, copy.scoring, copy.final_score, copy.won) == \
+            (log.config, log.scoring, log.final_score, log.won)
+
+def test_verify_reports_a_changed_action(tmp_path):
+    log = _record(str(tmp_path / 'episodes.rec'))[0]
+    actions = log.actions.copy()
+    actions[0] = (actions[0] + 2) % 4  # The opposite move
+    log.actions = actions
+    assert verify(log)
+
+def test_seek_matches_playing_from_the_start(tmp_path):
+    log = _record(str(tmp_path / 'episodes.rec'))[0]
+    player = ReplayPlayer(log)
+    for step in [log.steps, 0, 9, 8, log.steps // 2, 1, log.steps - 1]:
+        environment = log.make_environment()
+        score = 0.0
+        for action in log.actions[:step].tolist():
+            score += environment.step(action)[1]
+        seeked = player.seek(step)
+        np.testing.assert_array_equal(seeked.snapshot(), environment.snapshot())
+        assert player.score == score
@@ -0,0 +1,30 @@
+import numpy as np
+from agent import QLearningAgent
+from replay import ExperienceReplay, TransitionModel
+
+def test_consumed_reward_is_not_replayed():
+    model = TransitionModel(5)
+    # Two ways into the reward at (2, 2) and one unrelated move
+    model.add((1, 2), 2, 15.0, (2, 2), False)  # Down
+    model.add((2, 1), 1, 15.0, (2, 2), False)  # Right
+    model.add((0, 0), 1, -0.5, (0, 1), False)
+    assert len(model) == 3
+
+    replay = ExperienceReplay(model, updates=1, batch_size=16)
+    agent = QLearningAgent(5)
+    # Eating the reward from (2, 3) leaves (2, 2) empty
+    replay.step(agent, (2, 3), 3, 15.0, (2, 2), False, consumed=True)
+
+    assert len(model) == 1
+    _, states, actions, rewards, next_states, _ = model.sample(64, np.random.default_rng(0))
+    assert (rewards < 15).all()
+    assert not (next_states == (2, 2)).all(axis=1).any()
+
+def test_moves_are_modelled_again_after_forgetting():
+    model = TransitionModel(5)
+    model.add((1, 2), 2, 15.0, (2, 2), False)
+    model.forget_into((2, 2))
+    assert model.sample(4, np.random.default_rng(0)) is None
+    model.add((1, 2), 2, -0.5, (2, 2), False)
+    _, _, _, rewards, _, _ = model.sample(4, np.random.default_rng(0))
+    assert (rewards == -0.5).all()
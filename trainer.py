@@ -0,0 +1,184 @@
+import argparse
+import os
+import time
+import numpy as np
+from environment import GridEnvironment
+from batch_environment import BatchGridEnvironment
+from agent import QLearningAgent
+from planning_agent import ValueIterationAgent
+from qtable import Q_TABLE_KINDS, make_q_table
+from checkpoint import CheckpointWriter, load_checkpoint
+from recording import EpisodeRecorder
+from replay import REPLAY_MODES, make_replay
+from metrics import MetricsWriter, summarize
+
+def run_episode(agent, environment, seed=None, learn=True, recorder=None, replay=None, layout=None,
+                metrics=None):
+    """Play one episode headlessly and return (score, steps, won)
+
+    An ExperienceReplay, if given, adds its batched updates after every
+    learning step. A layout, if given, is played instead of a generated map.
+    A MetricsWriter, if given, gets every step and the finished episode.
+    """
+    state = environment.reset(seed, layout)
+    if replay is not None and seed is None and layout is None:
+        replay.new_map()
+    if recorder is not None:
+        recorder.begin(environment, seed)
+    score = 0
+    won = False
+    start = time.perf_counter()
+
+    while True:
+        # Same action selection as the interactive game
+        valid_actions = agent.get_goal_directed_actions(state, environment.goal_pos, environment.grid,
+                                                        environment.goal_masks)
+        if not valid_actions:
+            break
+
+        action = agent.get_action(state, valid_actions)
+        new_state, reward, done, info = environment.step(action)
+        td_error = None
+        replay_squares = 0.0
+        if learn:
+            td_error = agent.update_q_table(state, action, reward, new_state)
+            if replay is not None:
+                replay_squares = replay.step(agent, state, action, reward, new_state, info['won'],
+                                             info['cell'] == 2 and not info['blocked'])
+        if recorder is not None:
+            recorder.record(action, reward, info['won'])
+        if metrics is not None:
+            metrics.record(action, reward, info, td_error,
+                           None if td_error is None else agent.learning_rate * td_error, replay_squares)
+        score += reward
+        state = new_state
+
+        if done:
+            won = info['won']
+            break
+
+    if recorder is not None:
+        recorder.end()
+    if metrics is not None:
+        metrics.end(score, won, time.perf_counter() - start)
+    return score, environment.steps, won
+
+def train(agent, environment, episodes, seed=None, checkpoint=None, checkpoint_every=1000,
+          recorder=None, replay=None, metrics=None):
+    """Train the agent for a number of episodes without any rendering
+
+    With a seed every episode replays the same layout, otherwise each
+    episode gets a fresh random map. A CheckpointWriter, if given, gets a
+    snapshot every `checkpoint_every` episodes. An EpisodeRecorder, if
+    given, logs every episode, an ExperienceReplay adds replay updates
+    to every step and a MetricsWriter streams step and episode metrics.
+    Returns per-episode score, steps and win arrays.
+    """
+    scores = np.zeros(episodes)
+    steps = np.zeros(episodes, dtype=np.int64)
+    won = np.zeros(episodes, dtype=bool)
+
+    for episode in range(episodes):
+        scores[episode], steps[episode], won[episode] = run_episode(
+            agent, environment, seed, recorder=recorder, replay=replay, metrics=metrics)
+        if checkpoint is not None and (episode + 1) % checkpoint_every == 0:
+            checkpoint.snapshot(agent, episode + 1)
+
+    return {'scores': scores, 'steps': steps, 'won': won}
+
+def train_batch(agent, batch_env, steps):
+    """Train on a BatchGridEnvironment for a number of batched steps
+
+    Every step moves all environments and applies one batched Q-update.
+    Returns score, steps and win arrays for the episodes that finished.
+    """
+    states = batch_env.agent_pos.copy()
+    scores, episode_steps, won = [], [], []
+
+    for _ in range(steps):
+        actions = agent.act_batch(states, batch_env.goal_directed_masks())
+        next_states, rewards, dones, info = batch_env.step(actions)
+
+        # Truncated episodes still bootstrap; only reaching the goal is terminal
+        agent.update_batch(states, actions, rewards, info['final_positions'], info['won'])
+
+        if dones.any():
+            scores.append(info['final_scores'][dones])
+            episode_steps.append(info['final_steps'][dones])
+            won.append(info['won'][dones])
+        states = next_states
+
+    if not scores:
+        return {'scores': np.zeros(0), 'steps': np.zeros(0, dtype=np.int64), 'won': np.zeros(0, dtype=bool)}
+    return {'scores': np.concatenate(scores), 'steps': np.concatenate(episode_steps),
+            'won': np.concatenate(won)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless Q-learning trainer")
+    parser.add_argument('--episodes', type=int, default=1000)
+    parser.add_argument('--grid-size', type=int, default=10)
+    parser.add_argument('--max-steps', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=None, help="Fixed layout seed")
+    parser.add_argument('--batch', type=int, default=0,
+                        help="Step this many environments together (episodes then counts batched steps)")
+    parser.add_argument('--q-table', choices=Q_TABLE_KINDS, default='dense', help="Q-table backend")
+    parser.add_argument('--agent', choices=('q-learning', 'value-iteration'), default='q-learning',
+                        help="value-iteration solves each map from the known dynamics instead of learning")
+    parser.add_argument('--checkpoint', default=None,
+                        help="Warm start from this file if it exists and save the result to it")
+    parser.add_argument('--replay', choices=REPLAY_MODES, default='off',
+                        help="Batched replay (or Dyna-Q) updates after every step, single environment only")
+    parser.add_argument('--replay-updates', type=int, default=4)
+    parser.add_argument('--record', default=None,
+                        help="Append every episode to this recording (see recording.py)")
+    parser.add_argument('--metrics', default=None,
+                        help="Stream episode metrics into this directory (see metrics.py), single environment only")
+    parser.add_argument('--step-metrics', action='store_true', help="With --metrics, also keep per-step rows")
+    args = parser.parse_args()
+
+    if args.agent == 'value-iteration':
+        agent = ValueIterationAgent(args.grid_size, discount_factor=0.97,
+                                    q_backend=make_q_table(args.q_table, args.grid_size))
+    else:
+        agent = QLearningAgent(args.grid_size, learning_rate=0.4, discount_factor=0.97, epsilon=0.1,
+                               q_backend=make_q_table(args.q_table, args.grid_size))
+    writer = None
+    if args.checkpoint:
+        base_episodes = 0
+        if os.path.exists(args.checkpoint):
+            _, header = load_checkpoint(args.checkpoint, agent=agent)
+            base_episodes = header['episodes']
+            print(f"Warm start from {args.checkpoint} ({base_episodes} episodes)")
+        writer = CheckpointWriter(args.checkpoint, base_episodes)
+
+    start = time.perf_counter()
+    if args.batch:
+        batch_env = BatchGridEnvironment(args.batch, args.grid_size, max_steps=args.max_steps, seed=args.seed)
+        results = train_batch(agent, batch_env, args.episodes)
+    else:
+        environment = GridEnvironment(args.grid_size, max_steps=args.max_steps)
+        recorder = EpisodeRecorder(args.record) if args.record else None
+        replay = make_replay(args.replay, args.grid_size, args.replay_updates)
+        metrics = MetricsWriter(args.metrics, step_metrics=args.step_metrics) if args.metrics else None
+        results = train(agent, environment, args.episodes, args.seed, checkpoint=writer, recorder=recorder,
+                        replay=replay, metrics=metrics)
+        if recorder is not None:
+            recorder.close()
+        if metrics is not None:
+            metrics.close()
+    elapsed = time.perf_counter() - start
+    if writer is not None:
+        writer.snapshot(agent, len(results['scores']))
+        writer.close()
+
+    episodes = len(results['scores'])
+    total_steps = int(results['steps'].sum())
+    print(f"Episodes: {episodes} in {elapsed:.2f}s "
+          f"({episodes / elapsed:.0f} episodes/s, {total_steps / elapsed:.0f} steps/s)")
+    print(f"Win rate: {results['won'].mean():.1%}  Mean score: {results['scores'].mean():.1f}")
+    if args.metrics and not args.batch:
+        print(f"All runs in {args.metrics}:")
+        print(summarize(args.metrics).report())
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,47 @@
 import pygame
+import hashlib
 import os
 import time
+import numpy as np
 from pygame.locals import *
+from profiler import PhaseProfiler
+
+ASSET_DIR = 'assets'
+ASSET_FILES = {
+    'agent': 'agent.png',
+    'fire': 'fire.png',
+    'goal': 'goal.png',
+    'reward': 'reward.png',
+    'obstacle': 'obstacle.png'
+}
+ATLAS_CACHE_DIR = os.path.join(ASSET_DIR, 'cache')
+ATLAS_VERSION = 1  # Bump when the atlas layout changes
+
+ZOOM_LEVELS = (4, 6, 8, 12, 16, 24, 32, 45, 60)  # Cell sizes in pixels
+SPRITE_MIN_CELL = 16  # Smaller cells are drawn as flat colors from a surfarray image
+SIDE_MARGIN = 150     # Room left and right of the board (the minimap sits on the left)
+MINIMAP_MODES = ('off', 'cells', 'visits', 'q')
+
+# Flat colors by cell type, for zoomed-out boards and the minimap
+CELL_COLORS = np.array([
+    (255, 255, 255),  # Empty
+    (0, 0, 0),        # Obstacle
+    (0, 200, 0),      # Reward
+    (255, 0, 0),      # Fire
+    (0, 0, 255),      # Goal
+], dtype=np.uint8)
+VISITED_COLOR = (255, 255, 170)
+AGENT_COLOR = (255, 165, 0)
 
 class GameUI:
-    def __init__(self, width=900, height=700, grid_size=10, cell_size=60, agent_size=50):
+    def __init__(self, width=900, height=700, grid_size=10, cell_size=None, agent_size=None, profiler=None,
+                 startup=None):
+        """Open the game window; without a cell_size the grid is zoomed to fit it"""
         self.width = width
         self.height = height
         self.grid_size = grid_size
-        self.cell_size = cell_size
-        self.agent_size = agent_size
-        self.margin_x = (width - grid_size * cell_size) // 2
         self.margin_y = 100
+        self.board_limit = (width - 2 * SIDE_MARGIN, height - self.margin_y)
         
         # Color definitions
         self.WHITE = (255, 255, 255)
@@ -20,44 +50,111 @@ class GameUI:
         self.DARK_BLUE = (0, 0, 139)
         self.LIGHT_BLUE = (173, 216, 230)
         
-        pygame.init()
+        # Only the display and fonts are used; pygame.init() would also start audio
+        pygame.display.init()
+        pygame.font.init()
         self.screen = pygame.display.set_mode((width, height))
         pygame.display.set_caption("AI Grid Adventure")
+        if startup is not None:
+            startup.mark('display')
         self.font = pygame.font.SysFont('Arial', 24)
         self.title_font = pygame.font.SysFont('Arial', 36, bold=True)
+        self.hud_font = pygame.font.SysFont('Courier', 14)
+        if startup is not None:
+            startup.mark('fonts')
         
-        self.images = self._load_images()
+        # Render caches: static layers, text surfaces and what each cell shows on screen
+        self.background = None
+        self._text_cache = {}
+        self._sprite_cache = {}
+        self._cell_codes = None
+        self._flat_surface = None
+        self._stats_rects = {}
+        self._agent_rect = None
+        self._game_over_key = None
+
+        # Camera: top-left visible cell, optionally following the agent
+        self.camera = [0, 0]
+        self.follow = True
+        self.minimap_mode = 'off'
+        self._minimap_surface = None
+        self._minimap_updated = 0
+        self._minimap_camera = None
+        if cell_size is None:
+            self.set_grid_size(grid_size)
+        else:
+            self._set_cell_size(cell_size, agent_size)
+        if startup is not None:
+            startup.mark('sprites')
+
+        # Performance overlay, drawn from the profiler's ring buffers
+        self.profiler = profiler if profiler is not None else PhaseProfiler()
+        self.show_hud = False
+        self._hud_surface = None
+        self._hud_rect = None
+        self._hud_updated = 0
 
     def _load_images(self):
-        """Load game images from assets folder"""
-        images = {}
-        asset_files = {
-            'agent': 'agent.png',
-            'fire': 'fire.png',
-            'goal': 'goal.png',
-            'reward': 'reward.png',
-            'obstacle': 'obstacle.png'
-        }
-        
-        # Create assets folder if it doesn't exist
-        if not os.path.exists('assets'):
-            os.makedirs('assets')
+        """Return the sprites as views into one pre-scaled atlas
+
+        The atlas is cached as raw RGBA under assets/cache, keyed by the
+        sprite sizes and each asset's mtime and size, so later launches
+        skip decoding and scaling the PNGs.
+        """
+        sizes = {key: self.agent_size if key == 'agent' else self.sprite_size for key in ASSET_FILES}
+        # Sprites sit side by side in a single row
+        rects = {}
+        x = 0
+        for key, size in sizes.items():
+            rects[key] = pygame.Rect(x, 0, size, size)
+            x += size
+        atlas_size = (x, max(sizes.values()))
+
+        stamps = []
+        for filename in ASSET_FILES.values():
+            try:
+                stat = os.stat(os.path.join(ASSET_DIR, filename))
+                stamps.append((filename, stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                stamps.append((filename, None, None))
+        key = repr((ATLAS_VERSION, self.cell_size, self.agent_size, stamps))
+        cache_path = os.path.join(ATLAS_CACHE_DIR, f"atlas-{hashlib.sha1(key.encode()).hexdigest()[:16]}.rgba")
+
+        try:
+            with open(cache_path, 'rb') as f:
+                atlas = pygame.image.frombytes(f.read(), atlas_size, 'RGBA')
+        except (OSError, ValueError):
+            atlas = self._build_atlas(atlas_size, rects)
+            try:
+                os.makedirs(ATLAS_CACHE_DIR, exist_ok=True)
+                tmp_path = cache_path + '.tmp'
+                with open(tmp_path, 'wb') as f:
+                    f.write(pygame.image.tobytes(atlas, 'RGBA'))
+                os.replace(tmp_path, cache_path)
+            except OSError as e:
+                print(f"Could not cache sprite atlas: {e}")
+
+        atlas = atlas.convert_alpha()
+        return {key: atlas.subsurface(rect) for key, rect in rects.items()}
+
+    def _build_atlas(self, atlas_size, rects):
+        """Load and scale every asset into a new atlas surface"""
+        if not os.path.exists(ASSET_DIR):
+            os.makedirs(ASSET_DIR)
             print("Created assets folder - please add your image files there")
-        
-        for key, filename in asset_files.items():
+
+        atlas = pygame.Surface(atlas_size, pygame.SRCALPHA)
+        for key, filename in ASSET_FILES.items():
+            rect = rects[key]
             try:
-                path = os.path.join('assets', filename)
-                if key == 'agent':
-                    img = pygame.image.load(path).convert_alpha()
-                    images[key] = pygame.transform.scale(img, (self.agent_size, self.agent_size))
-                else:
-                    img = pygame.image.load(path).convert_alpha()
-                    images[key] = pygame.transform.scale(img, (self.cell_size-10, self.cell_size-10))
+                img = pygame.image.load(os.path.join(ASSET_DIR, filename)).convert_alpha()
+                img = pygame.transform.scale(img, rect.size)
             except:
                 print(f"Could not load {filename}, using placeholder")
-                images[key] = self._create_placeholder(key)
-        
-        return images
+                img = self._create_placeholder(key)
+            # Copy pixels as-is; a normal blit would blend them into the transparent atlas
+            atlas.blit(img, rect, special_flags=pygame.BLEND_RGBA_MAX)
+        return atlas
 
     def _create_placeholder(self, image_type):
         """Create colored placeholders if images not found"""
@@ -69,95 +166,402 @@ class GameUI:
             'obstacle': (0, 0, 0)      # Black
         }
         
-        size = self.agent_size if image_type == 'agent' else self.cell_size-10
+        size = self.agent_size if image_type == 'agent' else self.sprite_size
         surf = pygame.Surface((size, size), pygame.SRCALPHA)
         surf.fill(colors[image_type])
         return surf
 
+    def set_grid_size(self, grid_size):
+        """Show a grid of another size, zoomed so as much of it fits as possible"""
+        self.grid_size = grid_size
+        fitting = [size for size in ZOOM_LEVELS
+                   if grid_size * size <= min(self.board_limit)]
+        self.camera = [0, 0]
+        self.minimap_mode = 'off' if fitting and fitting[-1] >= SPRITE_MIN_CELL else 'cells'
+        self._set_cell_size(fitting[-1] if fitting else ZOOM_LEVELS[0])
+
+    def _set_cell_size(self, cell_size, agent_size=None):
+        """Switch zoom level: recompute the visible window and load sprites for it"""
+        padding = min(10, cell_size // 6)
+        self.cell_size = cell_size
+        self.sprite_size = cell_size - padding
+        self.agent_size = self.sprite_size if agent_size is None else agent_size
+        self.sprite_mode = cell_size >= SPRITE_MIN_CELL
+
+        self.view_rows = min(self.grid_size, max(1, self.board_limit[1] // cell_size))
+        self.view_cols = min(self.grid_size, max(1, self.board_limit[0] // cell_size))
+        self.margin_x = (self.width - self.view_cols * cell_size) // 2
+        self.view_rect = pygame.Rect(self.margin_x, self.margin_y,
+                                     self.view_cols * cell_size, self.view_rows * cell_size)
+        size = min(self.margin_x - 20, 200)
+        self.minimap_rect = pygame.Rect(10, self.margin_y, size, size) if size >= 40 else None
+        self._move_camera(*self.camera)
+
+        if self.sprite_mode:
+            key = (cell_size, self.agent_size)
+            if key not in self._sprite_cache:
+                self._sprite_cache[key] = self._load_images()
+            self.images = self._sprite_cache[key]
+            self.cell_images = {
+                1: self.images['obstacle'],
+                2: self.images['reward'],
+                3: self.images['fire'],
+                4: self.images['goal'],
+            }
+        self.background = None
+        self._cell_codes = None
+
+    def _move_camera(self, row, col):
+        """Put the camera's top-left corner at (row, col), clamped to the grid"""
+        row = max(0, min(row, self.grid_size - self.view_rows))
+        col = max(0, min(col, self.grid_size - self.view_cols))
+        moved = [row, col] != self.camera
+        self.camera = [row, col]
+        if moved:
+            self._cell_codes = None  # Every visible cell changed
+        return moved
+
+    def _follow_agent(self, agent_pos):
+        """Recenter when the agent gets within a quarter view of the edge"""
+        x, y = int(agent_pos[0]), int(agent_pos[1])
+        row, col = self.camera
+        margin_rows, margin_cols = self.view_rows // 4, self.view_cols // 4
+        if not row + margin_rows <= x < row + self.view_rows - margin_rows:
+            row = x - self.view_rows // 2
+        if not col + margin_cols <= y < col + self.view_cols - margin_cols:
+            col = y - self.view_cols // 2
+        self._move_camera(row, col)
+
+    def zoom(self, steps):
+        """Zoom in (steps > 0) or out by whole levels, keeping the view centered"""
+        current = min(range(len(ZOOM_LEVELS)), key=lambda i: abs(ZOOM_LEVELS[i] - self.cell_size))
+        level = ZOOM_LEVELS[max(0, min(len(ZOOM_LEVELS) - 1, current + steps))]
+        if level == self.cell_size:
+            return
+        center = (self.camera[0] + self.view_rows // 2, self.camera[1] + self.view_cols // 2)
+        self._set_cell_size(level)
+        self._move_camera(center[0] - self.view_rows // 2, center[1] - self.view_cols // 2)
+
+    def handle_event(self, event):
+        """Camera and minimap controls; returns True if the event was used
+
+        Arrows scroll, [ and ] or the mouse wheel zoom, F toggles following
+        the agent, M cycles the minimap (cells, visit and Q-value heatmaps)
+        and clicking the minimap jumps there.
+        """
+        if event.type == pygame.MOUSEWHEEL:
+            self.zoom(event.y)
+            return True
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+            if self.minimap_mode == 'off' or self.minimap_rect is None:
+                return False
+            if not self.minimap_rect.collidepoint(event.pos):
+                return False
+            scale = self.grid_size / self.minimap_rect.width
+            row = int((event.pos[1] - self.minimap_rect.y) * scale)
+            col = int((event.pos[0] - self.minimap_rect.x) * scale)
+            self.follow = False
+            self._move_camera(row - self.view_rows // 2, col - self.view_cols // 2)
+            return True
+        if event.type != pygame.KEYDOWN:
+            return False
+
+        scroll_rows, scroll_cols = max(1, self.view_rows // 4), max(1, self.view_cols // 4)
+        scrolls = {
+            pygame.K_UP: (-scroll_rows, 0),
+            pygame.K_DOWN: (scroll_rows, 0),
+            pygame.K_LEFT: (0, -scroll_cols),
+            pygame.K_RIGHT: (0, scroll_cols),
+        }
+        if event.key in scrolls:
+            self.follow = False
+            drow, dcol = scrolls[event.key]
+            self._move_camera(self.camera[0] + drow, self.camera[1] + dcol)
+        elif event.key == pygame.K_LEFTBRACKET:
+            self.zoom(-1)
+        elif event.key == pygame.K_RIGHTBRACKET:
+            self.zoom(1)
+        elif event.key == pygame.K_f:
+            self.follow = not self.follow
+        elif event.key == pygame.K_m:
+            self.minimap_mode = MINIMAP_MODES[(MINIMAP_MODES.index(self.minimap_mode) + 1) % len(MINIMAP_MODES)]
+            self._minimap_surface = None
+            self.background = None  # Clears the old minimap
+        else:
+            return False
+        return True
+
     def draw(self, environment, game_state, agent_pos, agent, animation_progress=0, move_direction=None):
-        """Main drawing method that renders the entire game"""
-        self.screen.fill(self.LIGHT_BLUE)
-        self._draw_title()
+        """Main drawing method, repaints only what changed since the last frame"""
+        if environment.grid_size != self.grid_size:
+            self.set_grid_size(environment.grid_size)
+        if self.follow:
+            self._follow_agent(agent_pos)
+        if self.background is None:
+            self._build_background()
+
+        if game_state.game_over:
+            # The overlay is translucent, so compose it once over a full frame
+            game_over_key = (game_state.won, game_state.score)
+            if game_over_key != self._game_over_key:
+                self._redraw_all(environment, game_state, agent_pos, agent, animation_progress, move_direction)
+                self._draw_game_over(game_state.won, game_state.score)
+                pygame.display.flip()
+                self._game_over_key = game_over_key
+            return
+
+        if self._game_over_key is not None or self._cell_codes is None:
+            self._redraw_all(environment, game_state, agent_pos, agent, animation_progress, move_direction)
+            pygame.display.flip()
+            return
+
+        profiler = self.profiler
+        dirty = self._clear_hud()
+        with profiler.phase('draw_stats'):
+            dirty += self._draw_stats(game_state)
+        with profiler.phase('draw_grid'):
+            dirty += self._draw_board(environment)
+        if self.minimap_mode != 'off' and self.minimap_rect is not None:
+            with profiler.phase('draw_minimap'):
+                dirty += self._draw_minimap(environment, agent)
+        with profiler.phase('draw_agent'):
+            dirty += self._draw_agent(agent_pos, animation_progress, move_direction)
+        self._hud_rect = None
+        if self.show_hud:
+            with profiler.phase('draw_hud'):
+                dirty += self._draw_hud()
+        with profiler.phase('display_update'):
+            if dirty:
+                pygame.display.update(dirty)
+
+    def invalidate(self):
+        """Force a full repaint on the next draw (e.g. after the window was exposed)"""
+        self._cell_codes = None
+        self._minimap_surface = None
+
+    def _redraw_all(self, environment, game_state, agent_pos, agent, animation_progress, move_direction):
+        """Repaint the whole screen from the cached background"""
+        self.screen.blit(self.background, (0, 0))
+        self._cell_codes = None
+        self._stats_rects = {}
+        self._agent_rect = None
+        self._hud_rect = None
+        self._game_over_key = None
         self._draw_stats(game_state)
-        self._draw_grid(environment, agent)
+        self._draw_board(environment)
+        if self.minimap_mode != 'off' and self.minimap_rect is not None:
+            self._minimap_camera = None
+            self._draw_minimap(environment, agent)
         self._draw_agent(agent_pos, animation_progress, move_direction)
-        
-        if game_state.game_over:
-            self._draw_game_over(game_state.won, game_state.score)
-        
-        self._draw_instructions()
-        pygame.display.flip()
+        if self.show_hud and not game_state.game_over:
+            self._draw_hud()
+
+    def _build_background(self):
+        """Pre-render everything that never changes: backdrop, board, grid lines and text"""
+        self.background = pygame.Surface((self.width, self.height)).convert()
+        self.background.fill(self.LIGHT_BLUE)
+        self._draw_title(self.background)
+
+        grid_rect = self.view_rect.inflate(10, 10)
+        pygame.draw.rect(self.background, self.DARK_BLUE, grid_rect)
+        if self.sprite_mode:
+            # Cells look alike, so the visible window's backdrop works for any camera position
+            for x in range(self.view_rows):
+                for y in range(self.view_cols):
+                    rect = self._cell_rect(self.camera[0] + x, self.camera[1] + y)
+                    pygame.draw.rect(self.background, self.WHITE, rect)
+                    pygame.draw.rect(self.background, self.BLACK, rect, 1)
+        else:
+            self.background.fill(self.WHITE, self.view_rect)
+
+        self._draw_instructions(self.background)
+
+    def _render_text(self, font, text, color):
+        """Render text once per (font, text, color) and reuse the surface"""
+        key = (id(font), text, color)
+        surface = self._text_cache.get(key)
+        if surface is None:
+            if len(self._text_cache) > 256:
+                self._text_cache.clear()
+            surface = font.render(text, True, color)
+            self._text_cache[key] = surface
+        return surface
+
+    def _cell_rect(self, x, y):
+        return pygame.Rect(
+            self.margin_x + (y - self.camera[1]) * self.cell_size,
+            self.margin_y + (x - self.camera[0]) * self.cell_size,
+            self.cell_size,
+            self.cell_size
+        )
+
+    def _cells_under(self, rect):
+        """Visible cells overlapped by a screen rectangle, in window coordinates"""
+        x0 = max(0, (rect.top - self.margin_y) // self.cell_size)
+        x1 = min(self.view_rows - 1, (rect.bottom - 1 - self.margin_y) // self.cell_size)
+        y0 = max(0, (rect.left - self.margin_x) // self.cell_size)
+        y1 = min(self.view_cols - 1, (rect.right - 1 - self.margin_x) // self.cell_size)
+        return [(x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
 
-    def _draw_title(self):
+    def _draw_title(self, surface):
         """Draw the game title"""
-        title = self.title_font.render("AI Grid Adventure", True, self.DARK_BLUE)
-        self.screen.blit(title, (self.width//2 - title.get_width()//2, 20))
+        title = self._render_text(self.title_font, "AI Grid Adventure", self.DARK_BLUE)
+        surface.blit(title, (self.width//2 - title.get_width()//2, 20))
 
     def _draw_stats(self, game_state):
-        """Draw game statistics"""
-        elapsed = max(0, game_state.time_limit - (time.time() - game_state.start_time))
-        timer_text = self.font.render(f"Time: {int(elapsed)}s", True, self.BLACK)
-        score_text = self.font.render(f"Score: {game_state.score}", True, self.BLACK)
-        steps_text = self.font.render(f"Steps: {game_state.steps}", True, self.BLACK)
-        
-        self.screen.blit(timer_text, (50, 70))
-        self.screen.blit(score_text, (250, 70))
-        self.screen.blit(steps_text, (450, 70))
-
-    def _draw_grid(self, environment, agent):
-        """Draw the game grid with all elements"""
-        grid_rect = pygame.Rect(
-            self.margin_x - 5, 
-            self.margin_y - 5, 
-            self.grid_size * self.cell_size + 10, 
-            self.grid_size * self.cell_size + 10
+        """Draw game statistics that changed, returning the dirty rects"""
+        stats = (
+            ('time', f"Time: {int(game_state.time_left())}s", (50, 70)),
+            ('score', f"Score: {game_state.score}", (250, 70)),
+            ('steps', f"Steps: {game_state.steps}", (450, 70)),
         )
-        pygame.draw.rect(self.screen, self.DARK_BLUE, grid_rect)
-        
-        for x in range(self.grid_size):
-            for y in range(self.grid_size):
-                rect = pygame.Rect(
-                    self.margin_x + y * self.cell_size, 
-                    self.margin_y + x * self.cell_size, 
-                    self.cell_size, 
-                    self.cell_size
-                )
-                pygame.draw.rect(self.screen, self.WHITE, rect)
-                pygame.draw.rect(self.screen, self.BLACK, rect, 1)
-                
-                cell_value = environment.grid[x][y]
-                if cell_value == 1:  # Obstacle
-                    self.screen.blit(self.images['obstacle'], 
-                                   (rect.x + (self.cell_size - self.images['obstacle'].get_width())//2, 
-                                    rect.y + (self.cell_size - self.images['obstacle'].get_height())//2))
-                elif cell_value == 2:  # Reward
-                    self.screen.blit(self.images['reward'], 
-                                   (rect.x + (self.cell_size - self.images['reward'].get_width())//2, 
-                                    rect.y + (self.cell_size - self.images['reward'].get_height())//2))
-                elif cell_value == 3:  # Penalty
-                    self.screen.blit(self.images['fire'], 
-                                   (rect.x + (self.cell_size - self.images['fire'].get_width())//2, 
-                                    rect.y + (self.cell_size - self.images['fire'].get_height())//2))
-                elif cell_value == 4:  # Goal
-                    self.screen.blit(self.images['goal'], 
-                                   (rect.x + (self.cell_size - self.images['goal'].get_width())//2, 
-                                    rect.y + (self.cell_size - self.images['goal'].get_height())//2))
-                
-                if (x, y) in environment.visited:
-                    visited_rect = pygame.Rect(
-                        rect.x + 5, 
-                        rect.y + 5, 
-                        self.cell_size - 10, 
-                        self.cell_size - 10
-                    )
-                    pygame.draw.rect(self.screen, self.YELLOW, visited_rect, 2)
+
+        dirty = []
+        for key, text, pos in stats:
+            old_text, old_rect = self._stats_rects.get(key, (None, None))
+            if text == old_text:
+                continue
+            if old_rect is not None:
+                self.screen.blit(self.background, old_rect, old_rect)
+                dirty.append(old_rect)
+            rect = self.screen.blit(self._render_text(self.font, text, self.BLACK), pos)
+            self._stats_rects[key] = (text, rect)
+            dirty.append(rect)
+        return dirty
+
+    def _visible_window(self, environment):
+        """Cell types and visited flags of the cells inside the camera view"""
+        row, col = self.camera
+        rows, cols = slice(row, row + self.view_rows), slice(col, col + self.view_cols)
+        return np.asarray(environment.grid[rows, cols]), np.asarray(environment.visited[rows, cols])
+
+    def _draw_board(self, environment):
+        """Redraw the visible cells that changed, returning the dirty rects"""
+        if self.sprite_mode:
+            return self._draw_grid(environment)
+        return self._draw_flat(environment)
+
+    def _draw_grid(self, environment):
+        """Redraw cells whose contents or visited marker changed, returning the dirty rects"""
+        window, visited = self._visible_window(environment)
+        codes = window.astype(np.int16) * 2 + visited
+
+        if self._cell_codes is None:
+            changed = [tuple(cell) for cell in np.argwhere(np.ones_like(visited))]
+        else:
+            changed = {tuple(cell) for cell in np.argwhere(codes != self._cell_codes)}
+            # The agent sprite and HUD were drawn over these cells last frame
+            if self._agent_rect is not None:
+                changed.update(self._cells_under(self._agent_rect))
+            if self._hud_rect is not None:
+                changed.update(self._cells_under(self._hud_rect))
+        self._cell_codes = codes
+
+        row, col = self.camera
+        dirty = []
+        for x, y in changed:
+            dirty.append(self._draw_cell(row + x, col + y, window[x, y], visited[x, y]))
+        return dirty
+
+    def _draw_flat(self, environment):
+        """Zoomed out: one color per cell, scaled up from a surfarray image"""
+        window, visited = self._visible_window(environment)
+        codes = window.astype(np.int16) * 2 + visited
+
+        if self._cell_codes is None or not np.array_equal(codes, self._cell_codes):
+            colors = CELL_COLORS[window]
+            colors[visited & (window == 0)] = VISITED_COLOR
+            surface = pygame.surfarray.make_surface(colors.transpose(1, 0, 2))
+            self._flat_surface = pygame.transform.scale(surface, self.view_rect.size)
+            self._cell_codes = codes
+            self.screen.blit(self._flat_surface, self.view_rect)
+            return [self.view_rect]
+
+        # Unchanged cells: only restore what the agent and HUD covered
+        dirty = []
+        for rect in (self._agent_rect, self._hud_rect):
+            area = rect.clip(self.view_rect) if rect is not None else None
+            if area:
+                self.screen.blit(self._flat_surface, area, area.move(-self.view_rect.x, -self.view_rect.y))
+                dirty.append(area)
+        return dirty
+
+    def _minimap_image(self, environment, agent):
+        """Whole-grid (or strided) color image for the current minimap mode"""
+        step = max(1, -(-self.grid_size // self.minimap_rect.width))
+        grid = np.asarray(environment.grid[::step, ::step])
+        mode = self.minimap_mode if agent is not None else 'cells'
+
+        if mode == 'cells':
+            return CELL_COLORS[grid]
+        if mode == 'visits' and agent.visited_counts is not None:
+            values = np.log1p(np.asarray(agent.visited_counts[::step, ::step], dtype=np.float64))
+        elif mode == 'q':
+            xs, ys = np.meshgrid(np.arange(0, self.grid_size, step), np.arange(0, self.grid_size, step),
+                                 indexing='ij')
+            values = agent.q_backend.rows(xs.ravel(), ys.ravel(), touch=False).max(axis=1).reshape(xs.shape)
+        else:
+            values = np.zeros(grid.shape)
+        span = values.max() - values.min()
+        values = (values - values.min()) / span if span > 0 else np.zeros(values.shape)
+
+        # Black through red and yellow to white
+        heat = np.stack([np.clip(3 * values, 0, 1), np.clip(3 * values - 1, 0, 1),
+                         np.clip(3 * values - 2, 0, 1)], axis=-1)
+        colors = (heat * 255).astype(np.uint8)
+        colors[grid == 1] = (60, 60, 90)  # Obstacles stand out from cold cells
+        return colors
+
+    def _draw_minimap(self, environment, agent):
+        """Blit the cached minimap and the camera outline, returning the dirty rects"""
+        now = time.time()
+        rebuilt = False
+        if self._minimap_surface is None or now - self._minimap_updated > 0.5:
+            colors = self._minimap_image(environment, agent)
+            surface = pygame.surfarray.make_surface(np.ascontiguousarray(colors.transpose(1, 0, 2)))
+            self._minimap_surface = pygame.transform.scale(surface, self.minimap_rect.size)
+            self._minimap_updated = now
+            rebuilt = True
+        if not rebuilt and self._minimap_camera == self.camera:
+            return []
+
+        self.screen.blit(self._minimap_surface, self.minimap_rect)
+        scale = self.minimap_rect.width / self.grid_size
+        outline = pygame.Rect(self.minimap_rect.x + self.camera[1] * scale,
+                              self.minimap_rect.y + self.camera[0] * scale,
+                              max(2, self.view_cols * scale), max(2, self.view_rows * scale))
+        pygame.draw.rect(self.screen, self.YELLOW, outline.clip(self.minimap_rect), 1)
+        self._minimap_camera = list(self.camera)
+        return [self.minimap_rect]
+
+    def _draw_cell(self, x, y, cell_value, visited):
+        """Restore one cell from the background and draw its contents"""
+        rect = self._cell_rect(x, y)
+        self.screen.blit(self.background, rect, rect)
+
+        image = self.cell_images.get(cell_value)
+        if image is not None:
+            self.screen.blit(image,
+                             (rect.x + (self.cell_size - image.get_width())//2,
+                              rect.y + (self.cell_size - image.get_height())//2))
+
+        if visited:
+            padding = self.cell_size - self.sprite_size
+            visited_rect = pygame.Rect(
+                rect.x + padding // 2,
+                rect.y + padding // 2,
+                self.sprite_size,
+                self.sprite_size
+            )
+            pygame.draw.rect(self.screen, self.YELLOW, visited_rect, 2)
+        return rect
 
     def _draw_agent(self, agent_pos, progress, direction):
-        """Draw the agent with movement animation"""
+        """Draw the agent with movement animation, returning the dirty rects"""
         x, y = agent_pos
-        base_x = self.margin_x + y * self.cell_size + (self.cell_size - self.agent_size) // 2
-        base_y = self.margin_y + x * self.cell_size + (self.cell_size - self.agent_size) // 2
-        
+        base_x = self.margin_x + (y - self.camera[1]) * self.cell_size + (self.cell_size - self.agent_size) // 2
+        base_y = self.margin_y + (x - self.camera[0]) * self.cell_size + (self.cell_size - self.agent_size) // 2
+
         offset_x, offset_y = 0, 0
         if progress < 1 and direction is not None:
             move_dist = self.cell_size * progress
@@ -165,8 +569,49 @@ class GameUI:
             elif direction == 1: offset_x = move_dist  # Right
             elif direction == 2: offset_y = move_dist  # Down
             elif direction == 3: offset_x = -move_dist  # Left
-        
-        self.screen.blit(self.images['agent'], (base_x + offset_x, base_y + offset_y))
+
+        # Clip to the board so a partly visible agent never draws over the frame
+        self.screen.set_clip(self.view_rect)
+        position = (base_x + offset_x, base_y + offset_y)
+        if self.sprite_mode:
+            rect = self.screen.blit(self.images['agent'], position)
+        else:
+            rect = self.screen.fill(AGENT_COLOR, pygame.Rect(position, (self.agent_size, self.agent_size)))
+        self.screen.set_clip(None)
+        dirty = [rect] if self._agent_rect is None else [rect, self._agent_rect]
+        self._agent_rect = rect
+        return dirty
+
+    def _clear_hud(self):
+        """Restore what the HUD covered last frame, returning the dirty rects"""
+        if self._hud_rect is None:
+            return []
+        rect = self._hud_rect
+        self.screen.blit(self.background, rect, rect)
+        # Stats under the old HUD must be re-rendered; cells are handled by _draw_grid
+        for key, (text, stats_rect) in list(self._stats_rects.items()):
+            if stats_rect.colliderect(rect):
+                self._stats_rects[key] = (None, stats_rect)
+        return [rect]
+
+    def _draw_hud(self):
+        """Draw FPS and p50/p99 per phase, re-rendering the text at most 4 times a second"""
+        now = time.time()
+        if self._hud_surface is None or now - self._hud_updated > 0.25:
+            fps, phases = self.profiler.stats()
+            lines = [f"FPS {fps:6.1f}    p50    p99 ms"]
+            lines += [f"{name[:14]:<14} {p50:6.2f} {p99:6.2f}" for name, (p50, p99) in phases.items()]
+            line_height = self.hud_font.get_linesize()
+            width = max(self.hud_font.size(line)[0] for line in lines) + 12
+            self._hud_surface = pygame.Surface((width, line_height * len(lines) + 10), pygame.SRCALPHA)
+            self._hud_surface.fill((0, 0, 0, 170))
+            for i, line in enumerate(lines):
+                self._hud_surface.blit(self.hud_font.render(line, True, self.WHITE), (6, 5 + i * line_height))
+            self._hud_updated = now
+
+        position = (self.width - self._hud_surface.get_width() - 10, 10)
+        self._hud_rect = self.screen.blit(self._hud_surface, position)
+        return [self._hud_rect]
 
     def _draw_game_over(self, won, score):
         """Draw game over screen"""
@@ -187,7 +632,7 @@ class GameUI:
         self.screen.blit(text, (self.width//2 - text.get_width()//2, self.height//2 - 50))
         self.screen.blit(restart_text, (self.width//2 - restart_text.get_width()//2, self.height//2 + 20))
 
-    def _draw_instructions(self):
+    def _draw_instructions(self, surface):
         """Draw game instructions"""
         instructions = [
             "SPACE: Toggle AI Learning/Path Display",
@@ -197,5 +642,5 @@ class GameUI:
             "Reach the goal (treasure) within time limit"
         ]
         for i, instruction in enumerate(instructions):
-            text = self.font.render(instruction, True, self.DARK_BLUE)
-            self.screen.blit(text, (self.margin_x, self.margin_y + self.grid_size * self.cell_size + 20 + i * 30))
\ No newline at end of file
+            text = self._render_text(self.font, instruction, self.DARK_BLUE)
+            surface.blit(text, (self.margin_x, self.view_rect.bottom + 20 + i * 30))
\ No newline at end of file